@@ -0,0 +1,2 @@
+# сколько инструментов хендлеры догружают одновременно (свечи для индикаторов)
+CONCURRENCY_CANDLES = 12
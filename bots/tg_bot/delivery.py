@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter
+
+from utils.metrics import METRICS, Counter, Histogram, MetricsRegistry
+from utils.rate_limit import TokenBucket
+
+TG_MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = "\n\n"
+
+
+@dataclass(slots=True)
+class Delivery:
+    chat_id: int
+    text: str
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+
+
+def pack_digest(texts: List[str], limit: int = TG_MESSAGE_LIMIT,
+                separator: str = DIGEST_SEPARATOR) -> List[str]:
+    """
+    Склеить тексты в как можно меньше сообщений не длиннее limit.
+    Текст длиннее limit режется по строкам (строка длиннее limit — жёстко).
+    """
+    pieces: List[str] = []
+    for text in texts:
+        if len(text) <= limit:
+            pieces.append(text)
+            continue
+        chunk = ""
+        for line in text.splitlines(keepends=True):
+            while len(line) > limit:
+                if chunk:
+                    pieces.append(chunk)
+                    chunk = ""
+                pieces.append(line[:limit])
+                line = line[limit:]
+            if len(chunk) + len(line) > limit:
+                pieces.append(chunk)
+                chunk = ""
+            chunk += line
+        if chunk:
+            pieces.append(chunk)
+
+    messages: List[str] = []
+    current = ""
+    for piece in pieces:
+        if not current:
+            current = piece
+        elif len(current) + len(separator) + len(piece) <= limit:
+            current += separator + piece
+        else:
+            messages.append(current)
+            current = piece
+    if current:
+        messages.append(current)
+    return messages
+
+
+class DeliveryScheduler:
+    """
+    Единая очередь исходящих сообщений Telegram с учётом лимитов Bot API.
+
+    Перед отправкой берётся токен из глобального бакета (весь бот) и из бакета
+    чата. На TelegramRetryAfter чат и бот ставятся на паузу на retry_after, а
+    сообщение возвращается в голову очереди. Сообщения с digest=True, пришедшие
+    в один чат за digest_window_ms, склеиваются в дайджест не длиннее 4096 символов.
+
+    Метрики (в metrics, по умолчанию METRICS): отправлено/повторено/
+    отброшено/склеено, глубина очереди и возраст сообщения в очереди; stats()
+    дополнительно отдаёт последний, средний и максимальный возраст.
+    """
+
+    def __init__(self, bot: Bot, global_rate: float = 25.0, chat_rate: float = 1.0,
+                 chat_burst: float = 3.0, digest_window_ms: int = 1500, max_attempts: int = 5,
+                 age_warn_sec: float = 10.0, metrics: MetricsRegistry = METRICS):
+        self._bot = bot
+        self._global = TokenBucket(global_rate, capacity=global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chats: Dict[int, TokenBucket] = {}
+        self._digest_window = digest_window_ms / 1000
+        self._digest: Dict[int, List[Delivery]] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._max_attempts = max_attempts
+        self._age_warn = age_warn_sec
+        self._q: asyncio.Queue[Delivery] = asyncio.Queue()
+        self._retry: List[Delivery] = []
+        self._current: Optional[Delivery] = None  # взято из очереди, ещё не отправлено
+        self._task: Optional[asyncio.Task] = None
+        self._metrics = metrics
+        self.sent: Counter = metrics.counter("tg_delivery_sent_total", "Telegram messages sent")
+        self.retried: Counter = metrics.counter("tg_delivery_retried_total",
+                                                "Telegram sends returned to the queue")
+        self.dropped: Counter = metrics.counter("tg_delivery_dropped_total",
+                                                "Telegram messages given up")
+        self.digested: Counter = metrics.counter("tg_delivery_digested_total",
+                                                 "Messages merged into a digest")
+        self.age: Histogram = metrics.histogram("tg_delivery_queue_age_seconds",
+                                                "Enqueue to send time")
+        metrics.gauge("tg_delivery_queue_depth", self.__len__, "Messages waiting to be sent")
+        self.last_age = 0.0
+        self.max_age = 0.0
+        self.log = logging.getLogger(self.__class__.__name__)
+
+    def __len__(self) -> int:
+        return (self._q.qsize() + len(self._retry) + (self._current is not None)
+                + sum(len(v) for v in self._digest.values()))
+
+    async def send(self, chat_id: int, text: str, digest: bool = False, **kwargs) -> None:
+        """
+        Поставить сообщение в очередь; kwargs уходят в Bot.send_message.
+        digest=True — сообщение можно склеить с соседними в этот же чат.
+        """
+        item = Delivery(chat_id, text, kwargs)
+        if not digest or self._digest_window <= 0:
+            self._q.put_nowait(item)
+            return
+        pending = self._digest.setdefault(chat_id, [])
+        pending.append(item)
+        if chat_id not in self._timers:
+            self._timers[chat_id] = asyncio.get_running_loop().call_later(
+                self._digest_window, self._flush_digest, chat_id
+            )
+
+    def _flush_digest(self, chat_id: int) -> None:
+        self._timers.pop(chat_id, None)
+        items = self._digest.pop(chat_id, [])
+        if not items:
+            return
+        first = items[0]
+        texts = pack_digest([i.text for i in items])
+        self.digested.inc(len(items) - len(texts))
+        for text in texts:
+            self._q.put_nowait(Delivery(chat_id, text, first.kwargs, first.enqueued_at))
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self),
+            "sent": int(self.sent.value),
+            "retried": int(self.retried.value),
+            "dropped": int(self.dropped.value),
+            "digested": int(self.digested.value),
+            "last_age_sec": round(self.last_age, 3),
+            "avg_age_sec": round(self.age.sum / self.age.count, 3) if self.age.count else 0.0,
+            "max_age_sec": round(self.max_age, 3),
+        }
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self._chat_rate, capacity=self._chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _next(self) -> Delivery:
+        if self._retry:
+            return self._retry.pop(0)
+        return await self._q.get()
+
+    async def _loop(self) -> None:
+        while True:
+            item = await self._next()
+            # пока сообщение ждёт токен и отправляется, оно учитывается в len()
+            self._current = item
+            try:
+                await self._send(item)
+            finally:
+                self._current = None
+
+    async def _send(self, item: Delivery) -> None:
+        chat = self._chat_bucket(item.chat_id)
+        await chat.acquire()
+        await self._global.acquire()
+        try:
+            await self._bot.send_message(item.chat_id, item.text, **item.kwargs)
+        except TelegramRetryAfter as e:
+            self.log.warning("Telegram flood control, pause",
+                             extra={"chat_id": item.chat_id, "retry_after": e.retry_after})
+            chat.pause(e.retry_after)
+            self._global.pause(e.retry_after)
+            self._requeue(item, e)
+        except TelegramNetworkError as e:
+            self._requeue(item, e)
+        except Exception as e:
+            self.dropped.inc()
+            self.log.error("Telegram delivery failed, drop message",
+                           extra={"chat_id": item.chat_id, "exception": e})
+        else:
+            self._delivered(item)
+
+    def _requeue(self, item: Delivery, error: Exception) -> None:
+        item.attempts += 1
+        if item.attempts >= self._max_attempts:
+            self.dropped.inc()
+            self.log.error("Telegram delivery failed, give up",
+                           extra={"chat_id": item.chat_id, "attempts": item.attempts,
+                                  "exception": error})
+            return
+        self.retried.inc()
+        self._retry.append(item)
+
+    def _delivered(self, item: Delivery) -> None:
+        age = time.monotonic() - item.enqueued_at
+        self.sent.inc()
+        self.age.observe(age)
+        self.last_age = age
+        self.max_age = max(self.max_age, age)
+        if age > self._age_warn:
+            self.log.warning("Telegram message waited too long in queue",
+                             extra={"chat_id": item.chat_id, "age_sec": round(age, 3)})
+
+    async def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Сбросить дайджесты и дать очереди отправиться за timeout секунд."""
+        for timer in self._timers.values():
+            timer.cancel()
+        for chat_id in list(self._digest):
+            self._flush_digest(chat_id)
+        if self._task:
+            try:
+                await asyncio.wait_for(self._drained(), timeout=timeout)
+            except asyncio.TimeoutError:
+                self.log.warning("Telegram queue not drained on stop", extra=self.stats())
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.log.info("Telegram delivery stopped", extra=self.stats())
+        self._metrics.remove("tg_delivery_queue_depth")
+
+    async def _drained(self) -> None:
+        while len(self):
+            await asyncio.sleep(0.05)
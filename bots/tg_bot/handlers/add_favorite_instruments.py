@@ -9,13 +9,18 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 import tinkoff.invest as ti
 
+from bots.tg_bot.constants import CONCURRENCY_CANDLES
 from bots.tg_bot.keyboards.kb_account import kb_list_favorites
 from bots.tg_bot.messages.messages_const import text_add_favorites_instruments
+from clients.tinkoff.catalog import InstrumentCatalog
 from clients.tinkoff.client import TClient
 from clients.tinkoff.name_service import NameService
+from core.domains.instrument_snapshot import InstrumentSnapshot
 from database.pgsql.models import Instrument
+from database.pgsql.notify_writer import NotifyWriter
 from database.pgsql.repository import Repository
 from database.pgsql.schemas import InstrumentIn
+from services.historic_service.candle_store import CandleStore
 from services.historic_service.indicators import IndicatorCalculator
 from utils import is_updated_today
 
@@ -74,11 +79,16 @@ async def add_all_favorite(
         state: FSMContext,
         db: Repository,
         tclient: TClient,
-        name_service: NameService
+        name_service: NameService,
+        snapshot: InstrumentSnapshot,
+        candle_store: CandleStore,
+        catalog: InstrumentCatalog,
+        notify_writer: NotifyWriter,
 ):
     data = await state.get_data()
     instruments: list[ti.FavoriteInstrument] = data['instruments']
-    await add_favorites_instruments(call, db, instruments, state, tclient, name_service)
+    await add_favorites_instruments(call, db, instruments, state, tclient, name_service, snapshot,
+                                    candle_store, catalog, notify_writer)
 
 
 @rout_add_favorites.callback_query(SetFavorites.start, F.data == "add")
@@ -87,7 +97,11 @@ async def add_favorite(
         state: FSMContext,
         db: Repository,
         tclient: TClient,
-        name_service: NameService
+        name_service: NameService,
+        snapshot: InstrumentSnapshot,
+        candle_store: CandleStore,
+        catalog: InstrumentCatalog,
+        notify_writer: NotifyWriter,
 ):
     data = await state.get_data()
     instruments: list[ti.FavoriteInstrument] = data['instruments']
@@ -95,7 +109,8 @@ async def add_favorite(
     print(set_instruments)
 
     instruments = [i for i in instruments if f"set:{i.uid}" in set_instruments]
-    await add_favorites_instruments(call, db, instruments, state, tclient, name_service)
+    await add_favorites_instruments(call, db, instruments, state, tclient, name_service, snapshot,
+                                    candle_store, catalog, notify_writer)
 
 
 async def add_favorites_instruments(
@@ -105,6 +120,10 @@ async def add_favorites_instruments(
         state: FSMContext,
         tclient: TClient,
         name_service: NameService,
+        snapshot: InstrumentSnapshot,
+        candle_store: CandleStore,
+        catalog: InstrumentCatalog,
+        notify_writer: NotifyWriter,
 ):
     """
     Для каждого инструмента:
@@ -146,26 +165,23 @@ async def add_favorites_instruments(
             if uid not in existing
         ]
 
-        # 3) Параллельно тянем свечи с ограничением
+        # 3) Тип и дата экспирации новых — из локального справочника
+        info = await catalog.get_many(need_info)
+        expiration_dates: dict[str, Any] = {uid: c.expiration_date for uid, c in info.items()}
+        types: dict[str, str] = {uid: c.type for uid, c in info.items()}
+
+        # Параллельно тянем свечи с ограничением
         candles: dict[str, Any] = {}
-        expiration_dates: dict[str, Any] = {}
-        types: dict[str, str] = {}
 
         async def _fetch_one(uid: str):
-            candles[uid] = await tclient.get_days_candles_for_2_months(uid)
-            if uid in need_info:
-                response = (await tclient.get_futures_response(uid))
-                if response:
-                    expiration_dates[uid] = response.instrument.expiration_date
-                    types[uid] = "futures"
-                else:
-                    i_info = await tclient.get_info(uid)
-                    if i_info:
-                        types[uid] = i_info.instrument.instrument_type
+            candles[uid] = await candle_store.get(uid)
 
         if need_candles:
+            sem = asyncio.Semaphore(CONCURRENCY_CANDLES)
+
             async def _guard(uid: str):
-                await _fetch_one(uid)
+                async with sem:
+                    await _fetch_one(uid)
             await asyncio.gather(*[_guard(uid) for uid in need_candles])
 
         # 4) Готовим батч для upsert и список для простого check=True
@@ -179,8 +195,8 @@ async def add_favorites_instruments(
             ticker = ticker_by_uid[uid]
             if uid in candles:
                 # пересчитываем индикаторы
-                indicator = IndicatorCalculator(
-                    candles_resp=candles[uid],
+                indicator = IndicatorCalculator.from_rows(
+                    candles[uid],
                 ).build_instrument_update()
 
                 payload = {
@@ -226,6 +242,12 @@ async def add_favorites_instruments(
 
         await session.commit()
 
+    snapshot.apply_bulk(r.model_dump(exclude_unset=True) for r in rows_for_upsert)
+    snapshot.set_checked(only_check_ids)
+    # to_notify=True уже в БД; отложенный False из NotifyWriter не должен его перетереть
+    for r in rows_for_upsert:
+        notify_writer.set(r.instrument_id, True)
+
     # 6) Обновляем сообщение
     try:
         await call.message.delete()
@@ -238,7 +260,7 @@ async def add_favorites_instruments(
     )
 
     # 7) Подписка на цены
-    if tclient.market_stream_task:
+    if tclient.market_stream_running:
         tclient.subscribe_to_instrument_last_price(*uids)
 
     # 8) Чистим состояние
@@ -6,17 +6,15 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import Message, ReplyKeyboardRemove, CallbackQuery, LinkPreviewOptions
-from tinkoff.invest.utils import quotation_to_decimal as q2d
 
 from bots.tg_bot.keyboards.kb_account import kb_instr_info, kb_short_long, kb_list_accounts
 from bots.tg_bot.messages.messages_const import text_favorites_breakout
-from clients.tinkoff.client import TClient
+from clients.tinkoff.last_prices import LastPriceService
 from clients.tinkoff.name_service import NameService
-from clients.tinkoff.portfolio_svc import PortfolioService, PortfolioOut
+from clients.tinkoff.portfolio_svc import PortfolioService
+from clients.tinkoff.price_point import PricePointService
 from database.pgsql.models import Instrument, Account
 from database.pgsql.repository import Repository
-from database.redis.client import RedisClient
-from utils.utils import price_point
 
 instr_info = Router()
 
@@ -61,8 +59,8 @@ async def instrument_info_msg(
     call: CallbackQuery,
     state: FSMContext,
     name_service: NameService,
-    tclient: TClient,
-    redis: RedisClient,
+    last_prices: LastPriceService,
+    price_points: PricePointService,
     db: Repository,
     portfolio_svc: PortfolioService,
 ):
@@ -74,27 +72,15 @@ async def instrument_info_msg(
     await call.message.delete()
 
     # стоимость пункта
-    price_point_value = await tclient.get_min_price_increment_amount(instrument.instrument_id)
-    if price_point_value:
-        price_point_value = price_point(price_point_value)
+    price_point_value = await price_points.get(instrument.instrument_id)
 
     # last price
-    last_price = None
-    data_last_price = await redis.get_last_price(instrument.instrument_id)
-    if data_last_price:
-        last_price = float(data_last_price["price"])
-    else:
-        last_price_obj = await tclient.get_last_price(instrument.instrument_id)
-        if last_price_obj:
-            last_price = float(q2d(last_price_obj.price))
-            await redis.set_last_price_if_newer(
-                instrument.instrument_id,
-                str(last_price),
-                ts_ms=int(last_price_obj.time.timestamp() * 1000),
-            )
+    last_price = (await last_prices.get_many([instrument.instrument_id])).get(
+        instrument.instrument_id
+    )
 
     # портфель только выбранного аккаунта
-    portfolios = await _portfolios(db, portfolio_svc)
+    portfolios = await portfolio_svc.list_portfolios(db)
 
     await call.message.answer(
         text=await text_favorites_breakout(
@@ -111,18 +97,6 @@ async def instrument_info_msg(
     await state.clear()
 
 
-async def _portfolios(db: Repository, portfolio_svc: PortfolioService) -> list[PortfolioOut]:
-    portfolios: list[PortfolioOut] = []
-    async with db.session_factory() as s:
-        accounts = await db.list_accounts(s)
-
-    for account in accounts:
-        portfolios.append(
-            await portfolio_svc.get_portfolio(account.account_id, account.name)
-        )
-    return portfolios
-
-
 @instr_info.callback_query(InstrumentInfo.start, F.data == "cancel")
 async def cancel_instrument_info(call, state: FSMContext):
     await call.message.delete()
@@ -7,6 +7,7 @@ from bots.tg_bot.keyboards.kb_account import kb_list_uncheck
 from bots.tg_bot.messages.messages_const import text_uncheck_favorites_instruments
 from clients.tinkoff.client import TClient
 from clients.tinkoff.name_service import NameService
+from core.domains.instrument_snapshot import InstrumentSnapshot
 from database.pgsql.models import Instrument
 from database.pgsql.repository import Repository
 
@@ -71,16 +72,18 @@ async def cancel(call: types.CallbackQuery, state: FSMContext):
 
 @rout_remove_favorites.callback_query(RemoveFavorites.start, F.data == "remove_all")
 async def remove_all(call: types.CallbackQuery, state: FSMContext, db: Repository,
-                     tclient: TClient, name_service: NameService):
+                     tclient: TClient, name_service: NameService,
+                     snapshot: InstrumentSnapshot):
     data = await state.get_data()
     instruments: list[Instrument] = data["instruments"]
-    await _apply_uncheck_and_unsubscribe(call, db, tclient, instruments, name_service)
+    await _apply_uncheck_and_unsubscribe(call, db, tclient, instruments, name_service, snapshot)
     await state.clear()
 
 
 @rout_remove_favorites.callback_query(RemoveFavorites.start, F.data == "remove")
 async def remove_selected(call: types.CallbackQuery, state: FSMContext, db: Repository,
-                          tclient: TClient, name_service: NameService):
+                          tclient: TClient, name_service: NameService,
+                          snapshot: InstrumentSnapshot):
     data = await state.get_data()
     selected: set[str] = set(data.get("unset", set()))
     if not selected:
@@ -89,7 +92,8 @@ async def remove_selected(call: types.CallbackQuery, state: FSMContext, db: Repo
     # извлечём uid из "unset:<uid>"
     instruments = data["instruments"]
     ids = [instr for instr in instruments if f"unset:{instr.instrument_id}" in selected]
-    await _apply_uncheck_and_unsubscribe(call, db, tclient, ids, name_service=name_service)
+    await _apply_uncheck_and_unsubscribe(call, db, tclient, ids, name_service=name_service,
+                                         snapshot=snapshot)
     await state.clear()
 
 
@@ -98,18 +102,20 @@ async def _apply_uncheck_and_unsubscribe(
         db: Repository,
         tclient: TClient,
         instruments: list[Instrument],
-        name_service: NameService
+        name_service: NameService,
+        snapshot: InstrumentSnapshot,
 ):
     ids = [i.instrument_id for i in instruments]
     try:
         async with db.session_factory() as session:
             await db.set_checked_bulk(ids, session=session, check=False)
             await session.commit()
+        snapshot.set_checked(ids, check=False)
     except Exception as e:
         await call.message.answer(f"⚠️ Ошибка при обновлении БД: {e}")
 
     try:
-        if tclient.market_stream_task:
+        if tclient.market_stream_running:
             tclient.unsubscribe_to_instrument_last_price(*ids)
     except Exception as e:
         await call.message.answer(f"Ошибка при попытке отписаться: {e}")
@@ -1,13 +1,14 @@
 import asyncio
 import logging
 from datetime import datetime, timezone
+from typing import Sequence
 
 from aiogram import Router, types, F
 from aiogram.filters import CommandStart, Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from tinkoff.invest import GetCandlesResponse
 
+from bots.tg_bot.constants import CONCURRENCY_CANDLES
 from bots.tg_bot.keyboards.kb_account import kb_list_accounts, kb_list_accounts_delete
 from bots.tg_bot.messages.messages_const import (
     text_add_account_message,
@@ -15,17 +16,20 @@ from bots.tg_bot.messages.messages_const import (
     START_TEXT,
     HELP_TEXT
 )
+from clients.tinkoff.catalog import InstrumentCatalog
 from clients.tinkoff.client import TClient
 from clients.tinkoff.name_service import NameService
+from core.domains.instrument_snapshot import InstrumentSnapshot
 from database.pgsql.enums import Direction
-from database.pgsql.models import AccountInstrument
+from database.pgsql.models import AccountInstrument, DailyCandle
+from database.pgsql.notify_writer import NotifyWriter
 from database.pgsql.repository import Repository
+from services.historic_service.candle_store import CandleStore
 from services.historic_service.indicators import IndicatorCalculator
 from utils import is_updated_today
 
 router = Router()
 logger = logging.getLogger(__name__)
-CONCURRENCY_CANDLES = 12
 
 
 @router.message(CommandStart())
@@ -62,7 +66,9 @@ async def add_account_check(message: types.Message, state: FSMContext, tclient:
 
 @router.callback_query(F.data, AddAccount.start)
 async def add_account_id(call: types.CallbackQuery, state: FSMContext, tclient: TClient,
-                         db: Repository, name_service: NameService):
+                         db: Repository, name_service: NameService, snapshot: InstrumentSnapshot,
+                         candle_store: CandleStore, catalog: InstrumentCatalog,
+                         notify_writer: NotifyWriter):
     if call.data == "cancel":
         await call.message.delete()
         await state.clear()
@@ -103,27 +109,26 @@ async def add_account_id(call: types.CallbackQuery, state: FSMContext, tclient:
             if (uid not in existing_by_id) or not is_updated_today(existing_by_id[uid].last_update)
         ]
         need_expiration_date = [uid for uid in instruments_ids if (uid not in existing_by_id)]
-        # 4) грузим свечи параллельно с ограничением
-        candles_by_uid: dict[str, GetCandlesResponse] = {}
-        expiration_dates: dict[str, datetime] = {}
-        types: dict[str, str] = {}
+        # 4) тип и дата экспирации новых — из локального справочника
+        catalog_meta = await catalog.get_many(need_expiration_date)
+        expiration_dates: dict[str, datetime] = {
+            uid: c.expiration_date for uid, c in catalog_meta.items()
+        }
+        types: dict[str, str] = {uid: c.type for uid, c in catalog_meta.items()}
+        # грузим свечи параллельно с ограничением
+        candles_by_uid: dict[str, Sequence[DailyCandle]] = {}
 
         async def _fetch(uid: str):
-            candles_by_uid[uid] = await tclient.get_days_candles_for_2_months(uid)
-            if uid in need_expiration_date:
-                futures_response = await tclient.get_futures_response(uid)
-                if futures_response:
-                    expiration_dates[uid] = futures_response.instrument.expiration_date
-                    types[uid] = "futures"
-                else:
-                    i_info = await tclient.get_info(uid)
-                    if i_info:
-                        types[uid] = i_info.instrument.instrument_type
+            candles_by_uid[uid] = await candle_store.get(uid)
 
         if need_candles:
+            # темп запросов держит лимитер TClient, здесь — сколько инструментов в работе
+            sem = asyncio.Semaphore(CONCURRENCY_CANDLES)
+
             async def _guarded(uid: str):
-                logger.debug("fetching", extra={"uid": uid})
-                await _fetch(uid)
+                async with sem:
+                    logger.debug("fetching", extra={"uid": uid})
+                    await _fetch(uid)
 
             result = await asyncio.gather(*[_guarded(uid) for uid in need_candles],
                                           return_exceptions=True)
@@ -142,8 +147,8 @@ async def add_account_id(call: types.CallbackQuery, state: FSMContext, tclient:
             existing = existing_by_id.get(uid)
             if uid in candles_by_uid:
                 # пересчёт индикаторов
-                indicator = IndicatorCalculator(
-                    candles_resp=candles_by_uid[uid],
+                indicator = IndicatorCalculator.from_rows(
+                    candles_by_uid[uid],
                 ).build_instrument_update()
                 row = {
                     "instrument_id": uid,
@@ -196,8 +201,16 @@ async def add_account_id(call: types.CallbackQuery, state: FSMContext, tclient:
         await db.set_position_bulk(rows_positions, session=session)
         await session.commit()
 
+    snapshot.apply_bulk(rows_for_upsert)
+    # to_notify=True уже в БД; отложенный False из NotifyWriter не должен его перетереть
+    for row in rows_for_upsert:
+        if row["to_notify"]:
+            notify_writer.set(row["instrument_id"], True)
+    for p in rows_positions:
+        snapshot.set_position(p.account_id, p.instrument_id, p.direction)
+
     # 8) подписка на цены (после фикса в БД)
-    if instruments_ids and tclient.market_stream_task:
+    if instruments_ids and tclient.market_stream_running:
         tclient.subscribe_to_instrument_last_price(*instruments_ids)
 
     async with db.session_factory() as session:
@@ -231,7 +244,8 @@ async def remove_account_check(message: types.Message, state: FSMContext,
 
 @router.callback_query(F.data, RemoveAccount.start)
 async def remove_account_id(call: types.CallbackQuery, state: FSMContext, tclient: TClient,
-                            db: Repository, name_service: NameService):
+                            db: Repository, name_service: NameService,
+                            snapshot: InstrumentSnapshot):
     if call.data == "cancel":
         await call.message.answer(text="Отменено")
         await state.clear()
@@ -245,8 +259,9 @@ async def remove_account_id(call: types.CallbackQuery, state: FSMContext, tclien
 
         await db.delete_account(account_id=call.data, session=s)
         await s.commit()
+    snapshot.remove_positions(call.data)
 
-    if tclient.market_stream_task:
+    if tclient.market_stream_running:
         tclient.unsubscribe_to_instrument_last_price(*instruments_id)
 
     async with db.session_factory() as session:
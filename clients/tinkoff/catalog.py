@@ -0,0 +1,115 @@
+import asyncio
+import datetime as dt
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+from clients.tinkoff.client import TClient
+from database.pgsql.models import CatalogInstrument
+from database.pgsql.repository import Repository
+from utils.logger import get_logger
+
+
+class InstrumentCatalog:
+    """
+    Локальный справочник инструментов (таблица instrument_catalog).
+
+    sync() раз в день перезаливает его выгрузками Shares/Futures/Etfs/Bonds/
+    Currencies; имя, тип, тикер и дата экспирации читаются из БД по индексам
+    uid, figi и ticker. Неизвестный справочнику uid (не в статусе BASE или
+    появился после синхронизации) добирается через API и сохраняется, так что
+    поштучный запрос по нему случается один раз. Строки, которых нет в
+    выгрузках дольше keep_days, удаляются.
+    """
+
+    def __init__(self, db: Repository, tclient: TClient, keep_days: int = 7):
+        self._db = db
+        self._tclient = tclient
+        self._keep_days = keep_days
+        self.log = get_logger(self.__class__.__name__)
+
+    @staticmethod
+    def _row(item: Any, type_: str, now: dt.datetime) -> dict:
+        return {
+            "uid": item.uid,
+            "figi": item.figi or None,
+            "ticker": item.ticker or None,
+            "class_code": item.class_code or None,
+            "name": item.name,
+            "type": type_,
+            "lot": item.lot,
+            "currency": item.currency or None,
+            "expiration_date": getattr(item, "expiration_date", None),
+            "updated_at": now,
+        }
+
+    async def sync(self) -> int:
+        """Перезалить справочник из полных выгрузок; вернуть число инструментов."""
+        listings = await self._tclient.get_instrument_listings()
+        now = dt.datetime.now(dt.timezone.utc)
+        rows = {
+            item.uid: self._row(item, type_, now)
+            for type_, items in listings.items()
+            for item in items
+            if item.uid
+        }
+        async with self._db.session_factory() as s:
+            await self._db.upsert_catalog(list(rows.values()), session=s)
+            await self._db.delete_catalog_before(now - dt.timedelta(days=self._keep_days),
+                                                 session=s)
+            await s.commit()
+        self.log.info("Instrument catalog synced", extra={"count": len(rows)})
+        return len(rows)
+
+    async def sync_if_stale(self, max_age: dt.timedelta = dt.timedelta(days=1)) -> None:
+        """Синхронизация при старте, если справочник пуст или устарел."""
+        async with self._db.session_factory() as s:
+            updated = await self._db.catalog_updated_at(s)
+        if updated is None or dt.datetime.now(dt.timezone.utc) - updated > max_age:
+            await self.sync()
+
+    async def get(self, uid: str) -> Optional[CatalogInstrument]:
+        return (await self.get_many([uid])).get(uid)
+
+    async def get_many(self, uids: Iterable[str]) -> Dict[str, CatalogInstrument]:
+        """Один индексный запрос в БД; промахи — через API с записью в справочник."""
+        ids = list(dict.fromkeys(uids))
+        async with self._db.session_factory() as s:
+            result = {c.uid: c for c in await self._db.get_catalog(ids, session=s)}
+        missing = [uid for uid in ids if uid not in result]
+        if not missing:
+            return result
+
+        fetched = await asyncio.gather(*(self._fetch(uid) for uid in missing),
+                                       return_exceptions=True)
+        rows = []
+        for uid, row in zip(missing, fetched):
+            if isinstance(row, Exception):
+                self.log.warning("Catalog fallback failed",
+                                 extra={"instrument_id": uid, "exception": row})
+                continue
+            rows.append(row)
+            result[uid] = CatalogInstrument.from_dict(row)
+        if rows:
+            async with self._db.session_factory() as s:
+                await self._db.upsert_catalog(rows, session=s)
+                await s.commit()
+        self.log.info("Catalog misses fetched from API",
+                      extra={"requested": len(missing), "fetched": len(rows)})
+        return result
+
+    async def _fetch(self, uid: str) -> dict:
+        instrument = (await self._tclient.get_info(uid)).instrument
+        row = self._row(instrument, instrument.instrument_type,
+                        dt.datetime.now(dt.timezone.utc))
+        if instrument.instrument_type == "futures":
+            future = await self._tclient.get_futures_response(uid)
+            if future:
+                row["expiration_date"] = future.instrument.expiration_date
+        return row
+
+    async def find_by_ticker(self, ticker: str) -> Sequence[CatalogInstrument]:
+        async with self._db.session_factory() as s:
+            return await self._db.find_catalog_by_ticker(ticker, session=s)
+
+    async def find_by_figi(self, figi: str) -> Optional[CatalogInstrument]:
+        async with self._db.session_factory() as s:
+            return await self._db.find_catalog_by_figi(figi, session=s)
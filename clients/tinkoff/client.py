@@ -1,86 +1,184 @@
 import asyncio
 import functools
 import inspect
+import time
+from dataclasses import dataclass
 from datetime import datetime as dt
 import datetime
-from typing import Optional
+from typing import Iterable, Optional
 
 import tinkoff.invest as ti
+from grpc import StatusCode
 from tinkoff.invest import AioRequestError
 from tinkoff.invest.schemas import GetFavoriteGroupsRequest, FavoriteGroup, InstrumentResponse, FutureResponse, \
     InstrumentIdType, LastPrice
 from tinkoff.invest.async_services import AsyncServices
-from tinkoff.invest.market_data_stream.async_market_data_stream_manager import (
-    AsyncMarketDataStreamManager
-)
 
+from clients.tinkoff.limits import RequestLimiter
+from clients.tinkoff.md_pool import MarketDataPool
 from core.domains.event_bus import StreamBus
 from utils import logger
+from utils.single_flight import single_flight
 
 FAVORITES_ADD = ti.EditFavoritesActionType.EDIT_FAVORITES_ACTION_TYPE_ADD
 FAVORITES_DELETE = ti.EditFavoritesActionType.EDIT_FAVORITES_ACTION_TYPE_DEL
 FAVORITES_UNSPECIFIED = ti.EditFavoritesActionType.EDIT_FAVORITES_ACTION_TYPE_UNSPECIFIED
+# поле MarketDataResponse -> топик StreamBus; порядок — по частоте, LastPrice первым,
+# чтобы типичный ответ классифицировался одной проверкой
+MD_DISPATCH: tuple[tuple[str, str], ...] = (
+    ("last_price", "md.last_price"),
+    ("ping", "md.ping"),
+    ("trade", "md.trade"),
+    ("candle", "md.candle"),
+    ("orderbook", "md.orderbook"),
+    ("trading_status", "md.trading_status"),
+    ("open_interest", "md.open_interest"),
+    ("subscribe_last_price_response", "md.subscription"),
+    ("subscribe_candles_response", "md.subscription"),
+    ("subscribe_trades_response", "md.subscription"),
+    ("subscribe_order_book_response", "md.subscription"),
+    ("subscribe_info_response", "md.subscription"),
+)
+
+
+def classify_market_data(response: ti.MarketDataResponse) -> Optional[tuple[str, object]]:
+    """(топик, заполненное поле oneof) или None для пустого ответа."""
+    for field, topic in MD_DISPATCH:
+        payload = getattr(response, field, None)
+        if payload is not None:
+            return topic, payload
+    return None
+
+
+# разрыв рыночного стрима: публикуется в StreamBus после переподключения
+GAP_TOPIC = "md.gap"
+
+
+@dataclass(frozen=True, slots=True)
+class StreamGap:
+    started: datetime.datetime  # последний ответ стрима до обрыва
+    resumed: datetime.datetime  # повторная подписка
+    instruments: tuple[str, ...]
+
+    @property
+    def seconds(self) -> float:
+        return (self.resumed - self.started).total_seconds()
+
+
+# максимум инструментов в одном GetLastPrices
+LAST_PRICES_CHUNK = 3000
+
+# тип справочника -> метод InstrumentsService с полной выгрузкой этого типа
+CATALOG_LISTINGS: tuple[tuple[str, str], ...] = (
+    ("share", "Shares"),
+    ("futures", "Futures"),
+    ("etf", "Etfs"),
+    ("bond", "Bonds"),
+    ("currency", "Currencies"),
+)
+
+# ошибки, после которых ответ «не фьючерс» был бы неверным выводом
+TRANSIENT_CODES = frozenset({
+    StatusCode.UNAVAILABLE,
+    StatusCode.DEADLINE_EXCEEDED,
+    StatusCode.RESOURCE_EXHAUSTED,
+    StatusCode.INTERNAL,
+    StatusCode.UNAUTHENTICATED,
+})
 
 
 def require_api(method):
     """Гарантирует, что self._api доступен внутри вызова method.
-    Если не поднят — поднимет временно и закроет после.
+    Канал общий и долгоживущий: поднимается при первом вызове, закрывается
+    по простою (см. TClient._idle_loop). UNAVAILABLE помечает канал, на
+    котором шёл вызов, устаревшим — следующий вызов откроет новый, а старый
+    закроется, когда на нём не останется запросов (см. TClient._retire_api).
     """
     if not inspect.iscoroutinefunction(method):
         raise TypeError("@require_api можно вешать только на async-методы")
 
     @functools.wraps(method)
     async def wrapper(self, *args, **kwargs):
-        if getattr(self, "_api", None) is not None:
+        api = await self._ensure_api()
+        key = id(api)
+        self._inflight += 1
+        self._calls_by_api[key] = self._calls_by_api.get(key, 0) + 1
+        try:
             return await method(self, *args, **kwargs)
-
-        async with ti.AsyncClient(token=self._token) as client:
-            self._api = client
-            try:
-                return await method(self, *args, **kwargs)
-            finally:
-                self._api = None
+        except AioRequestError as e:
+            if e.code == StatusCode.UNAVAILABLE:
+                self._retire_api(api, e)
+            raise
+        finally:
+            self._inflight -= 1
+            left = self._calls_by_api.pop(key) - 1
+            if left:
+                self._calls_by_api[key] = left
+            self._last_used = time.monotonic()
+            await self._close_retired()
 
     return wrapper
 
 
 class TClient:
 
-    def __init__(self, token: str, account_id: str = None, stream_bus: StreamBus = None):
+    def __init__(self, token: str, account_id: str = None, stream_bus: StreamBus = None,
+                 idle_sec: float = 300.0, concurrency: int = 12, md_streams: int = 2,
+                 md_streams_max: int = 8, md_stream_capacity: int = 300):
         self._token = token
         self._account_id = account_id
-        self._client: Optional[ti.AsyncClient] = ti.AsyncClient(token=token)
         self._stream_bus = stream_bus
 
+        # общий gRPC-канал: создаётся лениво, закрывается после idle_sec без вызовов
+        self._client: Optional[ti.AsyncClient] = None
         self._api: Optional[AsyncServices] = None
-        self._stream_market: Optional[AsyncMarketDataStreamManager] = None
-        self.market_stream_task: Optional[asyncio.Task] = None
+        self._api_lock = asyncio.Lock()
+        self._idle_sec = idle_sec
+        self._idle_task: Optional[asyncio.Task] = None
+        self._inflight = 0
+        self._last_used = 0.0
+        # UNAVAILABLE: текущий канал помечается устаревшим и при следующем вызове
+        # уходит в _retired; закрывается, когда на нём нет запросов (по id(api)) и стримов
+        self._api_stale = False
+        self._calls_by_api: dict[int, int] = {}
+        self._retired: list[tuple[AsyncServices, ti.AsyncClient]] = []
+        # лимиты тарифа на unary-запросы; грузятся при открытии канала
+        self._limiter = RequestLimiter(concurrency=concurrency)
+        # подписки last_price разложены по нескольким рыночным стримам
+        self._md_pool = MarketDataPool(self._ensure_api, self._route_market_data,
+                                       self._publish_gap, self._on_stream_error,
+                                       min_streams=md_streams, max_streams=md_streams_max,
+                                       capacity=md_stream_capacity)
         self.portfolio_stream_task: Optional[asyncio.Task] = None
 
         self.logger = logger.get_logger(self.__class__.__name__)
 
-        self.subscribes: dict[str, set[str]] = {}
-
+    @single_flight
     @require_api
     async def get_accounts(self) -> list[ti.Account]:
         self.logger.info('Getting accounts')
-        get_accounts_response = await self._api.users.get_accounts()
+        get_accounts_response = await self._call("UsersService/GetAccounts",
+                                                 self._api.users.get_accounts)
         return get_accounts_response.accounts
 
+    @single_flight
     @require_api
     async def get_portfolio(self, account_id) -> ti.PortfolioResponse:
         self.logger.info('Getting portfolio')
-        portfolio_response = await self._api.operations.get_portfolio(account_id=account_id)
+        portfolio_response = await self._call("OperationsService/GetPortfolio",
+                                              self._api.operations.get_portfolio,
+                                              account_id=account_id)
         return portfolio_response
 
     @require_api
     async def _get_favorites_groups(self) -> list[FavoriteGroup]:
         self.logger.info('Getting favorite groups')
-        response = await self._api.instruments.get_favorite_groups(
-            request=GetFavoriteGroupsRequest()
-        )
+        response = await self._call("InstrumentsService/GetFavoriteGroups",
+                                    self._api.instruments.get_favorite_groups,
+                                    request=GetFavoriteGroupsRequest())
         return response.groups
 
+    @single_flight
     @require_api
     async def get_favorites_instruments(self) -> list[ti.GetFavoritesResponse]:
         self.logger.info('Getting favorites instruments')
@@ -88,8 +186,9 @@ class TClient:
         response_groups = await self._get_favorites_groups()
         for group in response_groups:
             if group.size != 0:
-                favorites_response = await self._api.instruments.get_favorites(
-                    group_id=group.group_id)
+                favorites_response = await self._call("InstrumentsService/GetFavorites",
+                                                      self._api.instruments.get_favorites,
+                                                      group_id=group.group_id)
                 groups.append(favorites_response)
         return groups
 
@@ -103,7 +202,9 @@ class TClient:
                            end: datetime.datetime) -> ti.GetCandlesResponse:
         self.logger.info('Getting candles_resp',
                          extra={'instrument_id': instrument_id, 'interval': interval, 'start': start, 'end': end})
-        candles_response = await self._api.market_data.get_candles(
+        candles_response = await self._call(
+            "MarketDataService/GetCandles",
+            self._api.market_data.get_candles,
             instrument_id=instrument_id,
             interval=interval,
             from_=start,
@@ -115,28 +216,30 @@ class TClient:
                                 'start': start, 'end': end})
         return candles_response
 
+    @single_flight
     @require_api
-    async def get_days_candles_for_2_months(self, instrument_id: str) -> ti.GetCandlesResponse:
-        self.logger.info('Getting days candles_resp for 2 months', extra={'instrument_id': instrument_id})
-
-        now = dt.now(datetime.timezone.utc)
-        response = await self._get_candles(
+    async def get_days_candles_since(self, instrument_id: str,
+                                     start: datetime.datetime) -> ti.GetCandlesResponse:
+        """Дневные свечи с start по завтра (последняя обычно незавершённая)."""
+        return await self._get_candles(
             instrument_id=instrument_id,
             interval=ti.CandleInterval.CANDLE_INTERVAL_DAY,
-            start=now - datetime.timedelta(days=100),
-            end=now + datetime.timedelta(days=1),
+            start=start,
+            end=dt.now(datetime.timezone.utc) + datetime.timedelta(days=1),
         )
-        return response
 
+    @single_flight
     @require_api
-    async def get_name_by_id(self, instrument_id: str) -> str:
-        self.logger.info('Getting name by id', extra={'instrument_id': instrument_id})
-        response = await self._api.instruments.get_instrument_by(
-            id_type=ti.InstrumentIdType.INSTRUMENT_ID_TYPE_UID,
-            id=instrument_id
+    async def get_minute_candles(self, instrument_id: str, start: datetime.datetime,
+                                 end: datetime.datetime) -> ti.GetCandlesResponse:
+        return await self._get_candles(
+            instrument_id=instrument_id,
+            interval=ti.CandleInterval.CANDLE_INTERVAL_1_MIN,
+            start=start,
+            end=end,
         )
-        return response.instrument.name
 
+    @single_flight
     @require_api
     async def get_min_price_increment_amount(self, uid: str) -> Optional[
         ti.GetFuturesMarginResponse
@@ -144,19 +247,106 @@ class TClient:
         try:
             self.logger.info('Get min_price_increment amount for futures',
                              extra={'uid': uid})
-            margin_info = await self._api.instruments.get_futures_margin(
+            margin_info = await self._call(
+                "InstrumentsService/GetFuturesMargin",
+                self._api.instruments.get_futures_margin,
                 instrument_id=uid
             )
             return margin_info
-        except AioRequestError:
+        except AioRequestError as e:
+            if e.code in TRANSIENT_CODES:
+                self.logger.warning('GetFuturesMargin failed', extra={'uid': uid, 'code': e.code})
+                raise
             self.logger.info('Not futures instrument')
             return None
 
+    async def _ensure_api(self) -> AsyncServices:
+        if self._api is not None and not self._api_stale:
+            return self._api
+        async with self._api_lock:
+            if self._api_stale:
+                self._retired.append((self._api, self._client))
+                self._api, self._client, self._api_stale = None, None, False
+            if self._api is None:
+                client = ti.AsyncClient(token=self._token)
+                self._api = await client.__aenter__()
+                self._client = client
+                self._last_used = time.monotonic()
+                if not self._limiter.configured:
+                    await self._load_limits(self._api)
+                if self._idle_task is None:
+                    self._idle_task = asyncio.create_task(self._idle_loop())
+                self.logger.info('Channel opened')
+        return self._api
+
+    async def _close_api(self) -> None:
+        client, self._client, self._api = self._client, None, None
+        self._api_stale = False
+        await self._exit_client(client)
+
+    async def _exit_client(self, client: Optional[ti.AsyncClient]) -> None:
+        if client is not None:
+            try:
+                await client.__aexit__(None, None, None)
+            except Exception as e:
+                self.logger.warning('Channel close error', extra={'exception': e})
+
+    def _retire_api(self, api: Optional[AsyncServices], error: Exception) -> None:
+        """
+        Канал api ответил UNAVAILABLE: следующий вызов откроет новый. Сам канал
+        не закрывается — на нём могут идти другие запросы и стримы, и ошибка
+        одного вызова не должна обрывать их. Повторные ошибки того же (уже
+        заменённого) канала ничего не делают.
+        """
+        if api is None or api is not self._api or self._api_stale:
+            return
+        self._api_stale = True
+        self.logger.warning('Channel unavailable, reconnecting on next call',
+                            extra={'exception': error})
+
+    async def _close_retired(self, force: bool = False) -> None:
+        """Закрыть заменённые каналы, на которых не осталось запросов и стримов."""
+        if not self._retired:
+            return
+        keep = [(api, client) for api, client in self._retired
+                if not force and (self._calls_by_api.get(id(api)) or self._streaming())]
+        closing = [client for api, client in self._retired
+                   if all(api is not kept for kept, _ in keep)]
+        self._retired = keep
+        for client in closing:
+            await self._exit_client(client)
+        if closing:
+            self.logger.info('Retired channels closed', extra={'closed': len(closing),
+                                                               'kept': len(keep)})
+
+    def _streaming(self) -> bool:
+        return self._md_pool.running or self.portfolio_stream_task is not None
+
+    @property
+    def market_stream_running(self) -> bool:
+        return self._md_pool.running
+
+    @property
+    def last_price_subscriptions(self) -> set[str]:
+        return self._md_pool.desired
+
+    def market_streams_stats(self) -> list[dict]:
+        return self._md_pool.stats()
+
+    async def _idle_loop(self) -> None:
+        """Закрыть канал, если idle_sec не было вызовов, стримов и запросов в полёте."""
+        while True:
+            await asyncio.sleep(min(self._idle_sec, 30.0))
+            await self._close_retired()
+            if self._api is None or self._streaming() or self._inflight:
+                continue
+            if time.monotonic() - self._last_used >= self._idle_sec:
+                self.logger.info('Channel idle, closing', extra={'idle_sec': self._idle_sec})
+                await self._close_api()
+
     async def start(self, accounts: list[str]) -> None:
-        self._client = ti.AsyncClient(token=self._token)
-        self._api = await self._client.__aenter__()
-        self._stream_market = None
-        self.market_stream_task = asyncio.create_task(self._listen_stream())
+        await self._ensure_api()
+        await self._md_pool.start()
         if accounts:
             self.portfolio_stream_task = asyncio.create_task(self._listen_portfolio_stream(
                 accounts=accounts
@@ -164,18 +354,7 @@ class TClient:
         self.logger.info('Started client (stream_market_data and channel)')
 
     async def stop(self) -> None:
-        if self.market_stream_task is not None:
-            self.market_stream_task.cancel()
-            try:
-                await self.market_stream_task
-            except asyncio.CancelledError:
-                self.logger.info('Stream stopping')
-            finally:
-                self.market_stream_task = None
-
-        if self._stream_market is not None:
-            self._stream_market.stop()
-            self._stream_market = None
+        await self._md_pool.stop()
 
         if self.portfolio_stream_task is not None:
             self.portfolio_stream_task.cancel()
@@ -186,12 +365,23 @@ class TClient:
             finally:
                 self.portfolio_stream_task = None
 
-        if self._api is not None:
-            await self._client.__aexit__(None, None, None)
-            self._api = None
-        self._client = None
+        self._last_used = time.monotonic()
+        await self._close_retired()
+        self.logger.info('Stopping client (stream_market_data), channel kept until idle')
 
-        self.logger.info('Stopping client (stream_market_data and channel)')
+    async def close(self) -> None:
+        """Остановить стримы и закрыть общий канал (при завершении сервиса)."""
+        await self.stop()
+        if self._idle_task is not None:
+            self._idle_task.cancel()
+            try:
+                await self._idle_task
+            except asyncio.CancelledError:
+                pass
+            self._idle_task = None
+        await self._close_retired(force=True)
+        await self._close_api()
+        self.logger.info('Channel closed')
 
     @require_api
     async def edit_favorites_instruments(
@@ -204,74 +394,63 @@ class TClient:
             instrument_id=i
         ) for i in instruments]
         if group_id is None:
-            groups_resp = await self._api.instruments.get_favorite_groups(
+            groups_resp = await self._call(
+                "InstrumentsService/GetFavoriteGroups",
+                self._api.instruments.get_favorite_groups,
                 request=GetFavoriteGroupsRequest()
             )
             group_id = next(g.group_id for g in groups_resp.groups if g.group_name == "Избранное")
 
-        return await self._api.instruments.edit_favorites(
+        return await self._call(
+            "InstrumentsService/EditFavorites",
+            self._api.instruments.edit_favorites,
             instruments=list_instruments,
             group_id=group_id,
             action_type=action_type
         )
 
-    async def _listen_stream(self) -> None:
-        backoff = 1
-        while self._api is not None:
-            try:
-                if self._stream_market is None:
-                    self._stream_market = self._api.create_market_data_stream()
-                    if self.subscribes:
-                        for key, value in self.subscribes.items():
-                            if key == 'last_price':
-                                self.logger.info("Subscribing to instrument_last_price",
-                                                 extra={'instruments_id': ", ".join(value)})
-                                self.subscribe_to_instrument_last_price(*value)
-
-                async for response in self._stream_market:
-                    if self._stream_bus is not None:
-                        try:
-                            self.logger.info("Put response MarketDS",
-                                             extra={"response": response.__class__.__name__})
-                            await self._stream_bus.publish('market_data_stream', response)
-                        except asyncio.QueueFull:
-                            self.logger.warning("Queue full, drop response",
-                                                extra={"response": response.__class__.__name__})
-                    else:
-                        self.logger.info("Received response:",
-                                         extra={"response": response.__class__.__name__})
-                backoff = 1
-
-            except asyncio.CancelledError:
-                raise
-            except Exception as e:
-                self.logger.error("Stream MarketDS error", extra={"exception": e})
-                try:
-                    if self._stream_market is not None:
-                        self._stream_market.stop()
-                finally:
-                    self._stream_market = None
-                await asyncio.sleep(backoff)
-                backoff = min(backoff * 2, 60)
+    async def _route_market_data(self, response: ti.MarketDataResponse) -> None:
+        if self._stream_bus is not None:
+            # переполнение разруливает политика топика в StreamBus;
+            # на md.ping никто не подписан — шина его просто отбрасывает
+            routed = classify_market_data(response)
+            if routed is not None:
+                await self._stream_bus.publish(*routed)
+        else:
+            self.logger.info("Received response:",
+                             extra={"response": response.__class__.__name__})
+
+    async def _on_stream_error(self, error: Exception, api: Optional[AsyncServices]) -> None:
+        if isinstance(error, AioRequestError) and error.code == StatusCode.UNAVAILABLE:
+            self._retire_api(api, error)
+
+    async def _publish_gap(self, started: float, instruments: tuple[str, ...]) -> None:
+        if self._stream_bus is None or not instruments:
+            return
+        utc = datetime.timezone.utc
+        gap = StreamGap(started=dt.fromtimestamp(started, utc), resumed=dt.now(utc),
+                        instruments=instruments)
+        self.logger.warning("Market data stream resumed after gap",
+                            extra={"gap_sec": round(gap.seconds, 1),
+                                   "instruments": len(instruments)})
+        await self._stream_bus.publish(GAP_TOPIC, gap)
 
     async def _listen_portfolio_stream(self, accounts: list[str]) -> None:
         backoff = 1
-        while self._api is not None:
+        while True:
+            api: Optional[AsyncServices] = None
             try:
+                api = await self._ensure_api()
                 self.logger.info("Start portfolio stream for accounts",
                                  extra={"account_id": ",".join(accounts)})
-                async for response in self._api.operations_stream.portfolio_stream(
+                async for response in api.operations_stream.portfolio_stream(
                         accounts=accounts,
 
                 ):
                     if self._stream_bus is not None:
-                        try:
-                            self.logger.debug("Put Portfolio response",
-                                              extra={"response": response.__class__.__name__})
-                            await self._stream_bus.publish('portfolio_stream', response)
-                        except asyncio.QueueFull:
-                            self.logger.warning("Queue full, drop response",
-                                                extra={"response": response.__class__.__name__})
+                        self.logger.debug("Put Portfolio response",
+                                          extra={"response": response.__class__.__name__})
+                        await self._stream_bus.publish('portfolio_stream', response)
                     else:
                         self.logger.debug("Received Portfolio response",
                                           extra={"response": response.__class__.__name__})
@@ -281,6 +460,8 @@ class TClient:
                 raise
             except Exception as e:
                 self.logger.error("Portfolio Stream error", {"exception": e})
+                if isinstance(e, AioRequestError) and e.code == StatusCode.UNAVAILABLE:
+                    self._retire_api(api, e)
                 await asyncio.sleep(backoff)
                 backoff = min(backoff * 2, 60)
 
@@ -298,60 +479,93 @@ class TClient:
                 accounts=accounts
             ))
 
+    @single_flight
     @require_api
     async def get_futures_response(self, instruments_id: str) -> Optional[FutureResponse]:
         try:
-            response = await self._api.instruments.future_by(id=instruments_id,
-                                                             id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_UID)
+            response = await self._call("InstrumentsService/FutureBy",
+                                        self._api.instruments.future_by,
+                                        id=instruments_id,
+                                        id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_UID)
             return response
         except AioRequestError:
             self.logger.info('Not futures instrument')
             return None
 
     @require_api
-    async def get_limit_requests(self):
-        response = await self._api.users.get_user_tariff()
+    async def get_limit_requests(self) -> ti.GetUserTariffResponse:
+        response = await self._call("UsersService/GetUserTariff", self._api.users.get_user_tariff)
+        self._limiter.configure(response)
         return response
 
+    async def _call(self, method: str, fn, *args, **kwargs):
+        """Unary-запрос через лимитер тарифа (method — 'Service/Method')."""
+        return await self._limiter.run(method, fn, *args, **kwargs)
+
+    async def _load_limits(self, api: AsyncServices) -> None:
+        try:
+            self._limiter.configure(await api.users.get_user_tariff())
+        except Exception as e:
+            self.logger.warning('GetUserTariff failed, only concurrency cap applies',
+                                extra={'exception': e})
+
     def subscribe_to_instrument_last_price(self, *instruments_id: str) -> None:
         self.logger.debug("Subscribing to instrument_last_price",
                           extra={"instruments_ids": ", ".join(instruments_id)})
-        if self.subscribes.get('last_price'):
-            self.subscribes['last_price'].update(instruments_id)
-        else:
-            self.subscribes['last_price'] = set(instruments_id)
-
-        self._stream_market.last_price.subscribe(
-            instruments=[ti.LastPriceInstrument(instrument_id=i) for i in instruments_id]
-        )
+        self._md_pool.subscribe(instruments_id)
 
     def unsubscribe_to_instrument_last_price(self, *instruments_id: str):
         self.logger.debug("Unsubscribing to instrument_last_price %s",
                           extra={"instruments_ids": ", ".join(instruments_id)})
-        for i_id in instruments_id:
-            self.subscribes['last_price'].remove(i_id)
-
-        self._stream_market.last_price.unsubscribe(
-            instruments=[ti.LastPriceInstrument(instrument_id=i) for i in instruments_id]
-        )
+        self._md_pool.unsubscribe(instruments_id)
 
     @require_api
-    async def get_last_price(self, instrument_id) -> Optional[LastPrice]:
-        last_prices_response = await self._api.market_data.get_last_prices(
-            instrument_id=[instrument_id]
-        )
-        result = None
-        try:
-            result = last_prices_response.last_prices[0]
-        except IndexError:
-            self.logger.error("Last price response is empty")
-
+    async def get_last_prices(self, instruments_id: Iterable[str],
+                              chunk_size: int = LAST_PRICES_CHUNK) -> list[LastPrice]:
+        """
+        GetLastPrices для любого числа uid: дубликаты убираются, список режется
+        на запросы по chunk_size, запросы идут параллельно в рамках лимитера.
+        """
+        ids = list(dict.fromkeys(instruments_id))
+        if not ids:
+            return []
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+        responses = await asyncio.gather(*(
+            self._call("MarketDataService/GetLastPrices",
+                       self._api.market_data.get_last_prices, instrument_id=chunk)
+            for chunk in chunks
+        ))
+        result = [lp for r in responses for lp in r.last_prices]
+        self.logger.debug("Last prices", extra={"requested": len(ids), "received": len(result),
+                                                "requests": len(chunks)})
         return result
 
+    @single_flight
     @require_api
     async def get_info(self, instrument_id: str) -> InstrumentResponse:
-        i_response = await self._api.instruments.get_instrument_by(
+        i_response = await self._call(
+            "InstrumentsService/GetInstrumentBy",
+            self._api.instruments.get_instrument_by,
             id=instrument_id,
             id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_UID
         )
         return i_response
+
+    @single_flight
+    @require_api
+    async def get_instrument_listings(self) -> dict[str, list]:
+        """
+        Выгрузки торгуемых инструментов по типам (см. CATALOG_LISTINGS):
+        пять запросов на весь справочник вместо GetInstrumentBy на каждый uid.
+        """
+        status = ti.InstrumentStatus.INSTRUMENT_STATUS_BASE
+        responses = await asyncio.gather(*(
+            self._call(f"InstrumentsService/{method}",
+                       getattr(self._api.instruments, method.lower()),
+                       instrument_status=status)
+            for _, method in CATALOG_LISTINGS
+        ))
+        result = {t: r.instruments for (t, _), r in zip(CATALOG_LISTINGS, responses)}
+        self.logger.info("Instrument listings",
+                         extra={t: len(items) for t, items in result.items()})
+        return result
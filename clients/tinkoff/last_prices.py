@@ -0,0 +1,43 @@
+from typing import Dict, Iterable, List
+
+import tinkoff.invest as ti
+from tinkoff.invest.utils import quotation_to_decimal as q2d
+
+from clients.tinkoff.client import TClient
+from database.redis.client import RedisClient
+from utils.logger import get_logger
+
+
+class LastPriceService:
+    """
+    Последние цены пачкой: Redis (кэш рыночного потока) -> GetLastPrices.
+
+    refresh() тянет цены из API минимальным числом запросов и пишет их в
+    Redis одним pipeline (set-if-newer: свежий тик стрима не затирается).
+    get_many() читает кэш одним pipeline и добирает промахи через refresh().
+    """
+
+    def __init__(self, redis: RedisClient, tclient: TClient):
+        self._redis = redis
+        self._tclient = tclient
+        self.log = get_logger(self.__class__.__name__)
+
+    async def refresh(self, instrument_uids: Iterable[str]) -> List[ti.LastPrice]:
+        prices = [lp for lp in await self._tclient.get_last_prices(instrument_uids)
+                  if lp.time is not None]
+        await self._redis.set_last_prices_if_newer(
+            (lp.instrument_uid, str(q2d(lp.price)), int(lp.time.timestamp() * 1000))
+            for lp in prices
+        )
+        self.log.info("Last prices refreshed", extra={"count": len(prices)})
+        return prices
+
+    async def get_many(self, instrument_uids: Iterable[str]) -> Dict[str, float]:
+        uids = list(dict.fromkeys(instrument_uids))
+        cached = await self._redis.get_last_prices(uids)
+        result = {uid: float(data["price"]) for uid, data in cached.items()}
+        missing = [uid for uid in uids if uid not in result]
+        if missing:
+            for lp in await self.refresh(missing):
+                result[lp.instrument_uid] = float(q2d(lp.price))
+        return result
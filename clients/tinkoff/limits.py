@@ -0,0 +1,87 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from grpc import StatusCode
+from tinkoff.invest import AioRequestError
+
+from utils.logger import get_logger
+from utils.rate_limit import TokenBucket
+
+T = TypeVar("T")
+
+
+def short_method(name: str) -> str:
+    """
+    Полное имя gRPC-метода из тарифа -> 'Service/Method':
+    'tinkoff.public.invest.api.contract.v1.MarketDataService/GetCandles'
+    -> 'MarketDataService/GetCandles'.
+    """
+    service, _, method = name.strip("/").rpartition("/")
+    return f"{service.rpartition('.')[2]}/{method}"
+
+
+class RequestLimiter:
+    """
+    Клиентский лимитер unary-запросов по тарифу GetUserTariff.
+
+    На каждую группу методов из unary_limits — общий TokenBucket со скоростью
+    limit_per_minute * headroom / 60 и запасом на секунду: за любую минуту
+    выходит не больше лимита. Плюс общий потолок одновременных запросов.
+    До загрузки тарифа действует только потолок. RESOURCE_EXHAUSTED ставит
+    бакет метода на паузу до ratelimit_reset и повторяет запрос.
+    """
+
+    def __init__(self, concurrency: int = 12, headroom: float = 0.95, max_attempts: int = 3):
+        self._sem = asyncio.Semaphore(concurrency)
+        self._headroom = headroom
+        self._max_attempts = max_attempts
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.configured = False
+        self.log = get_logger(self.__class__.__name__)
+
+    def configure(self, tariff: Any) -> None:
+        buckets: Dict[str, TokenBucket] = {}
+        for limit in tariff.unary_limits:
+            per_minute = limit.limit_per_minute
+            if per_minute <= 0:
+                continue
+            bucket = TokenBucket(per_minute * self._headroom / 60,
+                                 capacity=max(1.0, per_minute / 60))
+            for method in limit.methods:
+                buckets[short_method(method)] = bucket
+        self._buckets = buckets
+        self.configured = True
+        self.log.info("Request limits configured",
+                      extra={"groups": len(tariff.unary_limits), "methods": len(buckets)})
+
+    def bucket(self, method: str) -> Optional[TokenBucket]:
+        return self._buckets.get(method)
+
+    async def run(self, method: str, fn: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """Вызвать fn(*args, **kwargs) как запрос method ('Service/Method') в рамках лимитов."""
+        bucket = self._buckets.get(method)
+        attempt = 0
+        while True:
+            attempt += 1
+            if bucket is not None:
+                await bucket.acquire()
+            async with self._sem:
+                try:
+                    return await fn(*args, **kwargs)
+                except AioRequestError as e:
+                    if e.code != StatusCode.RESOURCE_EXHAUSTED or attempt >= self._max_attempts:
+                        raise
+                    reset = _ratelimit_reset(e)
+                    self.log.warning("Request limit exhausted, waiting",
+                                     extra={"method": method, "reset_sec": reset,
+                                            "attempt": attempt})
+            if bucket is not None:
+                bucket.pause(reset)
+            else:
+                await asyncio.sleep(reset)
+
+
+def _ratelimit_reset(error: AioRequestError) -> float:
+    metadata = getattr(error, "metadata", None)
+    reset = getattr(metadata, "ratelimit_reset", None)
+    return float(reset) if reset else 1.0
@@ -0,0 +1,291 @@
+import asyncio
+import hashlib
+import math
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import tinkoff.invest as ti
+from tinkoff.invest.async_services import AsyncServices
+from tinkoff.invest.market_data_stream.async_market_data_stream_manager import (
+    AsyncMarketDataStreamManager
+)
+
+from clients.tinkoff.subscriptions import SubscriptionSet, chunked
+from utils.logger import get_logger
+
+ApiFactory = Callable[[], Awaitable[AsyncServices]]
+OnResponse = Callable[[ti.MarketDataResponse], Awaitable[None]]
+OnGap = Callable[[float, Tuple[str, ...]], Awaitable[None]]
+OnError = Callable[[Exception, Optional[AsyncServices]], Awaitable[None]]
+
+SUBSCRIPTION_OK = ti.SubscriptionStatus.SUBSCRIPTION_STATUS_SUCCESS
+
+
+def rendezvous_rank(uid: str, slots: int) -> List[int]:
+    """Слоты по убыванию веса hash(slot, uid): первый — «родной» стрим инструмента."""
+    def weight(slot: int) -> int:
+        digest = hashlib.blake2b(f"{slot}:{uid}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+    return sorted(range(slots), key=weight, reverse=True)
+
+
+def place(uids: Iterable[str], slots: int, capacity: int) -> Dict[str, int]:
+    """
+    Rendezvous-размещение с ограничением загрузки: инструмент идёт в первый
+    по рангу слот, где меньше capacity подписок. При изменении числа слотов
+    или состава переезжает только малая доля инструментов.
+    """
+    load = [0] * slots
+    placement: Dict[str, int] = {}
+    for uid in sorted(uids):
+        for slot in rendezvous_rank(uid, slots):
+            if load[slot] < capacity:
+                placement[uid] = slot
+                load[slot] += 1
+                break
+    return placement
+
+
+class MarketDataStream:
+    """Один стрим пула: свой читатель, свои подписки и показатели здоровья."""
+
+    def __init__(self, pool: "MarketDataPool", index: int, chunk_size: int = 100):
+        self.index = index
+        self.subs = SubscriptionSet()
+        self._chunk_size = chunk_size
+        self._pool = pool
+        self._manager: Optional[AsyncMarketDataStreamManager] = None
+        self._channel: Optional[AsyncServices] = None  # канал, на котором открыт стрим
+        self._task: Optional[asyncio.Task] = None
+        self.healthy = False
+        self.messages = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.last_message: Optional[float] = None
+        self.log = get_logger(f"{self.__class__.__name__}[{index}]")
+
+    @property
+    def uids(self) -> Set[str]:
+        return self.subs.desired
+
+    def stats(self) -> dict:
+        return {
+            "stream": self.index,
+            "healthy": self.healthy,
+            "instruments": len(self.uids),
+            **self.subs.stats(),
+            "messages": self.messages,
+            "errors": self.errors,
+            "reconnects": self.reconnects,
+            "silent_sec": (round(time.time() - self.last_message, 1)
+                           if self.last_message else None),
+        }
+
+    def assign(self, uids: Set[str]) -> None:
+        """Новый набор инструментов стрима; живому стриму уходит только разница."""
+        self.subs.set_desired(uids)
+        self.sync()
+
+    def sync(self) -> None:
+        """Отправить дельту подписок порциями по chunk_size (и повторы отказов)."""
+        if self._manager is None:
+            return
+        add, remove = self.subs.delta()
+        for chunk in chunked(remove, self._chunk_size):
+            self._manager.last_price.unsubscribe(
+                instruments=[ti.LastPriceInstrument(instrument_id=i) for i in chunk]
+            )
+        for chunk in chunked(add, self._chunk_size):
+            self._manager.last_price.subscribe(
+                instruments=[ti.LastPriceInstrument(instrument_id=i) for i in chunk]
+            )
+        if add or remove:
+            self.log.debug("Subscriptions delta sent",
+                           extra={"subscribe": len(add), "unsubscribe": len(remove)})
+
+    def _on_subscription(self, response: ti.SubscribeLastPriceResponse) -> None:
+        for s in response.last_price_subscriptions:
+            if s.subscription_status == SUBSCRIPTION_OK:
+                self.subs.confirm(s.instrument_uid)
+            else:
+                self.subs.reject(s.instrument_uid, s.subscription_status)
+        if self.subs.stale():
+            # пришло подтверждение уже снятой подписки — отписать сразу,
+            # не дожидаясь периодического sync пула
+            self.sync()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._close()
+
+    def _close(self) -> None:
+        try:
+            if self._manager is not None:
+                self._manager.stop()
+        finally:
+            self._manager = None
+            self.healthy = False
+
+    async def _run(self) -> None:
+        backoff = 1
+        gap_from: Optional[float] = None  # последний ответ перед обрывом
+        while True:
+            try:
+                if self._manager is None:
+                    self._channel = None
+                    self._channel = await self._pool.api()
+                    self._manager = self._channel.create_market_data_stream()
+                    self.subs.reset()
+                    if self.uids:
+                        self.log.info("Subscribing to instrument_last_price",
+                                      extra={"instruments": len(self.uids)})
+                    self.sync()
+                    self.healthy = True
+                    if gap_from is not None:
+                        await self._pool.on_gap(gap_from, tuple(self.uids))
+                        gap_from = None
+
+                async for response in self._manager:
+                    self.last_message = time.time()
+                    self.messages += 1
+                    if response.subscribe_last_price_response is not None:
+                        self._on_subscription(response.subscribe_last_price_response)
+                    await self._pool.on_response(response)
+                backoff = 1
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.reconnects += 1
+                self.log.error("Stream MarketDS error", extra={"exception": e})
+                if gap_from is None:
+                    gap_from = self.last_message or time.time()
+                await self._pool.on_error(e, self._channel)
+                self._close()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+
+class MarketDataPool:
+    """
+    Пул рыночных стримов для подписок на last_price.
+
+    Число стримов — не меньше min_streams и столько, чтобы на стрим
+    приходилось не больше capacity подписок (лимит брокера на стрим), но не
+    больше max_streams. Инструменты раскладываются rendezvous-хешированием:
+    при добавлении/удалении инструментов и при росте пула переезжает
+    минимум подписок. Когда подписок становится меньше, лишние стримы с конца
+    закрываются, а их инструменты переезжают на оставшиеся (остальные
+    остаются на месте). Каждый стрим читается своей задачей.
+    """
+
+    def __init__(self, api: ApiFactory, on_response: OnResponse, on_gap: OnGap, on_error: OnError,
+                 min_streams: int = 2, max_streams: int = 8, capacity: int = 300,
+                 chunk_size: int = 100, sync_interval: float = 1.0):
+        self.api = api
+        self.on_response = on_response
+        self.on_gap = on_gap
+        self.on_error = on_error
+        self._min_streams = max(1, min_streams)
+        self._max_streams = max(self._min_streams, max_streams)
+        self._capacity = capacity
+        self._chunk_size = chunk_size
+        self._sync_interval = sync_interval
+        self._sync_task: Optional[asyncio.Task] = None
+        self._desired: Set[str] = set()
+        self._streams: List[MarketDataStream] = []
+        self._closing: Set[asyncio.Task] = set()  # остановка лишних стримов
+        self.running = False
+        self.log = get_logger(self.__class__.__name__)
+
+    @property
+    def desired(self) -> Set[str]:
+        return set(self._desired)
+
+    def stats(self) -> List[dict]:
+        return [s.stats() for s in self._streams]
+
+    def subscribe(self, uids: Iterable[str]) -> None:
+        self._desired.update(uids)
+        self._rebalance()
+
+    def unsubscribe(self, uids: Iterable[str]) -> None:
+        self._desired.difference_update(uids)
+        self._rebalance()
+
+    def _slots(self) -> int:
+        need = math.ceil(len(self._desired) / self._capacity) if self._capacity else 1
+        return min(self._max_streams, max(self._min_streams, need))
+
+    def _rebalance(self) -> None:
+        slots = self._slots()
+        if slots * self._capacity < len(self._desired):
+            self.log.error("Not enough stream capacity for subscriptions",
+                           extra={"instruments": len(self._desired),
+                                  "capacity": slots * self._capacity})
+        while len(self._streams) < slots:
+            stream = MarketDataStream(self, len(self._streams), self._chunk_size)
+            self._streams.append(stream)
+            if self.running:
+                stream.start()
+        surplus = self._streams[slots:]
+        del self._streams[slots:]
+        placement = place(self._desired, slots, self._capacity)
+        by_slot: List[Set[str]] = [set() for _ in range(slots)]
+        for uid, slot in placement.items():
+            by_slot[slot].add(uid)
+        moved = sum(len(s.uids - by_slot[s.index]) for s in self._streams)
+        moved += sum(len(s.uids) for s in surplus)
+        for stream in self._streams:
+            stream.assign(by_slot[stream.index])
+        for stream in surplus:
+            self._close_stream(stream)
+        self.log.debug("Subscriptions rebalanced",
+                       extra={"streams": slots, "instruments": len(placement), "moved": moved})
+
+    def _close_stream(self, stream: MarketDataStream) -> None:
+        """Закрыть лишний стрим; его инструменты уже разложены по оставшимся."""
+        self.log.info("Market data stream closed", extra={"stream": stream.index})
+        if not self.running:
+            return
+        task = asyncio.create_task(stream.stop())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _sync_loop(self) -> None:
+        """Повторы отклонённых и неподтверждённых подписок."""
+        while True:
+            await asyncio.sleep(self._sync_interval)
+            for stream in self._streams:
+                stream.sync()
+
+    async def start(self) -> None:
+        self.running = True
+        self._rebalance()
+        for stream in self._streams:
+            stream.start()
+        if self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        self.running = False
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        await asyncio.gather(*(s.stop() for s in self._streams), *self._closing)
+        self.log.info("Market data streams stopped", extra={"streams": self.stats()})
@@ -1,24 +1,28 @@
-from typing import Optional
-
-from clients.tinkoff.client import TClient
+from clients.tinkoff.catalog import InstrumentCatalog
 from config import Config
 from database.redis.client import RedisClient
 from utils.logger import get_logger
+from utils.single_flight import single_flight
 
 
 class NameService:
     """
     Резолвит имя инструмента по UID в порядке:
-    Redis -> Tinkoff API, с записью обратно в Redis.
+    Redis -> справочник инструментов (БД, для неизвестных — Tinkoff API),
+    с записью обратно в Redis. Если имя не нашлось нигде, возвращается сам UID
+    (в кэш он не пишется), так что результат всегда пригоден для текста.
+    Одновременные запросы одного UID делят один поход в Redis и справочник.
     """
 
-    def __init__(self, redis_client: RedisClient, tclient: TClient, cfg: Config.NameCache):
+    def __init__(self, redis_client: RedisClient, catalog: InstrumentCatalog,
+                 cfg: Config.NameCache):
         self.redis_client = redis_client
-        self.tclient = tclient
+        self.catalog = catalog
         self.cfg = cfg
         self.log = get_logger(self.__class__.__name__)
 
-    async def get_name(self, instrument_uid: str) -> Optional[str]:
+    @single_flight
+    async def get_name(self, instrument_uid: str) -> str:
         try:
             name = await self.redis_client.get_name(instrument_uid, self.cfg.namespace)
             if name:
@@ -27,10 +31,14 @@ class NameService:
         except Exception as e:
             self.log.error("Error while GETTING name from cache", extra={"exception": e})
 
-        name = await self.tclient.get_name_by_id(instrument_uid)
+        entry = await self.catalog.get(instrument_uid)
+        if entry is None:
+            self.log.warning("Name not found, use UID", extra={"instrument_id": instrument_uid})
+            return instrument_uid
+        name = entry.name
         try:
             await self.redis_client.set_name(instrument_uid, name, self.cfg.ttl, self.cfg.namespace)
-            self.log.debug("Got name from Tinkoff API and put Redis", extra={"instrument_name": name})
+            self.log.debug("Got name from catalog and put Redis", extra={"instrument_name": name})
         except Exception as e:
             self.log.error("Error while SETTING name to cache", extra={"exception": e})
         return name
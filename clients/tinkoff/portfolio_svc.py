@@ -1,8 +1,11 @@
+import asyncio
 import logging
+import time
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
+import tinkoff.invest as ti
 from pydantic import BaseModel
 from tinkoff.invest.utils import quotation_to_decimal as q2d, money_to_decimal as m2d
 
@@ -20,12 +23,62 @@ class PortfolioOut(BaseModel):
 
 
 class PortfolioService:
-    def __init__(self, tclient: TClient, redis: RedisClient):
+    """
+    Метрики портфелей (стоимость, доходность) для расчёта объёма позиции.
+
+    Порядок: память процесса (TTL) -> Redis -> Tinkoff API. Портфельный стрим
+    обновляет оба слоя через update_from_stream, поэтому в горячем пути сигнала
+    данные обычно уже лежат в памяти и REST не нужен.
+    """
+
+    def __init__(self, tclient: TClient, redis: RedisClient, ttl_sec: float = 60.0):
         self._redis = redis
         self._tclient = tclient
+        self._ttl = ttl_sec
+        # account_id -> (PortfolioOut, monotonic-время истечения)
+        self._local: Dict[str, Tuple[PortfolioOut, float]] = {}
+        self._names: Dict[str, str] = {}
         self.log = logging.getLogger(self.__class__.__name__)
 
+    def _remember(self, result: PortfolioOut) -> None:
+        self._names[result.account_id] = result.name
+        self._local[result.account_id] = (result, time.monotonic() + self._ttl)
+
+    async def _store(self, result: PortfolioOut) -> None:
+        self._remember(result)
+        try:
+            await self._redis.set_portfolio_metrics(
+                account_id=result.account_id,
+                total_amount=str(result.total_amount),
+                name=result.name,
+                expected_yield_percent=str(result.expected_yield_percent),
+                ts_ms=int(datetime.now().timestamp() * 1000)
+            )
+        except Exception as e:
+            self.log.error(f"Redis error: {e}", extra={"account_id": result.account_id})
+
+    async def update_from_stream(self, portfolio: ti.PortfolioResponse) -> None:
+        """
+        Свежий портфель из portfolio_stream — сразу в память и Redis. Имя
+        аккаунта, если его ещё не спрашивали, подставляется при чтении.
+        """
+        await self._store(PortfolioOut(
+            account_id=portfolio.account_id,
+            name=self._names.get(portfolio.account_id, ""),
+            total_amount=m2d(portfolio.total_amount_portfolio),
+            expected_yield_percent=q2d(portfolio.expected_yield),
+        ))
+
     async def get_portfolio(self, acc_id: str, name: str) -> Optional[PortfolioOut]:
+        self._names[acc_id] = name
+        cached = self._local.get(acc_id)
+        if cached is not None and cached[1] > time.monotonic():
+            result = cached[0]
+            if result.name != name:
+                result = result.model_copy(update={"name": name})
+                self._remember(result)
+            return result
+
         data = await self._redis.get_portfolio_metrics(acc_id)
         if data:
             result = PortfolioOut(
@@ -34,6 +87,7 @@ class PortfolioService:
                 total_amount=Decimal(data["total_amount"]),
                 expected_yield_percent=Decimal(data["expected_yield_percent"]),
             )
+            self._remember(result)
             return result
 
         portfolio = None
@@ -49,15 +103,24 @@ class PortfolioService:
                 total_amount=m2d(portfolio.total_amount_portfolio),
                 expected_yield_percent=q2d(portfolio.expected_yield),
             )
-            try:
-                await self._redis.set_portfolio_metrics(
-                    account_id=acc_id,
-                    total_amount=str(result.total_amount),
-                    name=name,
-                    expected_yield_percent=str(result.expected_yield_percent),
-                    ts_ms=int(datetime.now().timestamp() * 1000)
-                )
-                return result
-            except Exception as e:
-                self.log.error(f"Redis error: {e}", extra={"account_id": acc_id})
+            await self._store(result)
+            return result
         return None
+
+    async def list_portfolios(self, db: Repository) -> List[PortfolioOut]:
+        """Портфели всех аккаунтов; аккаунты запрашиваются параллельно."""
+        async with db.session_factory() as s:
+            accounts = await db.list_accounts(s)
+
+        results = await asyncio.gather(
+            *(self.get_portfolio(a.account_id, a.name) for a in accounts),
+            return_exceptions=True,
+        )
+        portfolios: List[PortfolioOut] = []
+        for account, result in zip(accounts, results):
+            if isinstance(result, Exception):
+                self.log.error(f"Portfolio error: {result}",
+                               extra={"account_id": account.account_id})
+            elif result is not None:
+                portfolios.append(result)
+        return portfolios
@@ -0,0 +1,102 @@
+import asyncio
+import datetime as dt
+import time
+from typing import Dict, Iterable, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from clients.tinkoff.catalog import InstrumentCatalog
+from clients.tinkoff.client import TClient
+from database.redis.client import RedisClient
+from utils.logger import get_logger
+from utils.utils import price_point
+
+TZ_MOSCOW = ZoneInfo("Europe/Moscow")
+
+
+class PricePointService:
+    """
+    Стоимость пункта цены фьючерса (GetFuturesMargin) с кэшем:
+    память процесса -> Redis -> Tinkoff API.
+
+    - фьючерс: значение живёт до конца торгового дня (полночь МСК) — ГО и
+      стоимость шага меняются на клиринге;
+    - не фьючерс: негативная запись на negative_ttl, чтобы не платить
+      неудачным запросом к API за каждый сигнал.
+    Временные ошибки API не кэшируются. С catalog тип берётся из справочника:
+    для известного не-фьючерса GetFuturesMargin не вызывается.
+    """
+
+    def __init__(self, redis: RedisClient, tclient: TClient, negative_ttl: int = 7 * 24 * 3600,
+                 tz: ZoneInfo = TZ_MOSCOW, concurrency: int = 5,
+                 catalog: Optional[InstrumentCatalog] = None):
+        self._redis = redis
+        self._tclient = tclient
+        self._catalog = catalog
+        self._negative_ttl = negative_ttl
+        self._tz = tz
+        self._concurrency = concurrency
+        # uid -> (значение или None для «не фьючерс», monotonic-время истечения)
+        self._local: Dict[str, Tuple[Optional[float], float]] = {}
+        self.log = get_logger(self.__class__.__name__)
+
+    def _ttl_until_day_end(self) -> int:
+        now = dt.datetime.now(self._tz)
+        midnight = dt.datetime.combine(now.date() + dt.timedelta(days=1), dt.time(), self._tz)
+        return max(1, int((midnight - now).total_seconds()))
+
+    def _remember(self, uid: str, value: Optional[float], ttl_sec: int) -> None:
+        self._local[uid] = (value, time.monotonic() + ttl_sec)
+
+    async def get(self, instrument_uid: str) -> Optional[float]:
+        """Стоимость пункта или None, если инструмент не фьючерс или API недоступно."""
+        cached = self._local.get(instrument_uid)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+
+        try:
+            data = await self._redis.get_price_point(instrument_uid)
+            if data is not None:
+                value = data.get("value")
+                ttl = self._ttl_until_day_end() if value is not None else self._negative_ttl
+                self._remember(instrument_uid, value, ttl)
+                return value
+        except Exception as e:
+            self.log.error("Error while GETTING price point from cache", extra={"exception": e})
+
+        try:
+            if await self._is_futures(instrument_uid):
+                margin = await self._tclient.get_min_price_increment_amount(uid=instrument_uid)
+            else:
+                margin = None
+        except Exception as e:
+            self.log.error("Error while getting futures margin",
+                           extra={"instrument_id": instrument_uid, "exception": e})
+            return None
+
+        value = price_point(margin) if margin else None
+        ttl = self._ttl_until_day_end() if value is not None else self._negative_ttl
+        self._remember(instrument_uid, value, ttl)
+        try:
+            await self._redis.set_price_point(instrument_uid, value, ttl)
+        except Exception as e:
+            self.log.error("Error while SETTING price point to cache", extra={"exception": e})
+        return value
+
+    async def _is_futures(self, instrument_uid: str) -> bool:
+        """Без справочника (или если тип неизвестен) решает GetFuturesMargin."""
+        if self._catalog is None:
+            return True
+        entry = await self._catalog.get(instrument_uid)
+        return entry is None or entry.type in (None, "futures")
+
+    async def warm(self, instrument_ids: Iterable[str]) -> None:
+        """Прогреть кэш (открытие торгов), не больше concurrency запросов одновременно."""
+        sem = asyncio.Semaphore(self._concurrency)
+
+        async def _one(uid: str) -> None:
+            async with sem:
+                await self.get(uid)
+
+        ids = list(instrument_ids)
+        await asyncio.gather(*(_one(uid) for uid in ids), return_exceptions=True)
+        self.log.info("Price point cache warmed", extra={"count": len(ids)})
@@ -0,0 +1,104 @@
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+
+from utils.logger import get_logger
+
+
+def chunked(items: Iterable[str], size: int) -> List[List[str]]:
+    items = sorted(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class SubscriptionSet:
+    """
+    Подписки одного стрима: желаемые, подтверждённые брокером и «в полёте».
+
+    delta() отдаёт только разницу между желаемым и тем, что уже подтверждено
+    или отправлено и ждёт ответа; подтверждение (confirm) и отказ (reject)
+    приходят из SubscribeLastPriceResponse. Отклонённые uid повторяются с
+    экспоненциальной паузой, неподтверждённые за ack_timeout — отправляются
+    заново. Подтверждение подписки, снятой пока она была «в полёте», оставляет
+    uid в confirmed: брокер его держит, и ближайший delta() его отпишет.
+    После переподключения reset() обнуляет состояние стрима.
+    """
+
+    def __init__(self, ack_timeout: float = 30.0, retry_base: float = 5.0,
+                 retry_max: float = 300.0):
+        self.desired: Set[str] = set()
+        self.confirmed: Set[str] = set()
+        self._subscribing: Dict[str, float] = {}  # uid -> время отправки
+        self._unsubscribing: Dict[str, float] = {}
+        self._rejected: Dict[str, Tuple[int, float]] = {}  # uid -> (попыток, retry_at)
+        self._ack_timeout = ack_timeout
+        self._retry_base = retry_base
+        self._retry_max = retry_max
+        self.log = get_logger(self.__class__.__name__)
+
+    def stats(self) -> dict:
+        return {
+            "desired": len(self.desired),
+            "confirmed": len(self.confirmed),
+            "pending": len(self._subscribing) + len(self._unsubscribing),
+            "rejected": len(self._rejected),
+        }
+
+    def set_desired(self, uids: Iterable[str]) -> None:
+        self.desired = set(uids)
+        for uid in list(self._rejected):
+            if uid not in self.desired:
+                del self._rejected[uid]
+
+    def reset(self) -> None:
+        """Новый стрим: на брокере ничего нет, отказы можно пробовать сразу."""
+        self.confirmed.clear()
+        self._subscribing.clear()
+        self._unsubscribing.clear()
+        self._rejected.clear()
+
+    def delta(self) -> Tuple[Set[str], Set[str]]:
+        """(подписать, отписать) сейчас; отданные uid помечаются как отправленные."""
+        now = time.monotonic()
+        expired = now - self._ack_timeout
+        add = {
+            uid for uid in self.desired - self.confirmed
+            if self._subscribing.get(uid, expired) <= expired
+            and self._rejected.get(uid, (0, now))[1] <= now
+        }
+        # отписываем только подтверждённое: подписка «в полёте» отпишется
+        # следующим проходом, когда придёт её ответ
+        remove = {
+            uid for uid in self.stale()
+            if self._unsubscribing.get(uid, expired) <= expired
+        }
+        for uid in add:
+            self._subscribing[uid] = now
+        for uid in remove:
+            self._unsubscribing[uid] = now
+        return add, remove
+
+    def stale(self) -> Set[str]:
+        """Подтверждённые брокером, но уже не нужные uid (ждут отписки)."""
+        return self.confirmed - self.desired
+
+    def confirm(self, uid: str) -> None:
+        if self._unsubscribing.pop(uid, None) is not None:
+            self.confirmed.discard(uid)
+            return
+        self._subscribing.pop(uid, None)
+        self._rejected.pop(uid, None)
+        self.confirmed.add(uid)
+
+    def reject(self, uid: str, status: object = None) -> None:
+        if self._unsubscribing.pop(uid, None) is not None:
+            # отписка не прошла — считаем, что подписки уже нет
+            self.confirmed.discard(uid)
+            return
+        self._subscribing.pop(uid, None)
+        if uid not in self.desired:
+            return  # подписка уже не нужна — повторять нечего
+        attempts = self._rejected.get(uid, (0, 0.0))[0] + 1
+        pause = min(self._retry_max, self._retry_base * 2 ** (attempts - 1))
+        self._rejected[uid] = (attempts, time.monotonic() + pause)
+        self.log.warning("Subscription rejected, will retry",
+                         extra={"instrument_id": uid, "status": str(status),
+                                "attempts": attempts, "retry_in_sec": pause})
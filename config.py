@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -6,10 +6,22 @@ from pydantic import BaseModel, Field, ConfigDict
 class Config(BaseModel):
     class TinkoffClient(BaseModel):
         token: str = Field(...)
+        # общий gRPC-канал закрывается после стольких секунд без запросов
+        channel_idle_sec: int = Field(300)
+        # потолок одновременных unary-запросов; скорость — по тарифу GetUserTariff
+        max_concurrency: int = Field(12)
+        # подписки last_price раскладываются по пулу рыночных стримов
+        md_streams: int = Field(2)
+        md_streams_max: int = Field(8)
+        md_stream_capacity: int = Field(300)
 
     class TgBot(BaseModel):
         token: str = Field(...)
         chat_id: int = Field(...)
+        # лимиты Bot API и склейка сигналов в дайджест
+        global_rate: float = Field(25.0)
+        chat_rate: float = Field(1.0)
+        digest_window_ms: int = Field(1500)
 
     class DbPsql(BaseModel):
         address: str = Field(...)
@@ -18,6 +30,7 @@ class Config(BaseModel):
         start: str = Field(...)
         close: str = Field(...)
         check_expiration_date: str = Field(...)
+        catalog_sync: str = Field("06:30")
 
     class Redis(BaseModel):
         host: str = Field(...)
@@ -28,17 +41,56 @@ class Config(BaseModel):
         decode_responses: bool = Field(...)
         socket_timeout: int = Field(...)
         retry_on_timeout: bool = Field(...)
+        # батч-запись последних цен из рыночного потока
+        last_price_batch_size: int = Field(200)
+        last_price_flush_ms: int = Field(50)
 
     class NameCache(BaseModel):
         ttl: int = Field(...)
         namespace: str = Field(...)
 
+    class StreamBus(BaseModel):
+        class Batch(BaseModel):
+            size: int = Field(...)
+            wait_ms: int = Field(0)
+
+        maxsize: int = Field(10000)
+        # шарды по умолчанию и переопределения по топикам
+        shards: int = Field(1)
+        topic_shards: Dict[str, int] = Field(default_factory=lambda: {"portfolio_stream": 4})
+        # block | drop_newest | drop_oldest | conflate
+        topic_policy: Dict[str, str] = Field(
+            default_factory=lambda: {"md.last_price": "conflate"}
+        )
+        # пакетная доставка подписчикам топика
+        topic_batch: Dict[str, Batch] = Field(default_factory=lambda: {
+            "md.last_price": {"size": 500, "wait_ms": 0},
+            "portfolio_stream": {"size": 20, "wait_ms": 200},
+        })
+
+    class Journal(BaseModel):
+        directory: str = Field(...)
+        segment_mb: int = Field(64)
+        flush_ms: int = Field(1000)
+        topics: Optional[List[str]] = Field(
+            default_factory=lambda: ["md.last_price", "portfolio_stream"]
+        )
+
+    class Metrics(BaseModel):
+        host: str = Field("0.0.0.0")
+        port: int = Field(9108)
+
     tinkoff_client: TinkoffClient = Field(..., alias="tinkoff-client")
     tg_bot: TgBot = Field(..., alias="tg-bot")
     db_pgsql: DbPsql = Field(..., alias="db-pgsql")
     scheduler_trading: SchedulerTrading = Field(..., alias="scheduler-trading")
     redis: Redis = Field(..., alias="redis")
     name_cache: NameCache = Field(..., alias="name-cache")
+    stream_bus: StreamBus = Field(default_factory=StreamBus, alias="stream-bus")
+    # журнал событий стримов для разбора и воспроизведения; выключен, если секции нет
+    journal: Optional[Journal] = None
+    # эндпоинт /metrics для Prometheus; выключен, если секции нет
+    metrics: Optional[Metrics] = None
 
     logging: Optional[dict] = None
 
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import enum
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+
+from core.domains.trigger_index import BAND_FLAT, BAND_LONG, BAND_SHORT, TriggerIndex
+
+
+class SignalKind(str, enum.Enum):
+    BREAKOUT_LONG = "breakout_long"
+    BREAKOUT_SHORT = "breakout_short"
+    STOP_LONG = "stop_long"
+    STOP_SHORT = "stop_short"
+
+
+class Breakout(NamedTuple):
+    instrument_id: str
+    kind: SignalKind
+    price: float
+
+
+class BreakoutEvaluator:
+    """
+    Векторная проверка пробоев по пачке тиков поверх TriggerIndex.
+
+    Вся пачка сравнивается с полосами индекса за один проход NumPy; для
+    вышедших из полосы тип сигнала определяется по коду полосы и стороне выхода:
+    - LONG:  price <= donchian_short_20  -> STOP_LONG
+    - SHORT: price >= donchian_long_20   -> STOP_SHORT
+    - без позиции (и donchian_long_55 задан):
+        price >= donchian_long_55  -> BREAKOUT_LONG
+        price <= donchian_short_55 -> BREAKOUT_SHORT
+    """
+
+    def __init__(self, index: TriggerIndex):
+        self._index = index
+
+    def evaluate(self, instrument_ids: Sequence[str], prices: Sequence[float]) -> List[Breakout]:
+        """
+        Проверить пачку тиков; вернуть только пересечения уровней.
+        На инструмент — не больше одного сигнала за пачку (первый по порядку тиков).
+        """
+        if not instrument_ids:
+            return []
+        price = np.asarray(prices, dtype=np.float64)
+        crossed, kind, up = self._index.exits(instrument_ids, price)
+
+        result: List[Breakout] = []
+        seen = set()
+        for i in np.flatnonzero(crossed):
+            uid = instrument_ids[i]
+            if uid in seen:
+                continue
+            seen.add(uid)
+            if kind[i] == BAND_LONG:
+                signal = SignalKind.STOP_LONG
+            elif kind[i] == BAND_SHORT:
+                signal = SignalKind.STOP_SHORT
+            elif kind[i] == BAND_FLAT:
+                signal = SignalKind.BREAKOUT_LONG if up[i] else SignalKind.BREAKOUT_SHORT
+            else:
+                continue
+            result.append(Breakout(uid, signal, float(price[i])))
+        return result
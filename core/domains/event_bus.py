@@ -1,57 +1,359 @@
 from __future__ import annotations
 import asyncio
+import enum
+import itertools
 import logging
-from collections import defaultdict
-from typing import Awaitable, Callable, Dict, List, Any
+import time
+import zlib
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import (Awaitable, Callable, Deque, Dict, Hashable, Iterable, List, Any, Optional,
+                    Set, Tuple)
+
+from utils.metrics import METRICS, Counter, Histogram, MetricsRegistry
 
 Handler = Callable[[Any], Awaitable[None]]
+BatchHandler = Callable[[List[Any]], Awaitable[None]]
+KeyFn = Callable[[Any], Optional[Hashable]]
+Sink = Callable[[str, Any], None]
+
+_STOP = object()
+
+
+class OverflowPolicy(str, enum.Enum):
+    """Что делать, когда шард топика заполнен."""
+    BLOCK = "block"  # publish ждёт свободного места
+    DROP_NEWEST = "drop_newest"  # новое событие отбрасывается
+    DROP_OLDEST = "drop_oldest"  # вытесняется самое старое событие шарда
+    # ожидающее событие с тем же ключом заменяется новым (на своём месте в очереди);
+    # новый ключ при переполнении вытесняет самое старое событие
+    CONFLATE = "conflate"
+
+
+def _shard_of(key: Optional[Hashable], shards: int) -> int:
+    """Стабильный номер шарда по ключу; события без ключа — в шард 0."""
+    if key is None or shards == 1:
+        return 0
+    if isinstance(key, str):
+        return zlib.crc32(key.encode()) % shards
+    return hash(key) % shards
+
+
+@dataclass(slots=True)
+class _Subscription:
+    handler: Callable[[Any], Awaitable[None]]
+    batch_size: int = 0  # 0 — поштучная доставка
+    batch_wait: float = 0.0
+    name: str = field(default="")
+
+
+class _Shard:
+    """
+    Ограниченная очередь шарда: порядок ключей в deque, значения в dict
+    вместе с моментом постановки (для метрики ожидания в очереди).
+    """
+
+    def __init__(self, topic: _Topic, maxsize: int):
+        self._topic = topic
+        self._maxsize = maxsize
+        self._order: Deque[Hashable] = deque()
+        self._items: Dict[Hashable, Any] = {}
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def _full(self) -> bool:
+        return 0 < self._maxsize <= len(self._order)
+
+    def _append(self, slot: Hashable, data: Any) -> None:
+        self._order.append(slot)
+        self._items[slot] = (data, time.monotonic())
+        self._not_empty.set()
+        if self._full():
+            self._not_full.clear()
+
+    def _drop_oldest(self) -> None:
+        slot = self._order.popleft()
+        del self._items[slot]
+        self._topic.dropped.inc()
+
+    async def put(self, key: Optional[Hashable], data: Any) -> None:
+        topic = self._topic
+        policy = topic.policy
+        if policy == OverflowPolicy.CONFLATE and key is not None:
+            slot = ("key", key)
+            if slot in self._items:
+                # время постановки остаётся от первого события слота
+                self._items[slot] = (data, self._items[slot][1])
+                topic.conflated.inc()
+                return
+        else:
+            slot = ("seq", next(topic.seq))
+
+        if self._full():
+            if policy == OverflowPolicy.BLOCK:
+                topic.blocked.inc()
+                while self._full():
+                    self._not_full.clear()
+                    await self._not_full.wait()
+            elif policy == OverflowPolicy.DROP_NEWEST:
+                topic.dropped.inc()
+                return
+            else:
+                self._drop_oldest()
+        self._append(slot, data)
+
+    def put_stop(self) -> None:
+        self._order.append(_STOP)
+        self._items[_STOP] = (_STOP, time.monotonic())
+        self._not_empty.set()
+
+    async def get(self) -> Any:
+        while not self._order:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return self._pop()
+
+    def _pop(self) -> Any:
+        slot = self._order.popleft()
+        data, enqueued = self._items.pop(slot)
+        if slot is not _STOP:
+            self._topic.wait.observe(time.monotonic() - enqueued)
+        if not self._full():
+            self._not_full.set()
+        return data
+
+    async def get_batch(self, max_items: int, wait: float) -> List[Any]:
+        """
+        Дождаться первого события и забрать до max_items; если их меньше,
+        подождать добора не дольше wait секунд. Маркер остановки завершает пачку.
+        """
+        batch = [await self.get()]
+        deadline = time.monotonic() + wait
+        while len(batch) < max_items and batch[-1] is not _STOP:
+            if not self._order:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                self._not_empty.clear()
+                try:
+                    await asyncio.wait_for(self._not_empty.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                continue
+            batch.append(self._pop())
+        return batch
+
+
+class _Topic:
+    """Топик шины: N шардов, по воркеру на шард, счётчики и метрики."""
+
+    def __init__(self, name: str, shards: int, maxsize: int, key: Optional[KeyFn],
+                 policy: OverflowPolicy, metrics: MetricsRegistry):
+        self.name = name
+        self.key = key
+        self.policy = policy
+        self.seq = itertools.count()
+        self.shards: List[_Shard] = [_Shard(self, maxsize) for _ in range(shards)]
+        self.tasks: List[asyncio.Task] = []
+        self.published: Counter = metrics.counter(
+            "stream_bus_published_total", "Events published to topic", topic=name)
+        self.dropped: Counter = metrics.counter(
+            "stream_bus_dropped_total", "Events dropped by overflow policy", topic=name)
+        self.conflated: Counter = metrics.counter(
+            "stream_bus_conflated_total", "Events replaced by a newer one", topic=name)
+        self.blocked: Counter = metrics.counter(
+            "stream_bus_blocked_total", "Publishes that waited for free space", topic=name)
+        self.wait: Histogram = metrics.histogram(
+            "stream_bus_wait_seconds", "Enqueue to dequeue time", topic=name)
+        metrics.gauge("stream_bus_queue_depth", self.depth, "Pending events", topic=name)
+
+    def depth(self) -> int:
+        return sum(len(s) for s in self.shards)
+
+    def stats(self) -> dict:
+        return {
+            "topic": self.name,
+            "policy": self.policy.value,
+            "published": int(self.published.value),
+            "dropped": int(self.dropped.value),
+            "conflated": int(self.conflated.value),
+            "blocked": int(self.blocked.value),
+            "pending": self.depth(),
+            "wait": self.wait.snapshot(),
+        }
 
 
 class StreamBus:
-    def __init__(self, maxsize: int = 10000):
-        self.q: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
-        self._subs: Dict[str, List[Handler]] = defaultdict(list)
-        self._task: asyncio.Task | None = None
-        self._stop = asyncio.Event()
+    """
+    Шина событий стримов: у каждого топика свои воркеры.
+
+    Топик делится на shards очередей; событие попадает в шард по key(data)
+    (например, instrument_uid или account_id). Внутри шарда события и
+    обработчики идут строго по порядку, поэтому порядок по ключу сохраняется,
+    а разные ключи и разные топики обрабатываются параллельно: медленный
+    PortfolioHandler больше не держит тики рынка.
+
+    Переполнение шарда решается политикой топика (OverflowPolicy); с любой
+    политикой, кроме BLOCK, publish не ждёт обработчик и не тормозит чтение стрима.
+    """
+
+    def __init__(self, maxsize: int = 10000, shards: int = 1,
+                 topic_shards: Optional[Dict[str, int]] = None,
+                 topic_policy: Optional[Dict[str, OverflowPolicy]] = None,
+                 metrics: MetricsRegistry = METRICS):
+        self._metrics = metrics
+        self._maxsize = maxsize
+        self._default_shards = shards
+        self._topic_shards: Dict[str, int] = dict(topic_shards or {})
+        self._policies: Dict[str, OverflowPolicy] = {
+            t: OverflowPolicy(p) for t, p in (topic_policy or {}).items()
+        }
+        self._keys: Dict[str, KeyFn] = {}
+        self._topics: Dict[str, _Topic] = {}
+        self._subs: Dict[str, List[_Subscription]] = defaultdict(list)
+        self._sinks: List[Tuple[Sink, Optional[Set[str]]]] = []
+        self._running = False
         self.log = logging.getLogger(self.__class__.__name__)
 
-    def subscribe(self, topic: str, handler: Handler) -> None:
-        """topic — строка/тип, например 'last_price', 'candle:1m', 'orderbook'."""
-        self._subs[topic].append(handler)
+    def configure(self, topic: str, key: Optional[KeyFn] = None,
+                  shards: Optional[int] = None,
+                  policy: Optional[OverflowPolicy] = None) -> None:
+        """Ключ шардирования, число шардов и политика переполнения; вызывать до start()."""
+        if topic in self._topics:
+            raise RuntimeError(f"Topic {topic} is already started")
+        if key is not None:
+            self._keys[topic] = key
+        if shards is not None:
+            self._topic_shards[topic] = shards
+        if policy is not None:
+            self._policies[topic] = OverflowPolicy(policy)
+
+    def subscribe(self, topic: str, handler: Handler | BatchHandler,
+                  batch_size: Optional[int] = None, batch_wait_ms: int = 0) -> None:
+        """
+        topic — строка/тип, например 'last_price', 'candle:1m', 'orderbook'.
+        batch_size задан — handler получает список: до batch_size событий шарда,
+        набранных не дольше batch_wait_ms после первого.
+        """
+        if self._running and topic in self._topics:
+            raise RuntimeError(f"Topic {topic} is already started")
+        name = getattr(handler, "__qualname__", repr(handler))
+        self._subs[topic].append(
+            _Subscription(handler, batch_size or 0, batch_wait_ms / 1000, name)
+        )
+        if self._running:
+            self._ensure_topic(topic)
+
+    def add_sink(self, sink: Sink, topics: Optional[Iterable[str]] = None) -> None:
+        """
+        sink(topic, data) вызывается синхронно на каждый publish (до очереди и
+        политик переполнения), например JournalWriter.write. topics=None — все топики.
+        """
+        self._sinks.append((sink, set(topics) if topics is not None else None))
+
+    def _ensure_topic(self, name: str) -> _Topic:
+        topic = self._topics.get(name)
+        if topic is None:
+            shards = max(1, self._topic_shards.get(name, self._default_shards))
+            policy = self._policies.get(name, OverflowPolicy.BLOCK)
+            topic = _Topic(name, shards, self._maxsize, self._keys.get(name), policy,
+                           self._metrics)
+            for i, shard in enumerate(topic.shards):
+                topic.tasks.append(asyncio.create_task(self._loop(name, i, shard)))
+            self._topics[name] = topic
+            self.log.info("Topic started", extra={"topic": name, "shards": shards,
+                                                  "policy": policy.value})
+        return topic
+
+    def stats(self) -> List[dict]:
+        return [t.stats() for t in self._topics.values()]
 
     async def publish(self, topic: str, data: Any) -> None:
-        try:
-            self.log.debug("publish", extra={"data": data, "topic": topic})
-            await self.q.put((topic, data))
-        except asyncio.CancelledError:
-            raise
-
-    async def _loop(self) -> None:
-        self.log.debug("_loop_start", extra={"is_stop": not self._stop.is_set()})
-        while not self._stop.is_set():
-            topic, data = await self.q.get()
-            self.log.debug("get", extra={"data": data, "topic": topic})
-            try:
-                for h in self._subs.get(topic, []):
-                    self.log.debug("Go handler", extra={"data": data, "h": h.__name__, "topic": topic})
-                    # параллельно, но без потери исключений
-                    await h(data)
-            except Exception as e:
-                self.log.error(f"{e}", exc_info=True)
-            finally:
-                self.q.task_done()
+        for sink, topics in self._sinks:
+            if topics is None or topic in topics:
+                try:
+                    sink(topic, data)
+                except Exception as e:
+                    self.log.error(f"Sink error: {e}", extra={"topic": topic})
+        t = self._topics.get(topic)
+        if t is None:
+            if topic in self._subs:
+                # подписчики есть, но шина ещё не запущена (или уже остановлена)
+                self._metrics.counter("stream_bus_dropped_total", topic=topic).inc()
+                self.log.warning("Topic not started, drop", extra={"topic": topic})
+            else:
+                self.log.debug("No subscribers, drop", extra={"topic": topic})
+            return
+        key = t.key(data) if t.key is not None else None
+        t.published.inc()
+        self.log.debug("publish", extra={"data": data, "topic": topic})
+        await t.shards[_shard_of(key, len(t.shards))].put(key, data)
+
+    async def _loop(self, topic: str, shard_no: int, shard: _Shard) -> None:
+        self.log.debug("_loop_start", extra={"topic": topic, "shard": shard_no})
+        subs = self._subs.get(topic, [])
+        # гистограммы времени обработчиков — один раз на воркер, не на событие
+        timed = [(sub, self._metrics.histogram("stream_bus_handler_seconds", "Handler call time",
+                                               topic=topic, handler=sub.name))
+                 for sub in subs]
+        max_items = max((s.batch_size for s in subs), default=0)
+        wait = max((s.batch_wait for s in subs), default=0.0)
+        while True:
+            if max_items > 1:
+                events = await shard.get_batch(max_items, wait)
+            else:
+                events = [await shard.get()]
+            stop = events[-1] is _STOP
+            if stop:
+                events.pop()
+            if events:
+                await self._dispatch(topic, shard_no, timed, events)
+            if stop:
+                return
+
+    async def _dispatch(self, topic: str, shard_no: int,
+                        subs: List[Tuple[_Subscription, Histogram]], events: List[Any]) -> None:
+        for sub, took in subs:
+            if sub.batch_size:
+                calls = [events[i:i + sub.batch_size]
+                         for i in range(0, len(events), sub.batch_size)]
+            else:
+                calls = events
+            for arg in calls:
+                started = time.perf_counter()
+                try:
+                    await sub.handler(arg)
+                except Exception as e:
+                    self._metrics.counter("stream_bus_handler_errors_total",
+                                          "Handler exceptions",
+                                          topic=topic, handler=sub.name).inc()
+                    self.log.error(f"{e}", exc_info=True,
+                                   extra={"topic": topic, "shard": shard_no})
+                finally:
+                    took.observe(time.perf_counter() - started)
 
     async def start(self):
-        if not self._task:
-            self._stop.clear()
-            self._task = asyncio.create_task(self._loop())
+        if not self._running:
+            self._running = True
+            for topic in list(self._subs):
+                self._ensure_topic(topic)
 
     async def stop(self):
-        if self._task:
-            self._stop.set()
-            await self.q.put(("_stop", None))
-            await self._task
-            self._task = None
+        if self._running:
+            self._running = False
+            topics, self._topics = self._topics, {}
+            for topic in topics.values():
+                for shard in topic.shards:
+                    shard.put_stop()
+            await asyncio.gather(*(t for topic in topics.values() for t in topic.tasks),
+                                 return_exceptions=True)
+            for topic in topics.values():
+                self._metrics.remove("stream_bus_queue_depth", topic=topic.name)
+                self.log.info("Topic stopped", extra=topic.stats())
 
 
 def handler(bus: StreamBus, topic: str):
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+from database.pgsql.repository import Repository
+
+
+@dataclass(slots=True)
+class InstrumentState:
+    """Всё, что нужно тиковому пути для принятия решения по инструменту."""
+    instrument_id: str
+    check: bool = False
+    to_notify: bool = True
+    donchian_long_55: Optional[float] = None
+    donchian_short_55: Optional[float] = None
+    donchian_long_20: Optional[float] = None
+    donchian_short_20: Optional[float] = None
+    # account_id -> direction
+    positions: Dict[str, Optional[str]] = field(default_factory=dict)
+
+    @property
+    def direction(self) -> Optional[str]:
+        return next(iter(self.positions.values()), None)
+
+
+Listener = Callable[[str, Optional[InstrumentState]], None]
+
+
+class InstrumentSnapshot:
+    """
+    Процесс-локальный снимок инструментов и позиций, ключ — instrument_uid.
+    Загружается один раз при старте TClient, дальше поддерживается писателями
+    (пересчёт индикаторов, PortfolioHandler, хендлеры бота), чтобы обработка
+    тика не ходила в БД.
+    """
+
+    FIELDS = (
+        "check",
+        "to_notify",
+        "donchian_long_55",
+        "donchian_short_55",
+        "donchian_long_20",
+        "donchian_short_20",
+    )
+
+    def __init__(self):
+        self._states: Dict[str, InstrumentState] = {}
+        self.loaded = False
+        self._listeners: List[Listener] = []
+        self.log = logging.getLogger(self.__class__.__name__)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def __contains__(self, instrument_id: str) -> bool:
+        return instrument_id in self._states
+
+    def get(self, instrument_id: str) -> Optional[InstrumentState]:
+        return self._states.get(instrument_id)
+
+    def states(self) -> Iterable[InstrumentState]:
+        return self._states.values()
+
+    def add_listener(self, listener: Listener) -> None:
+        """listener(uid, state) вызывается после каждого изменения; state=None — удалён."""
+        self._listeners.append(listener)
+
+    def _changed(self, instrument_id: str) -> None:
+        state = self._states.get(instrument_id)
+        for listener in self._listeners:
+            listener(instrument_id, state)
+
+    async def load(self, db: Repository) -> None:
+        """Полная перезагрузка снимка из БД одним запросом."""
+        states: Dict[str, InstrumentState] = {}
+        async with db.session_factory() as s:
+            rows = await db.list_instruments_with_positions(s)
+        for instrument, position in rows:
+            state = states.get(instrument.instrument_id)
+            if state is None:
+                state = InstrumentState(
+                    instrument_id=instrument.instrument_id,
+                    **{f: getattr(instrument, f) for f in self.FIELDS},
+                )
+                states[instrument.instrument_id] = state
+            if position is not None:
+                state.positions[position.account_id] = position.direction
+        changed = set(self._states) | set(states)
+        self._states = states
+        self.loaded = True
+        for uid in changed:
+            self._changed(uid)
+        self.log.info("Instrument snapshot loaded", extra={"count": len(states)})
+
+    # ---------- писатели ----------
+    def apply(self, instrument_id: str, values: Mapping[str, Any], coalesce: bool = False) -> None:
+        """
+        Применить патч полей к инструменту (создаёт запись, если её нет).
+        coalesce=True — None не затирает существующие значения (как upsert в Repository).
+        """
+        state = self._states.get(instrument_id)
+        if state is None:
+            state = InstrumentState(instrument_id=instrument_id)
+            self._states[instrument_id] = state
+        for f in self.FIELDS:
+            if f not in values:
+                continue
+            value = values[f]
+            if coalesce and value is None:
+                continue
+            setattr(state, f, value)
+        self._changed(instrument_id)
+
+    def apply_bulk(self, rows: Iterable[Mapping[str, Any]], coalesce: bool = True) -> None:
+        for row in rows:
+            self.apply(row["instrument_id"], row, coalesce=coalesce)
+
+    def set_notify(self, instrument_id: str, notify: bool) -> None:
+        state = self._states.get(instrument_id)
+        if state is not None:
+            state.to_notify = notify
+            self._changed(instrument_id)
+
+    def set_checked(self, ids: Iterable[str], check: bool = True) -> None:
+        for uid in ids:
+            self.apply(uid, {"check": check})
+
+    def set_position(self, account_id: str, instrument_id: str, direction: Optional[str]) -> None:
+        state = self._states.get(instrument_id)
+        if state is None:
+            state = InstrumentState(instrument_id=instrument_id)
+            self._states[instrument_id] = state
+        state.positions[account_id] = direction
+        self._changed(instrument_id)
+
+    def remove_positions(self, account_id: str,
+                         instrument_ids: Optional[Iterable[str]] = None) -> None:
+        """Снять позиции аккаунта: по списку инструментов или все (instrument_ids=None)."""
+        if instrument_ids is None:
+            states = list(self._states.values())
+        else:
+            states = [self._states[uid] for uid in instrument_ids if uid in self._states]
+        for state in states:
+            if account_id in state.positions:
+                del state.positions[account_id]
+                self._changed(state.instrument_id)
+
+    def remove(self, instrument_id: str) -> None:
+        if self._states.pop(instrument_id, None) is not None:
+            self._changed(instrument_id)
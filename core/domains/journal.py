@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import asyncio
+import mmap
+import os
+import pickle
+import struct
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from utils.logger import get_logger
+
+# запись: u32 длина тела | тело = f64 время приёма, u16 длина топика, топик, pickle payload
+_LEN = struct.Struct("<I")
+_HEAD = struct.Struct("<dH")
+SEGMENT_SUFFIX = ".seg"
+
+Record = Tuple[float, str, Any]
+Publish = Callable[[str, Any], Awaitable[None]]
+
+
+class JournalWriter:
+    """
+    Append-only журнал событий StreamBus в бинарные сегменты.
+
+    write() вызывается шиной синхронно при publish: запись кодируется и
+    уходит в буфер файла; на диск буфер сбрасывается раз в flush_ms и при
+    ротации. Сегмент закрывается и начинается новый, когда размер превысил
+    segment_bytes. Хвост, оборванный падением процесса, читатель пропускает.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024,
+                 flush_ms: int = 1000):
+        self._dir = Path(directory)
+        self._segment_bytes = segment_bytes
+        self._interval = flush_ms / 1000
+        self._file = None
+        self._size = 0
+        self._seq = 0
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.log = get_logger(self.__class__.__name__)
+
+    def _open_segment(self) -> None:
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._seq += 1
+        name = f"journal-{datetime.now():%Y%m%d-%H%M%S}-{self._seq:04d}{SEGMENT_SUFFIX}"
+        self._file = open(self._dir / name, "ab")
+        self._size = 0
+        self.log.info("Journal segment opened", extra={"segment": name})
+
+    def _close_segment(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def write(self, topic: str, data: Any) -> None:
+        try:
+            payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            self.log.error("Journal: payload is not serializable",
+                           extra={"topic": topic, "exception": e})
+            return
+        topic_b = topic.encode()
+        body_len = _HEAD.size + len(topic_b) + len(payload)
+        if self._file is None or self._size + body_len > self._segment_bytes:
+            self._close_segment()
+            self._open_segment()
+        self._file.write(_LEN.pack(body_len))
+        self._file.write(_HEAD.pack(time.time(), len(topic_b)))
+        self._file.write(topic_b)
+        self._file.write(payload)
+        self._size += _LEN.size + body_len
+        self.written += 1
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            self.flush()
+
+    async def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._close_segment()
+        self.log.info("Journal closed", extra={"written": self.written})
+
+
+class JournalReader:
+    """Чтение сегмента журнала через mmap; оборванная последняя запись игнорируется."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.log = get_logger(self.__class__.__name__)
+
+    @staticmethod
+    def segments(directory: str) -> List[Path]:
+        return sorted(Path(directory).glob(f"*{SEGMENT_SUFFIX}"))
+
+    def __iter__(self) -> Iterator[Record]:
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos, end = 0, len(mm)
+                while pos + _LEN.size <= end:
+                    (body_len,) = _LEN.unpack_from(mm, pos)
+                    start = pos + _LEN.size
+                    if start + body_len > end:
+                        self.log.warning("Journal: truncated tail record",
+                                         extra={"segment": str(self.path), "offset": pos})
+                        return
+                    ts, topic_len = _HEAD.unpack_from(mm, start)
+                    t0 = start + _HEAD.size
+                    topic = bytes(mm[t0:t0 + topic_len]).decode()
+                    data = pickle.loads(mm[t0 + topic_len:start + body_len])
+                    yield ts, topic, data
+                    pos = start + body_len
+
+    async def replay(self, publish: Publish, speed: Optional[float] = 1.0,
+                     topics: Optional[Iterable[str]] = None) -> int:
+        """
+        Прогнать записи через publish (например, StreamBus.publish другой шины
+        с теми же обработчиками). speed=1 — в исходном темпе, 10 — в 10 раз
+        быстрее, None/0 — без пауз. Возвращает число отправленных событий.
+        """
+        wanted = set(topics) if topics is not None else None
+        first_ts: Optional[float] = None
+        started = time.monotonic()
+        count = 0
+        for ts, topic, data in self:
+            if wanted is not None and topic not in wanted:
+                continue
+            if first_ts is None:
+                first_ts = ts
+            if speed:
+                delay = (ts - first_ts) / speed - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await publish(topic, data)
+            count += 1
+        return count
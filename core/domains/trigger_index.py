@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import math
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.domains.instrument_snapshot import InstrumentSnapshot, InstrumentState
+from database.pgsql.enums import Direction
+
+# какие триггеры образуют полосу инструмента
+BAND_NONE = 0  # нет активных триггеров — полоса (-inf, +inf)
+BAND_FLAT = 1  # без позиции: [donchian_short_55, donchian_long_55]
+BAND_LONG = 2  # лонг: стоп по donchian_short_20, сверху открыто
+BAND_SHORT = 3  # шорт: стоп по donchian_long_20, снизу открыто
+
+_INF = math.inf
+
+
+def band_for(state: InstrumentState) -> Tuple[int, float, float]:
+    """(код полосы, нижний триггер, верхний триггер) для состояния инструмента."""
+    if not (state.check and state.to_notify):
+        return BAND_NONE, -_INF, _INF
+    if state.positions:
+        direction = state.direction
+        if direction == Direction.LONG.value and state.donchian_short_20 is not None:
+            return BAND_LONG, state.donchian_short_20, _INF
+        if direction == Direction.SHORT.value and state.donchian_long_20 is not None:
+            return BAND_SHORT, -_INF, state.donchian_long_20
+        return BAND_NONE, -_INF, _INF
+    if not state.donchian_long_55:
+        return BAND_NONE, -_INF, _INF
+    lower = state.donchian_short_55 if state.donchian_short_55 is not None else -_INF
+    return BAND_FLAT, lower, state.donchian_long_55
+
+
+class TriggerIndex:
+    """
+    Индекс ценовых триггеров: для каждого инструмента — живая полоса
+    (lower, upper) между активными нижним и верхним триггером.
+
+    Полоса берётся из Donchian 55 (нет позиции) или Donchian 20 (есть позиция
+    в AccountInstrument) и пересобирается автоматически через listener снимка
+    при любом изменении индикаторов, флагов или позиций.
+
+    Тик внутри полосы отбрасывается одним сравнением lower < price < upper;
+    дальше (БД, маржа, Telegram) идут только выходы из полосы.
+    Полосы лежат в компактных array('d'), пачки проверяются через NumPy-вид
+    на тот же буфер без копирования.
+    """
+
+    def __init__(self, snapshot: InstrumentSnapshot):
+        self._slots: Dict[str, int] = {}
+        self._uids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._kind = array('b')
+        self._lower = array('d')
+        self._upper = array('d')
+        for state in snapshot.states():
+            self.sync(state.instrument_id, state)
+        snapshot.add_listener(self.sync)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def sync(self, instrument_id: str, state: Optional[InstrumentState]) -> None:
+        """Пересобрать полосу инструмента (state=None — освободить слот)."""
+        if state is None:
+            slot = self._slots.pop(instrument_id, None)
+            if slot is not None:
+                self._kind[slot] = BAND_NONE
+                self._lower[slot] = -_INF
+                self._upper[slot] = _INF
+                self._uids[slot] = None
+                self._free.append(slot)
+            return
+
+        slot = self._slots.get(instrument_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+                self._uids[slot] = instrument_id
+            else:
+                slot = len(self._uids)
+                self._uids.append(instrument_id)
+                self._kind.append(BAND_NONE)
+                self._lower.append(-_INF)
+                self._upper.append(_INF)
+            self._slots[instrument_id] = slot
+        kind, lower, upper = band_for(state)
+        self._kind[slot] = kind
+        self._lower[slot] = lower
+        self._upper[slot] = upper
+
+    def band(self, instrument_id: str) -> Optional[Tuple[int, float, float]]:
+        slot = self._slots.get(instrument_id)
+        if slot is None:
+            return None
+        return self._kind[slot], self._lower[slot], self._upper[slot]
+
+    def inside(self, instrument_id: str, price: float) -> bool:
+        """True — тик внутри полосы (или инструмент неизвестен), делать ничего не нужно."""
+        slot = self._slots.get(instrument_id)
+        if slot is None:
+            return True
+        return self._lower[slot] < price < self._upper[slot]
+
+    def exits(self, instrument_ids: Sequence[str],
+              prices: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Векторная проверка пачки: (маска выхода из полосы, коды полос, маска выхода вверх).
+        Неизвестные инструменты считаются внутри полосы.
+        """
+        n = len(instrument_ids)
+        slots = np.fromiter((self._slots.get(uid, -1) for uid in instrument_ids),
+                            dtype=np.intp, count=n)
+        known = slots >= 0
+        s = np.where(known, slots, 0)
+        if not self._uids:
+            empty = np.zeros(n, dtype=bool)
+            return empty, np.zeros(n, dtype=np.int8), empty
+        kind = np.frombuffer(self._kind, dtype=np.int8)[s]
+        up = known & (prices >= np.frombuffer(self._upper, dtype=np.float64)[s])
+        down = known & (prices <= np.frombuffer(self._lower, dtype=np.float64)[s])
+        return up | down, kind, up
@@ -1,42 +1,46 @@
-import asyncio
 import logging
-from typing import Tuple, Optional, Any
+import time
+from typing import Optional, Any, List
 
-from aiogram import Bot
 import tinkoff.invest as ti
-from aiogram.types import LinkPreviewOptions
-from tinkoff.invest import GetFuturesMarginResponse
 from tinkoff.invest.utils import quotation_to_decimal as q2d
 
-from bots.tg_bot.messages.messages_const import text_favorites_breakout, text_stop_long_position, \
-    text_stop_short_position
-from clients.tinkoff.client import TClient
-from clients.tinkoff.name_service import NameService
-from clients.tinkoff.portfolio_svc import PortfolioService, PortfolioOut
-from database.pgsql.enums import Direction
+from core.domains.breakout import Breakout, BreakoutEvaluator
+from core.domains.instrument_snapshot import InstrumentSnapshot
+from core.domains.trigger_index import TriggerIndex
+from database.pgsql.notify_writer import NotifyWriter
 from database.pgsql.repository import Repository
 from database.redis.client import RedisClient
+from database.redis.last_price_writer import LastPriceWriter
+from services.signals.outbox import SignalOutbox, SignalRecord
+from utils.metrics import METRICS
+
+# задержка тика: время биржи -> обработка в боте
+LAST_PRICE_LAG = METRICS.histogram("md_last_price_lag_seconds",
+                                   "Exchange time to handler time for LastPrice")
 
 
 class MarketDataHandler:
-    def __init__(self, bot: Bot, chat_id: int, db: Repository, name_service: NameService,
-                 portfolio_svc: PortfolioService,
-                 tclient: TClient, redis: RedisClient, acc_id: str):
-        self._bot = bot
-        self._chat_id = chat_id
+    def __init__(self, db: Repository, redis: RedisClient, acc_id: str,
+                 snapshot: InstrumentSnapshot, last_price_writer: LastPriceWriter,
+                 outbox: SignalOutbox, notify_writer: NotifyWriter):
         self.log = logging.getLogger(self.__class__.__name__)
         self._db = db
-        self._name_service = name_service
-        self._tclient = tclient
         self._redis = redis
-        self._portfolio_svc = portfolio_svc
         self._acc_id = acc_id
+        self._snapshot = snapshot
+        self._last_prices = last_price_writer
+        self._outbox = outbox
+        self._notify = notify_writer
+        self._triggers = TriggerIndex(snapshot)
+        self._evaluator = BreakoutEvaluator(self._triggers)
 
     @classmethod
-    async def create(cls, bot: Bot, chat_id: int, db: Repository, name_service: NameService,
-                     tclient: TClient, redis: RedisClient, portfolio_svc: PortfolioService, ):
+    async def create(cls, db: Repository, redis: RedisClient, snapshot: InstrumentSnapshot,
+                     last_price_writer: LastPriceWriter, outbox: SignalOutbox,
+                     notify_writer: NotifyWriter):
         acc_id = await cls._get_main_acc_id(db)
-        return cls(bot, chat_id, db, name_service, portfolio_svc, tclient, redis, acc_id)
+        return cls(db, redis, acc_id, snapshot, last_price_writer, outbox, notify_writer)
 
     @classmethod
     async def _get_main_acc_id(cls, db) -> Optional[str]:
@@ -46,162 +50,79 @@ class MarketDataHandler:
                 return None
             return next(acc.account_id for acc in acc_list)
 
-    async def execute(self, resp: ti.MarketDataResponse) -> None:
-        self.log.debug("Executing %s", resp.__class__.__name__)
-        name, payload = self._extract(resp)
-        if payload is None:
-            return
+    @staticmethod
+    def last_price_key(lp: ti.LastPrice) -> str:
+        """Ключ шарда и схлопывания топика md.last_price."""
+        return lp.instrument_uid
 
-        if isinstance(payload, ti.LastPrice):
-            await self._on_last_price(payload)
-        elif isinstance(payload, ti.SubscribeLastPriceResponse):
+    async def on_subscription(self, resp: Any) -> None:
+        if isinstance(resp, ti.SubscribeLastPriceResponse):
             self.log.info("LastPrice subscribed: %s", [
-                s.instrument_uid for s in payload.last_price_subscriptions
+                s.instrument_uid for s in resp.last_price_subscriptions
             ])
-        elif isinstance(payload, ti.Candle):
-            await self._on_candle(payload)
-        elif isinstance(payload, ti.Trade):
-            await self._on_trade(payload)
         else:
-            self.log.debug("Unhandled market event %s: %r", name, payload)
-
-    @staticmethod
-    def _extract(resp: ti.MarketDataResponse) -> Tuple[str, Optional[Any]]:
-        if resp.subscribe_last_price_response is not None:
-            return "subscribe_last_price_response", resp.subscribe_last_price_response
-        if resp.subscribe_trades_response is not None:
-            return "subscribe_trades_response", resp.subscribe_trades_response
-        if resp.subscribe_info_response is not None:
-            return "subscribe_info_response", resp.subscribe_info_response
-        if resp.subscribe_order_book_response is not None:
-            return "subscribe_order_book_response", resp.subscribe_order_book_response
-        if resp.subscribe_candles_response is not None:
-            return "subscribe_candles_response", resp.subscribe_candles_response
-
-        if resp.last_price is not None:
-            return "last_price", resp.last_price
-        if resp.trade is not None:
-            return "trade", resp.trade
-        if resp.candle is not None:
-            return "candle", resp.candle
-        if resp.orderbook is not None:
-            return "orderbook", resp.orderbook
-        if resp.trading_status is not None:
-            return "trading_status", resp.trading_status
-        if resp.ping is not None:
-            return "ping_result", resp.ping
-        if resp.open_interest is not None:
-            return "open_interest", resp.open_interest
-        return "unknown", None
-
-    async def _on_last_price(self, lp: ti.LastPrice) -> None:
-        uid = lp.instrument_uid
-        price = float(q2d(lp.price))
-        await self._redis.set_last_price_if_newer(uid, str(q2d(lp.price)), ts_ms=int(lp.time.timestamp() * 1000))
-        async with self._db.session_factory() as s:
-            row = await self._db.get_instrument_with_positions(uid, s)
-            if not row:
-                self.log.debug("No instrument in DataBase for %s", uid)
-                return
-            indicators, position = row
-            self.log.debug("Last price %s = %s", uid, price)
-            self.log.debug("Position: %s\nIndicators: %s", position, indicators)
-            if not indicators.check or not indicators.to_notify:
-                return
-            if position:
-                direction = position.direction
-                if direction == Direction.LONG.value:
-                    if price <= indicators.donchian_short_20:
-                        await self._bot.send_message(
-                            self._chat_id,
-                            await text_stop_long_position(indicators, last_price=price,
-                                                          name_service=self._name_service)
-                        )
-                        await self._db.set_notify(indicators.instrument_id, notify=False, session=s)
-                        await s.commit()
-                        return
-                if direction == Direction.SHORT.value:
-                    if price >= indicators.donchian_long_20:
-                        await self._bot.send_message(
-                            self._chat_id,
-                            await text_stop_short_position(indicators, last_price=price,
-                                                           name_service=self._name_service)
-                        )
-                        await self._db.set_notify(indicators.instrument_id, notify=False, session=s)
-                        await s.commit()
-                        return
-            else:
-                if not indicators.donchian_long_55:
-                    return
-                if price >= indicators.donchian_long_55:
-                    await self._db.set_notify(indicators.instrument_id, notify=False, session=s)
-                    margin_response = await self._tclient.get_min_price_increment_amount(
-                        uid=str(indicators.instrument_id)
-                    )
-                    price_point_value = None
-                    if margin_response:
-                        price_point_value = self.price_point(margin_response)
-
-                    portfolios = await _portfolios(self._db, self._portfolio_svc)
-                    await self._bot.send_message(
-                        self._chat_id,
-                        await text_favorites_breakout(indicators, 'long',
-                                                      last_price=price,
-                                                      name_service=self._name_service,
-                                                      price_point_value=price_point_value,
-                                                      portfolios=portfolios),
-                        link_preview_options=LinkPreviewOptions(is_disabled=True)
-                    )
-                    await s.commit()
-                    return
-                elif price <= indicators.donchian_short_55:
-                    await self._db.set_notify(indicators.instrument_id, notify=False, session=s)
-                    margin_response = await self._tclient.get_min_price_increment_amount(
-                        str(indicators.instrument_id)
-                    )
-                    price_point_value = None
-                    if margin_response:
-                        price_point_value = self.price_point(margin_response)
-
-                    portfolios = await _portfolios(self._db, self._portfolio_svc)
-                    await self._bot.send_message(
-                        self._chat_id,
-                        await text_favorites_breakout(indicators, 'short',
-                                                      last_price=price,
-                                                      name_service=self._name_service,
-                                                      price_point_value=price_point_value,
-                                                      portfolios=portfolios),
-                        link_preview_options=LinkPreviewOptions(is_disabled=True)
-                    )
-                    await s.commit()
-                    return
-
-    @staticmethod
-    def price_point(margin_response: GetFuturesMarginResponse) -> float:
-        price_point_value = float(q2d(margin_response.min_price_increment_amount) / q2d(
-            margin_response.min_price_increment))
-        return price_point_value
-
-    async def _on_candle(self, c: ti.Candle) -> None:
+            self.log.debug("Subscription response %s", resp.__class__.__name__)
+
+    async def on_last_prices(self, ticks: List[ti.LastPrice]) -> None:
+        """Пачка LastPrice из md.last_price: проверяется одним векторным проходом."""
+        await self._process_last_prices(ticks, observe_lag=True)
+
+    async def on_recovered_prices(self, ticks: List[ti.LastPrice]) -> None:
+        """
+        Догон после разрыва стрима (GapRecovery): тот же путь оценки, но время
+        биржи у таких тиков в прошлом — в задержку они не попадают.
+        """
+        await self._process_last_prices(ticks, observe_lag=False)
+
+    async def _process_last_prices(self, ticks: List[ti.LastPrice], observe_lag: bool) -> None:
+        if len(ticks) == 1:
+            await self._on_last_price(ticks[0], observe_lag)
+            return
+        uids: List[str] = []
+        prices: List[float] = []
+        now = time.time()
+        for lp in ticks:
+            price = q2d(lp.price)
+            ts = lp.time.timestamp()
+            if observe_lag:
+                LAST_PRICE_LAG.observe(now - ts)
+            self._last_prices.add(lp.instrument_uid, str(price), ts_ms=int(ts * 1000))
+            uids.append(lp.instrument_uid)
+            prices.append(float(price))
+        self.log.debug("Last prices: %s", len(ticks))
+
+        for hit in self._evaluator.evaluate(uids, prices):
+            self._on_signal(hit)
+
+    async def _on_last_price(self, lp: ti.LastPrice, observe_lag: bool = True) -> None:
+        price = q2d(lp.price)
+        ts = lp.time.timestamp()
+        if observe_lag:
+            LAST_PRICE_LAG.observe(time.time() - ts)
+        self._last_prices.add(lp.instrument_uid, str(price), ts_ms=int(ts * 1000))
+        if self._triggers.inside(lp.instrument_uid, float(price)):
+            return
+        for hit in self._evaluator.evaluate([lp.instrument_uid], [float(price)]):
+            self._on_signal(hit)
+
+    def _on_signal(self, hit: Breakout) -> None:
+        """
+        Сигнал только фиксируется: флаг в снимке снимается сразу (повторный тик
+        не даст второго сигнала), в БД его пишет NotifyWriter, а обогащение и
+        доставку делает SignalOutbox.
+        """
+        self._snapshot.set_notify(hit.instrument_id, False)
+        self._notify.set(hit.instrument_id, False)
+        self._outbox.put(SignalRecord(hit.instrument_id, hit.kind, hit.price))
+
+    async def on_candle(self, c: ti.Candle) -> None:
         uid = c.instrument_uid or c.figi
         o, h, l, cl = map(lambda q: float(q2d(q)), (c.open, c.high, c.low, c.close))
         self.log.debug("Candle %s %s O:%.2f H:%.2f L:%.2f C:%.2f",
                        uid, c.interval, o, h, l, cl)
 
-    async def _on_trade(self, t: ti.Trade) -> None:
+    async def on_trade(self, t: ti.Trade) -> None:
         uid = t.instrument_uid or t.figi
         price = float(q2d(t.price))
         qty = t.quantity
         self.log.debug("Trade %s: %s x %s", uid, qty, price)
-
-
-async def _portfolios(db: Repository, portfolio_svc: PortfolioService) -> list[PortfolioOut]:
-    portfolios: list[PortfolioOut] = []
-    async with db.session_factory() as s:
-        accounts = await db.list_accounts(s)
-
-    for account in accounts:
-        portfolios.append(
-            await portfolio_svc.get_portfolio(account.account_id, account.name)
-        )
-    return portfolios
\ No newline at end of file
@@ -1,18 +1,22 @@
 import logging
-from typing import Any, Set, Dict, List
+from typing import Any, Set, Dict, List, Optional
 from zoneinfo import ZoneInfo
 
-from aiogram import Bot
 import tinkoff.invest as ti
 from sqlalchemy import select
 
+from bots.tg_bot.delivery import DeliveryScheduler
 from bots.tg_bot.messages.messages_const import msg_portfolio_notify
 from clients.tinkoff.client import TClient
 from clients.tinkoff.name_service import NameService
+from clients.tinkoff.portfolio_svc import PortfolioService
+from core.domains.instrument_snapshot import InstrumentSnapshot
 from database.pgsql.enums import Direction
 from database.pgsql.models import AccountInstrument, Instrument
+from database.pgsql.notify_writer import NotifyWriter
 from database.pgsql.repository import Repository
 from database.pgsql.schemas import InstrumentIn
+from services.historic_service.candle_store import CandleStore
 from services.historic_service.indicators import IndicatorCalculator
 from utils import is_updated_today
 
@@ -20,20 +24,50 @@ TZ_MOSCOW = ZoneInfo("Europe/Moscow")
 
 
 class PortfolioHandler:
-    def __init__(self, bot: Bot, chat_id: int, db: Repository, name_service: NameService,
-                 tclient: TClient):
-        self._bot = bot
+    def __init__(self, delivery: DeliveryScheduler, chat_id: int, db: Repository,
+                 name_service: NameService,
+                 tclient: TClient, snapshot: InstrumentSnapshot,
+                 portfolio_svc: PortfolioService, candle_store: CandleStore,
+                 notify_writer: NotifyWriter):
+        self._delivery = delivery
         self._chat_id = chat_id
         self.log = logging.getLogger(self.__class__.__name__)
         self._db = db
         self._name_service = name_service
         self._tclient = tclient
+        self._snapshot = snapshot
+        self._portfolio_svc = portfolio_svc
+        self._candle_store = candle_store
+        self._notify_writer = notify_writer
+
+    @staticmethod
+    def shard_key(resp: ti.PortfolioStreamResponse) -> Optional[str]:
+        """Ключ шарда StreamBus: события одного аккаунта обрабатываются по порядку."""
+        if resp.portfolio is not None:
+            return resp.portfolio.account_id
+        return None
 
     async def execute(self, resp: ti.PortfolioStreamResponse) -> None:
         self.log.debug("Executing %s", resp.__class__.__name__)
         portfolio = resp.portfolio
 
         if portfolio:
+            await self._portfolio_svc.update_from_stream(portfolio)
+            await self._on_portfolio_response(portfolio)
+
+    async def execute_batch(self, batch: List[ti.PortfolioStreamResponse]) -> None:
+        """
+        Пачка ответов стрима: портфель приходит целиком, поэтому по каждому
+        аккаунту достаточно обработать последний.
+        """
+        latest: Dict[str, ti.PortfolioResponse] = {}
+        for resp in batch:
+            if resp.portfolio:
+                latest[resp.portfolio.account_id] = resp.portfolio
+            else:
+                await self.execute(resp)
+        for portfolio in latest.values():
+            await self._portfolio_svc.update_from_stream(portfolio)
             await self._on_portfolio_response(portfolio)
 
     async def _on_portfolio_response(self, portfolio: ti.PortfolioResponse) -> None:
@@ -48,8 +82,11 @@ class PortfolioHandler:
                     session=s,
                 )
                 await s.commit()
+            self._snapshot.remove_positions(portfolio.account_id)
             return
         portfolio_map = {p.instrument_uid: p for p in portfolio.positions}
+        rows: List[InstrumentIn] = []
+        rows_links: List[Dict[str, Any]] = []
         async with self._db.session_factory() as s:
             stmt = (
                 select(AccountInstrument.instrument_id)
@@ -74,10 +111,9 @@ class PortfolioHandler:
                     need_indicators.append(uid)
 
             if need_indicators:
-                rows: List[InstrumentIn] = []
                 for uid in need_indicators:
-                    candles = await self._tclient.get_days_candles_for_2_months(uid)
-                    indicators = IndicatorCalculator(candles_resp=candles).build_instrument_update()
+                    candles = await self._candle_store.get(uid)
+                    indicators = IndicatorCalculator.from_rows(candles).build_instrument_update()
                     pos = portfolio_map[uid]
                     ticker = pos.ticker
                     rows.append(
@@ -113,8 +149,18 @@ class PortfolioHandler:
                 add_for_msg = rows_links
                 await self._db.set_position_bulk(rows_links, session=s)
             await s.commit()
+
+        self._snapshot.apply_bulk(r.model_dump(exclude_unset=True) for r in rows)
+        # to_notify=True уже в БД; отложенный False из NotifyWriter не должен его перетереть
+        for r in rows:
+            self._notify_writer.set(r.instrument_id, True)
+        self._snapshot.remove_positions(portfolio.account_id, need_delete)
+        for link in rows_links:
+            self._snapshot.set_position(link["account_id"], link["instrument_id"],
+                                        link["direction"])
+
         if add_for_msg or delete_for_msg:
-            await self._bot.send_message(
-                chat_id=self._chat_id,
+            await self._delivery.send(
+                self._chat_id,
                 text=await msg_portfolio_notify(add_for_msg, delete_for_msg, self._name_service)
             )
@@ -1,7 +1,8 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, Boolean, Float, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import (String, Boolean, Float, DateTime, ForeignKey, UniqueConstraint,
+                        BigInteger, Integer)
 from sqlalchemy.orm import DeclarativeBase, mapped_column, Mapped, relationship
 from sqlalchemy.sql.expression import text
 
@@ -105,3 +106,34 @@ class AccountInstrument(Base):
 
     def __str__(self) -> str:
         return f"{self.direction}"
+
+
+class DailyCandle(Base):
+    """Завершённая дневная свеча; источник рядов для индикаторов (см. CandleStore)."""
+    __tablename__ = "daily_candles"
+
+    instrument_id: Mapped[str] = mapped_column(String(40), primary_key=True)
+    time: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    open: Mapped[float] = mapped_column(Float, nullable=False)
+    high: Mapped[float] = mapped_column(Float, nullable=False)
+    low: Mapped[float] = mapped_column(Float, nullable=False)
+    close: Mapped[float] = mapped_column(Float, nullable=False)
+    volume: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class CatalogInstrument(Base):
+    """Справочник инструментов брокера (см. InstrumentCatalog); обновляется раз в день."""
+    __tablename__ = "instrument_catalog"
+
+    uid: Mapped[str] = mapped_column(String(40), primary_key=True)
+    figi: Mapped[Optional[str]] = mapped_column(String(32), nullable=True, index=True)
+    ticker: Mapped[Optional[str]] = mapped_column(String(32), nullable=True, index=True)
+    class_code: Mapped[Optional[str]] = mapped_column(String(16), nullable=True)
+    name: Mapped[str] = mapped_column(String(256), nullable=False)
+    type: Mapped[Optional[str]] = mapped_column(String(16), nullable=True)
+    lot: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    currency: Mapped[Optional[str]] = mapped_column(String(8), nullable=True)
+    expiration_date: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,71 @@
+import asyncio
+from typing import Dict, Optional
+
+from database.pgsql.repository import Repository
+from utils.logger import get_logger
+
+
+class NotifyWriter:
+    """
+    Write-behind запись флага Instrument.to_notify.
+
+    set() только запоминает последнее значение флага по инструменту; раз в
+    flush_ms накопленные изменения уходят в БД одним UPDATE ... WHERE
+    instrument_id = ANY(...) на каждое значение флага и одним коммитом.
+    Актуальное состояние в памяти — в InstrumentSnapshot, его обновляет вызывающий.
+    """
+
+    def __init__(self, db: Repository, flush_ms: int = 1000):
+        self._db = db
+        self._interval = flush_ms / 1000
+        self._pending: Dict[str, bool] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.log = get_logger(self.__class__.__name__)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def set(self, instrument_id: str, notify: bool) -> None:
+        self._pending[instrument_id] = notify
+
+    def discard(self, instrument_id: str) -> None:
+        """Забыть несохранённое изменение (флаг уже записан в БД другим путём)."""
+        self._pending.pop(instrument_id, None)
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        by_value: Dict[bool, list[str]] = {}
+        for uid, notify in batch.items():
+            by_value.setdefault(notify, []).append(uid)
+        try:
+            async with self._db.session_factory() as s:
+                for notify, ids in by_value.items():
+                    await self._db.set_notify_bulk(ids, notify=notify, session=s)
+                await s.commit()
+        except Exception as e:
+            self.log.error("Error while flushing to_notify", extra={"exception": e,
+                                                                    "count": len(batch)})
+            # вернуть в буфер то, что не перезаписано более свежими set()
+            for uid, notify in batch.items():
+                self._pending.setdefault(uid, notify)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            await self.flush()
+
+    async def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
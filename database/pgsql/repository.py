@@ -1,15 +1,20 @@
 from datetime import datetime, timezone
 from typing import Sequence, Optional, Iterable, Union, Mapping, Any, List
 
-from sqlalchemy import select, delete, update, func, or_, and_
+from sqlalchemy import select, delete, update, func, or_, and_, any_, literal, String
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 
-from database.pgsql.models import Base, Instrument, Account, AccountInstrument
+from database.pgsql.models import (Base, Instrument, Account, AccountInstrument, DailyCandle,
+                                   CatalogInstrument)
 from database.pgsql.schemas import InstrumentIn, InstrumentPatch
 
 InstrumentLike = Union[Mapping[str, Any], InstrumentIn]
 
+# строк справочника в одном INSERT: 10 колонок, у asyncpg предел 32767 параметров
+CATALOG_UPSERT_CHUNK = 2000
+
 
 def _to_payload(data: InstrumentLike, *, require_id: bool = True) -> dict:
     """Привести dict/Pydantic к dict с нужными ключами. exclude_unset=True — мягкий upsert."""
@@ -180,6 +185,17 @@ class Repository:
         )
         return (await session.execute(stmt)).unique().all()
 
+    @staticmethod
+    async def list_instruments_with_positions(session: AsyncSession) -> Sequence[
+        tuple[Instrument, Optional[AccountInstrument]]
+    ]:
+        stmt = (
+            select(Instrument, AccountInstrument)
+            .outerjoin(AccountInstrument,
+                       AccountInstrument.instrument_id == Instrument.instrument_id)
+        )
+        return (await session.execute(stmt)).unique().all()
+
     @staticmethod
     async def delete_instrument(instrument_id: str, session: AsyncSession) -> None:
         stmt = delete(Instrument).where(Instrument.instrument_id == instrument_id)
@@ -232,6 +248,20 @@ class Repository:
         )
         await session.execute(stmt)
 
+    @staticmethod
+    async def set_notify_bulk(ids: Iterable[str], notify: bool, session: AsyncSession) -> None:
+        """Один UPDATE на весь список: WHERE instrument_id = ANY(:ids)."""
+        ids = list(ids)
+        if not ids:
+            return
+        stmt = (
+            update(Instrument)
+            .where(Instrument.instrument_id == any_(literal(ids, ARRAY(String))))
+            .values(to_notify=notify)
+            .execution_options(synchronize_session=False)
+        )
+        await session.execute(stmt)
+
     # ---------- Accounts ----------
     @staticmethod
     async def upsert_account(
@@ -410,3 +440,91 @@ class Repository:
         stmt = (select(Account).where(Account.account_id == account_id))
         return (await s.execute(stmt)).scalar_one_or_none()
 
+    # ---------- Daily candles ----------
+    @staticmethod
+    async def last_candle_time(instrument_id: str, session: AsyncSession) -> Optional[datetime]:
+        stmt = select(func.max(DailyCandle.time)).where(DailyCandle.instrument_id == instrument_id)
+        return (await session.execute(stmt)).scalar_one_or_none()
+
+    @staticmethod
+    async def list_candles(instrument_id: str, since: datetime,
+                           session: AsyncSession) -> Sequence[DailyCandle]:
+        stmt = (
+            select(DailyCandle)
+            .where(DailyCandle.instrument_id == instrument_id, DailyCandle.time >= since)
+            .order_by(DailyCandle.time)
+        )
+        return (await session.execute(stmt)).scalars().all()
+
+    @staticmethod
+    async def upsert_candles(rows: Sequence[Mapping[str, Any]], session: AsyncSession) -> None:
+        """Батч-upsert свечей по (instrument_id, time); повторная загрузка бара его перезапишет."""
+        if not rows:
+            return
+        ins = pg_insert(DailyCandle).values(list(rows))
+        stmt = ins.on_conflict_do_update(
+            index_elements=[DailyCandle.instrument_id, DailyCandle.time],
+            set_={
+                "open": ins.excluded.open,
+                "high": ins.excluded.high,
+                "low": ins.excluded.low,
+                "close": ins.excluded.close,
+                "volume": ins.excluded.volume,
+            },
+        )
+        await session.execute(stmt)
+
+    @staticmethod
+    async def delete_candles_before(cutoff: datetime, session: AsyncSession) -> None:
+        await session.execute(delete(DailyCandle).where(DailyCandle.time < cutoff))
+
+    # ---------- Instrument catalog ----------
+    @staticmethod
+    async def upsert_catalog(rows: Sequence[Mapping[str, Any]], session: AsyncSession) -> None:
+        """Батч-upsert справочника по uid порциями по CATALOG_UPSERT_CHUNK строк."""
+        rows = list(rows)
+        for i in range(0, len(rows), CATALOG_UPSERT_CHUNK):
+            ins = pg_insert(CatalogInstrument).values(rows[i:i + CATALOG_UPSERT_CHUNK])
+            stmt = ins.on_conflict_do_update(
+                index_elements=[CatalogInstrument.uid],
+                set_={
+                    col: ins.excluded[col]
+                    for col in ("figi", "ticker", "class_code", "name", "type", "lot",
+                                "currency", "expiration_date", "updated_at")
+                },
+            )
+            await session.execute(stmt)
+
+    @staticmethod
+    async def get_catalog(uids: Iterable[str],
+                          session: AsyncSession) -> Sequence[CatalogInstrument]:
+        ids = list(uids)
+        if not ids:
+            return []
+        stmt = select(CatalogInstrument).where(CatalogInstrument.uid.in_(ids))
+        return (await session.execute(stmt)).scalars().all()
+
+    @staticmethod
+    async def find_catalog_by_ticker(ticker: str,
+                                     session: AsyncSession) -> Sequence[CatalogInstrument]:
+        """Тикер уникален только в пределах class_code — вернуть все совпадения."""
+        stmt = select(CatalogInstrument).where(CatalogInstrument.ticker == ticker)
+        return (await session.execute(stmt)).scalars().all()
+
+    @staticmethod
+    async def find_catalog_by_figi(figi: str,
+                                   session: AsyncSession) -> Optional[CatalogInstrument]:
+        stmt = select(CatalogInstrument).where(CatalogInstrument.figi == figi).limit(1)
+        return (await session.execute(stmt)).scalar_one_or_none()
+
+    @staticmethod
+    async def catalog_updated_at(session: AsyncSession) -> Optional[datetime]:
+        stmt = select(func.max(CatalogInstrument.updated_at))
+        return (await session.execute(stmt)).scalar_one_or_none()
+
+    @staticmethod
+    async def delete_catalog_before(cutoff: datetime, session: AsyncSession) -> None:
+        """Убрать инструменты, которых давно нет в выгрузках (делистинг, экспирация)."""
+        await session.execute(
+            delete(CatalogInstrument).where(CatalogInstrument.updated_at < cutoff)
+        )
@@ -1,8 +1,10 @@
 import json
-from typing import Optional, Any
+from typing import Optional, Any, Dict, Iterable, Tuple
 
 from config import Config
 from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+from redis.exceptions import NoScriptError
 
 from database.redis.scripts_lua import LUA_SET_IF_NEWER
 from utils.logger import get_logger
@@ -17,6 +19,7 @@ class RedisClient:
         self._cfg = cfg
         self._ns = namespace.rstrip(":")
         self._redis: Optional[Redis] = None
+        self._set_if_newer: Optional[AsyncScript] = None
         self.log = get_logger(self.__class__.__name__)
 
     async def connect(self):
@@ -33,11 +36,14 @@ class RedisClient:
             )
             pong = await self._redis.ping()
             self.log.info("Redis connected", extra={"pong": pong})
+            # EVALSHA по sha скрипта; при NOSCRIPT redis-py сам загрузит скрипт заново
+            self._set_if_newer = self._redis.register_script(LUA_SET_IF_NEWER)
 
     async def close(self):
         if self._redis is not None:
             await self._redis.close()
             self._redis = None
+            self._set_if_newer = None
 
     def _k(self, *parts: str) -> str:
         return ":".join([self._ns, *[p.strip(":") for p in parts]])
@@ -88,6 +94,19 @@ class RedisClient:
         val = await self.get_json(self.name_key(instrument_uid, namespace))
         return (val or {}).get("name")
 
+    # ---- стоимость пункта (GetFuturesMargin) ----
+    def price_point_key(self, instrument_uid: str) -> str:
+        return self._k("price_point", instrument_uid)
+
+    async def set_price_point(self, instrument_uid: str, value: Optional[float],
+                              ttl_sec: int) -> None:
+        """value=None — негативная запись: инструмент не фьючерс."""
+        await self.set_json(self.price_point_key(instrument_uid), {"value": value}, ttl_sec)
+
+    async def get_price_point(self, instrument_uid: str) -> Optional[dict]:
+        """None — промах кэша; {"value": None} — закэшированный «не фьючерс»."""
+        return await self.get_json(self.price_point_key(instrument_uid))
+
     # ---- специализация под последние цены ----
     def last_price_key(self, instrument_uid: str) -> str:
         return self._k("md", "last_price", instrument_uid)
@@ -97,12 +116,9 @@ class RedisClient:
             self.log.error("Call redis.connect() first", extra={"instrument_id": instrument_uid})
             return None
         key = self.last_price_key(instrument_uid)
-        res = await self._redis.eval(
-            LUA_SET_IF_NEWER,
-            1,  # numkeys
-            key,  # KEYS[1]
-            price_str,  # ARGV[1]
-            str(ts_ms)  # ARGV[2]
+        res = await self._set_if_newer(
+            keys=[key],
+            args=[price_str, str(ts_ms)],
         )
         self.log.debug(
             "set_last_price_if_newer",
@@ -110,6 +126,38 @@ class RedisClient:
         )
         return bool(res)
 
+    async def set_last_prices_if_newer(
+            self,
+            items: Iterable[Tuple[str, str, int]],
+    ) -> Optional[list[bool]]:
+        """
+        Батч-запись последних цен одним pipeline (один round trip).
+        items: (instrument_uid, price_str, ts_ms). Для каждого — тот же LUA_SET_IF_NEWER по sha.
+        Если скрипта нет в кэше Redis (NOSCRIPT) — загружаем и повторяем батч:
+        скрипт идемпотентен, повтор безопасен.
+        """
+        if self._redis is None:
+            self.log.error("Call redis.connect() first")
+            return None
+        items = list(items)
+        if not items:
+            return []
+
+        async def _execute() -> list:
+            pipe = self._redis.pipeline(transaction=False)
+            for uid, price_str, ts_ms in items:
+                pipe.evalsha(self._set_if_newer.sha, 1, self.last_price_key(uid),
+                             price_str, str(ts_ms))
+            return await pipe.execute()
+
+        try:
+            res = await _execute()
+        except NoScriptError:
+            await self._redis.script_load(LUA_SET_IF_NEWER)
+            res = await _execute()
+        self.log.debug("set_last_prices_if_newer", extra={"count": len(items)})
+        return [bool(r) for r in res]
+
     async def get_last_price(self, instrument_uid: str) -> Optional[dict]:
         if self._redis is None:
             self.log.error("Call redis.connect() first", extra={"instrument_id": instrument_uid})
@@ -119,6 +167,20 @@ class RedisClient:
         self.log.debug("get_last_price", extra={"instrument_uid": instrument_uid, "data": data})
         return data or None
 
+    async def get_last_prices(self, instrument_uids: Iterable[str]) -> Dict[str, dict]:
+        """Последние цены пачки инструментов одним pipeline; промахи в ответ не попадают."""
+        if self._redis is None:
+            self.log.error("Call redis.connect() first")
+            return {}
+        uids = list(instrument_uids)
+        if not uids:
+            return {}
+        pipe = self._redis.pipeline(transaction=False)
+        for uid in uids:
+            pipe.hgetall(self.last_price_key(uid))
+        res = await pipe.execute()
+        return {uid: data for uid, data in zip(uids, res) if data}
+
     # ---- портфель: текущая стоимость + относительная доходность ----
     def portfolio_key(self, account_id: str) -> str:
         # можно назвать md:portfolio:<acc_id>
@@ -0,0 +1,71 @@
+import asyncio
+from typing import Dict, Optional, Tuple
+
+from database.redis.client import RedisClient
+from utils.logger import get_logger
+
+
+class LastPriceWriter:
+    """
+    Буфер записи последних цен в Redis для рыночного потока.
+
+    add() не ходит в Redis: цена кладётся в буфер (по инструменту хранится
+    только самая свежая по ts_ms). Буфер сбрасывается одним pipeline-вызовом
+    RedisClient.set_last_prices_if_newer, когда набралось batch_size
+    инструментов или прошло flush_ms с прошлого сброса.
+    """
+
+    def __init__(self, redis: RedisClient, batch_size: int = 200, flush_ms: int = 50):
+        self._redis = redis
+        self._batch_size = batch_size
+        self._interval = flush_ms / 1000
+        self._pending: Dict[str, Tuple[str, int]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.log = get_logger(self.__class__.__name__)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, instrument_uid: str, price_str: str, ts_ms: int) -> None:
+        cur = self._pending.get(instrument_uid)
+        if cur is not None and cur[1] > ts_ms:
+            return
+        self._pending[instrument_uid] = (price_str, ts_ms)
+        if len(self._pending) >= self._batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        try:
+            await self._redis.set_last_prices_if_newer(
+                (uid, price_str, ts_ms) for uid, (price_str, ts_ms) in batch.items()
+            )
+        except Exception as e:
+            self.log.error("Error while flushing last prices", extra={"exception": e,
+                                                                      "count": len(batch)})
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -13,24 +13,36 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from bots.tg_bot.delivery import DeliveryScheduler
 from bots.tg_bot.handlers.add_favorite_instruments import rout_add_favorites
 from bots.tg_bot.handlers.info import info_rout
 from bots.tg_bot.handlers.instrument_info import instr_info
 from bots.tg_bot.handlers.remove_favorites import rout_remove_favorites
 from bots.tg_bot.handlers.router import router
 from bots.tg_bot.middlewares.deps import DepsMiddleware
-from clients.tinkoff.client import TClient
+from clients.tinkoff.catalog import InstrumentCatalog
+from clients.tinkoff.client import GAP_TOPIC, TClient
+from clients.tinkoff.last_prices import LastPriceService
 from clients.tinkoff.name_service import NameService
 from clients.tinkoff.portfolio_svc import PortfolioService
+from clients.tinkoff.price_point import PricePointService
 
 from config import Config
 from core.domains.event_bus import StreamBus
+from core.domains.instrument_snapshot import InstrumentSnapshot
+from core.domains.journal import JournalWriter
 from core.schemas.market_proc import MarketDataHandler
 from core.schemas.portfolio import PortfolioHandler
+from database.pgsql.notify_writer import NotifyWriter
 from database.pgsql.repository import Repository
 from database.redis.client import RedisClient
+from database.redis.last_price_writer import LastPriceWriter
+from services.historic_service.candle_store import CandleStore
 from services.historic_service.indicators import IndicatorCalculator
 from services.scheduler.scheduler import TZ_DEFAULT, parse_hhmm
+from services.signals.gap_recovery import GapRecovery
+from services.signals.outbox import SignalOutbox
+from utils.metrics_server import MetricsServer
 from utils import is_updated_today
 from utils.arg_parse import parser
 from utils.logger import get_logger, setup_logging_from_dict
@@ -41,20 +53,62 @@ class Service:
     def __init__(self, config_path: str):
         self.portfolio_handler = None
         self.market_data_processor = None
+        self.signal_outbox: Optional[SignalOutbox] = None
+        self.gap_recovery: Optional[GapRecovery] = None
         self.config_dict: Optional[dict] = None
         self._get_config(config_path)
         self.config: Config = Config(**self.config_dict)
         self.db_repo: Repository = Repository(self.config.db_pgsql.address)
-        self.stream_bus: StreamBus = StreamBus()
-        self.tclient: TClient = TClient(token=self.config.tinkoff_client.token,
-                                        stream_bus=self.stream_bus)
+        self.stream_bus: StreamBus = StreamBus(
+            maxsize=self.config.stream_bus.maxsize,
+            shards=self.config.stream_bus.shards,
+            topic_shards=self.config.stream_bus.topic_shards,
+            topic_policy=self.config.stream_bus.topic_policy,
+        )
+        self.journal: Optional[JournalWriter] = None
+        if self.config.journal is not None:
+            self.journal = JournalWriter(
+                self.config.journal.directory,
+                segment_bytes=self.config.journal.segment_mb * 1024 * 1024,
+                flush_ms=self.config.journal.flush_ms,
+            )
+            self.stream_bus.add_sink(self.journal.write, topics=self.config.journal.topics)
+        self.metrics_server: Optional[MetricsServer] = None
+        if self.config.metrics is not None:
+            self.metrics_server = MetricsServer(host=self.config.metrics.host,
+                                                port=self.config.metrics.port)
+        tc = self.config.tinkoff_client
+        self.tclient: TClient = TClient(token=tc.token,
+                                        stream_bus=self.stream_bus,
+                                        idle_sec=tc.channel_idle_sec,
+                                        concurrency=tc.max_concurrency,
+                                        md_streams=tc.md_streams,
+                                        md_streams_max=tc.md_streams_max,
+                                        md_stream_capacity=tc.md_stream_capacity)
         self.redis = RedisClient(self.config.redis)
-        self.name_service = NameService(self.redis, self.tclient, self.config.name_cache)
+        self.notify_writer = NotifyWriter(self.db_repo)
+        self.last_price_writer = LastPriceWriter(
+            self.redis,
+            batch_size=self.config.redis.last_price_batch_size,
+            flush_ms=self.config.redis.last_price_flush_ms,
+        )
+        self.catalog = InstrumentCatalog(self.db_repo, self.tclient)
+        self.name_service = NameService(self.redis, self.catalog, self.config.name_cache)
         self.portfolio_svc: PortfolioService = PortfolioService(self.tclient, self.redis)
+        self.price_points = PricePointService(self.redis, self.tclient, catalog=self.catalog)
+        self.candle_store = CandleStore(self.db_repo, self.tclient)
+        self.last_prices = LastPriceService(self.redis, self.tclient)
+        self.instrument_snapshot: InstrumentSnapshot = InstrumentSnapshot()
 
         self.scheduler: Optional[AsyncIOScheduler] = None
         self.tg_bot: Bot = Bot(token=self.config.tg_bot.token,
                                default=DefaultBotProperties(parse_mode='HTML'))
+        self.telegram_delivery = DeliveryScheduler(
+            self.tg_bot,
+            global_rate=self.config.tg_bot.global_rate,
+            chat_rate=self.config.tg_bot.chat_rate,
+            digest_window_ms=self.config.tg_bot.digest_window_ms,
+        )
         self.dp: Dispatcher = Dispatcher(storage=MemoryStorage())
         self.dp.update.outer_middleware(DepsMiddleware(
             tclient=self.tclient,
@@ -62,6 +116,12 @@ class Service:
             name_service=self.name_service,
             redis=self.redis,
             portfolio_svc=self.portfolio_svc,
+            snapshot=self.instrument_snapshot,
+            price_points=self.price_points,
+            candle_store=self.candle_store,
+            last_prices=self.last_prices,
+            catalog=self.catalog,
+            notify_writer=self.notify_writer,
         ))
         self.dp.include_router(router=router)
         self.dp.include_router(router=rout_add_favorites)
@@ -90,6 +150,7 @@ class Service:
         start_t = parse_hhmm(self.config.scheduler_trading.start)
         close_t = parse_hhmm(self.config.scheduler_trading.close)
         check_expiration_date = parse_hhmm(self.config.scheduler_trading.check_expiration_date)
+        catalog_sync = parse_hhmm(self.config.scheduler_trading.catalog_sync)
 
         # 2) начало: гарантированно включить
         self.scheduler.add_job(
@@ -116,12 +177,23 @@ class Service:
             timezone=self.tz,
         )
 
+        # 5) справочник инструментов: полные выгрузки раз в день
+        self.scheduler.add_job(
+            self._job_sync_catalog,
+            CronTrigger(hour=catalog_sync.hour, minute=catalog_sync.minute),
+            id="catalog_sync",
+            replace_existing=True,
+            timezone=self.tz,
+        )
+
     async def _ensure_tclient_started(self):
         async with self._tclient_lock:
             if self._tclient_running:
                 return
             async with self.db_repo.session_factory() as s:
                 accounts = [a.account_id for a in await self.db_repo.list_accounts(session=s)]
+            # снимок загружается до старта стримов: первые тики уже видят индикаторы
+            await self.instrument_snapshot.load(self.db_repo)
             await self.tclient.start(accounts=accounts)
             self._tclient_running = True
             await self._refresh_indicators_and_subscriptions(update_notify=True)
@@ -135,10 +207,22 @@ class Service:
 
     async def _job_open_if_needed(self):
         await self._ensure_tclient_started()
+        checked = [s.instrument_id for s in self.instrument_snapshot.states() if s.check]
+        await self.price_points.warm(checked)
+        try:
+            await self.last_prices.refresh(checked)
+        except Exception as e:
+            self.log.warning("Last prices warm-up failed", extra={"exception": e})
 
     async def _job_close_and_stop(self):
         await self._ensure_tclient_stopped()
 
+    async def _job_sync_catalog(self):
+        try:
+            await self.catalog.sync()
+        except Exception as e:
+            self.log.error("Instrument catalog sync failed", extra={"exception": e})
+
     async def _job_check_expiration_date(self):
         today = datetime.now(self.tz).date()
         delete_ins = []
@@ -155,6 +239,7 @@ class Service:
                     exp_date = exp_dt.date()
                 if exp_date < today + dt.timedelta(days=1):
                     await self.db_repo.delete_instrument(i.instrument_id, s)
+                    self.instrument_snapshot.remove(i.instrument_id)
                     delete_ins.append(i)
                     deleted += 1
             if deleted:
@@ -165,12 +250,13 @@ class Service:
 
         txt_msg = (f"Закончился срок действия {len(delete_ins)} инструментов:\n"
                    f"{'\n'.join(i.ticker for i in delete_ins)}")
-        await self.tg_bot.send_message(
+        await self.telegram_delivery.send(
             self.config.tg_bot.chat_id,
             text=txt_msg
         )
 
     async def _refresh_indicators_and_subscriptions(self, update_notify: bool = False):
+        await self.candle_store.prune()
         # то же, что твой init_service, но без «вечного» старта
         async with self.db_repo.session_factory() as s:
             instruments = await self.db_repo.list_instruments(s)
@@ -186,25 +272,25 @@ class Service:
             await asyncio.gather(*tasks, return_exceptions=True)
             await s.commit()
         # Подписаться на активные
-        if self.tclient.subscribes.get('last_price'):
-            ids = [i.instrument_id for i in instruments if
-                   (i.check and i.instrument_id not in self.tclient.subscribes['last_price'])]
-        else:
-            ids = [i.instrument_id for i in instruments if i.check]
+        subscribed = self.tclient.last_price_subscriptions
+        ids = [i.instrument_id for i in instruments
+               if i.check and i.instrument_id not in subscribed]
         if ids:
             self.tclient.subscribe_to_instrument_last_price(*ids)
 
     async def _recalc_and_update(self, instrument_id: str, to_notify: bool, session: AsyncSession):
-        candles = await self.tclient.get_days_candles_for_2_months(instrument_id)
-        indicators = IndicatorCalculator(candles).build_instrument_update()
+        candles = await self.candle_store.get(instrument_id)
+        indicators = IndicatorCalculator.from_rows(candles).build_instrument_update()
         if to_notify:
             indicators['to_notify'] = True
+            self.notify_writer.set(instrument_id, True)
         await self.db_repo.update_instrument_from_patch(
             instrument_id=instrument_id,
             patch=indicators,
             touch_ts=True,
             session=session,
         )
+        self.instrument_snapshot.apply(instrument_id, indicators)
 
     async def _run_polling_forever(self):
         backoff = 5
@@ -248,31 +334,73 @@ class Service:
 
         return commands
 
+    def _batch_opts(self, topic: str) -> dict:
+        batch = self.config.stream_bus.topic_batch.get(topic)
+        if batch is None:
+            return {"batch_size": 1}
+        return {"batch_size": batch.size, "batch_wait_ms": batch.wait_ms}
+
     async def start(self):
         await self.db_repo.create_schema_if_not_exists()
 
-        self.market_data_processor = await MarketDataHandler.create(
-            self.tg_bot,
+        self.signal_outbox = SignalOutbox(
+            self.telegram_delivery,
             chat_id=self.config.tg_bot.chat_id,
             db=self.db_repo,
             name_service=self.name_service,
-            tclient=self.tclient,
+            price_points=self.price_points,
+            portfolio_svc=self.portfolio_svc,
+        )
+        self.market_data_processor = await MarketDataHandler.create(
+            db=self.db_repo,
             redis=self.redis,
-            portfolio_svc=self.portfolio_svc
+            snapshot=self.instrument_snapshot,
+            last_price_writer=self.last_price_writer,
+            outbox=self.signal_outbox,
+            notify_writer=self.notify_writer,
         )
         self.portfolio_handler = PortfolioHandler(
-            self.tg_bot,
+            self.telegram_delivery,
             chat_id=self.config.tg_bot.chat_id,
             db=self.db_repo,
             name_service=self.name_service,
-            tclient=self.tclient
+            tclient=self.tclient,
+            snapshot=self.instrument_snapshot,
+            portfolio_svc=self.portfolio_svc,
+            candle_store=self.candle_store,
+            notify_writer=self.notify_writer,
         )
-        self.stream_bus.subscribe('market_data_stream', self.market_data_processor.execute)
-        self.stream_bus.subscribe('portfolio_stream', self.portfolio_handler.execute)
-
+        # Пока обработчик занят, по каждому инструменту ждёт только последний тик
+        # (политика conflate), а накопленное забирается одной пачкой
+        md = self.market_data_processor
+        self.stream_bus.configure('md.last_price', key=MarketDataHandler.last_price_key)
+        self.stream_bus.configure('portfolio_stream', key=PortfolioHandler.shard_key)
+        self.stream_bus.subscribe('md.last_price', md.on_last_prices,
+                                  **self._batch_opts('md.last_price'))
+        self.stream_bus.subscribe('md.subscription', md.on_subscription)
+        self.stream_bus.subscribe('md.candle', md.on_candle)
+        self.stream_bus.subscribe('md.trade', md.on_trade)
+        # после переподключения стрима пропущенное догоняется тем же путём оценки
+        self.gap_recovery = GapRecovery(self.tclient, md.on_recovered_prices)
+        self.stream_bus.subscribe(GAP_TOPIC, self.gap_recovery.on_gap)
+        self.stream_bus.subscribe('portfolio_stream', self.portfolio_handler.execute_batch,
+                                  **self._batch_opts('portfolio_stream'))
+
+        if self.journal is not None:
+            await self.journal.start()
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
         await self.stream_bus.start()
         await self.redis.connect()
+        await self.last_price_writer.start()
+        await self.notify_writer.start()
+        await self.telegram_delivery.start()
+        await self.signal_outbox.start()
         self.scheduler.start()
+        try:
+            await self.catalog.sync_if_stale()
+        except Exception as e:
+            self.log.error("Instrument catalog sync failed", extra={"exception": e})
         if self.trading_time():
             await self._job_open_if_needed()
 
@@ -285,8 +413,19 @@ class Service:
     async def stop(self):
         self.scheduler.shutdown(wait=False)
         await self._ensure_tclient_stopped()
-        await self.tg_bot.session.close()
+        await self.tclient.close()
+        # сначала шина: после неё никто не кладёт сигналы в outbox и сообщения в доставку
         await self.stream_bus.stop()
+        if self.signal_outbox is not None:
+            await self.signal_outbox.stop()
+        await self.telegram_delivery.stop()
+        await self.tg_bot.session.close()
+        if self.journal is not None:
+            await self.journal.stop()
+        await self.last_price_writer.stop()
+        await self.notify_writer.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
 
 
 def iter_message_handlers(router: Router):
@@ -0,0 +1,45 @@
+"""instrument_catalog table
+
+Revision ID: c4d2e3f5a6b7
+Revises: b3f1c2d4e5a6
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d2e3f5a6b7'
+down_revision: Union[str, Sequence[str], None] = 'b3f1c2d4e5a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "instrument_catalog",
+        sa.Column("uid", sa.String(length=40), nullable=False),
+        sa.Column("figi", sa.String(length=32), nullable=True),
+        sa.Column("ticker", sa.String(length=32), nullable=True),
+        sa.Column("class_code", sa.String(length=16), nullable=True),
+        sa.Column("name", sa.String(length=256), nullable=False),
+        sa.Column("type", sa.String(length=16), nullable=True),
+        sa.Column("lot", sa.Integer(), nullable=True),
+        sa.Column("currency", sa.String(length=8), nullable=True),
+        sa.Column("expiration_date", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("uid", name="pk_instrument_catalog"),
+    )
+    op.create_index("ix_instrument_catalog_figi", "instrument_catalog", ["figi"])
+    op.create_index("ix_instrument_catalog_ticker", "instrument_catalog", ["ticker"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_instrument_catalog_ticker", table_name="instrument_catalog")
+    op.drop_index("ix_instrument_catalog_figi", table_name="instrument_catalog")
+    op.drop_table("instrument_catalog")
@@ -0,0 +1,66 @@
+import datetime as dt
+from typing import List, Sequence
+
+import tinkoff.invest as ti
+from tinkoff.invest.utils import quotation_to_decimal as q2d
+
+from clients.tinkoff.client import TClient
+from database.pgsql.models import DailyCandle
+from database.pgsql.repository import Repository
+from utils.logger import get_logger
+
+
+class CandleStore:
+    """
+    Дневные свечи в таблице daily_candles с инкрементальной догрузкой.
+
+    get() запрашивает у API только бары после последней сохранённой
+    завершённой свечи (в обычный день — один бар), сохраняет завершённые и
+    отдаёт окно за последние days дней из БД. Незавершённая свеча текущего
+    дня не хранится: индикаторы считаются только по закрытым барам.
+    """
+
+    def __init__(self, db: Repository, tclient: TClient, days: int = 100):
+        self._db = db
+        self._tclient = tclient
+        self._days = days
+        self.log = get_logger(self.__class__.__name__)
+
+    @staticmethod
+    def _row(instrument_id: str, candle: ti.HistoricCandle) -> dict:
+        return {
+            "instrument_id": instrument_id,
+            "time": candle.time,
+            "open": float(q2d(candle.open)),
+            "high": float(q2d(candle.high)),
+            "low": float(q2d(candle.low)),
+            "close": float(q2d(candle.close)),
+            "volume": candle.volume,
+        }
+
+    async def get(self, instrument_id: str) -> Sequence[DailyCandle]:
+        # начало окна — с полуночи: одинаковый start у одновременных запросов
+        # одного uid, и TClient склеивает их в один GetCandles
+        since = dt.datetime.combine(dt.datetime.now(dt.timezone.utc).date(), dt.time(),
+                                    dt.timezone.utc) - dt.timedelta(days=self._days)
+        async with self._db.session_factory() as s:
+            last = await self._db.last_candle_time(instrument_id, s)
+        # соединение с БД не держим, пока ждём ответа API
+        start = since if last is None or last < since else last + dt.timedelta(seconds=1)
+        response = await self._tclient.get_days_candles_since(instrument_id, start)
+        rows: List[dict] = [self._row(instrument_id, c)
+                            for c in response.candles if c.is_complete]
+        async with self._db.session_factory() as s:
+            if rows:
+                await self._db.upsert_candles(rows, session=s)
+                await s.commit()
+            self.log.debug("Candles synced", extra={"instrument_id": instrument_id,
+                                                    "new": len(rows), "from": start})
+            return await self._db.list_candles(instrument_id, since, session=s)
+
+    async def prune(self) -> None:
+        """Удалить свечи старше окна расчёта."""
+        cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=self._days + 7)
+        async with self._db.session_factory() as s:
+            await self._db.delete_candles_before(cutoff, session=s)
+            await s.commit()
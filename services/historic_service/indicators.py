@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, Iterable, List, Optional
 
 import tinkoff.invest as ti
 from tinkoff.invest.utils import quotation_to_decimal as q2d
@@ -28,6 +28,19 @@ class IndicatorCalculator:
         self._low: Optional[List[float]] = None
         self._close: Optional[List[float]] = None
 
+    @classmethod
+    def from_rows(cls, rows: Iterable[Any]) -> "IndicatorCalculator":
+        """
+        Из сохранённых завершённых свечей (DailyCandle из CandleStore),
+        упорядоченных по времени: ряды берутся из полей high/low/close.
+        """
+        calc = cls(ti.GetCandlesResponse(candles=[]))
+        rows = list(rows)
+        calc._high = [r.high for r in rows]
+        calc._low = [r.low for r in rows]
+        calc._close = [r.close for r in rows]
+        return calc
+
     # ---------- базовые ряды ----------
     @property
     def _highs(self) -> List[float]:
@@ -0,0 +1,74 @@
+import asyncio
+import datetime as dt
+from typing import Awaitable, Callable, List, Optional
+
+import tinkoff.invest as ti
+
+from clients.tinkoff.client import StreamGap, TClient
+from utils.logger import get_logger
+
+Evaluate = Callable[[List[ti.LastPrice]], Awaitable[None]]
+
+# GetCandles с минутным интервалом отдаёт не больше суток за запрос
+MAX_CANDLE_WINDOW = dt.timedelta(days=1)
+
+
+class GapRecovery:
+    """
+    Догон пропущенного после переподключения рыночного стрима (топик md.gap).
+
+    Один GetLastPrices на все подписанные uid; если разрыв длиннее
+    candle_gap_sec — ещё минутные свечи за время разрыва, из которых берутся
+    экстремумы (high и low) как отдельные тики. Всё уходит в evaluate
+    (MarketDataHandler.on_recovered_prices) — та же оценка, что и у живых
+    тиков, но без учёта в задержке: сначала экстремумы по времени,
+    последней — текущая цена.
+    """
+
+    def __init__(self, tclient: TClient, evaluate: Evaluate, candle_gap_sec: float = 60.0):
+        self._tclient = tclient
+        self._evaluate = evaluate
+        self._candle_gap = candle_gap_sec
+        self.log = get_logger(self.__class__.__name__)
+
+    async def on_gap(self, gap: StreamGap) -> None:
+        ids = list(gap.instruments)
+        ticks: List[ti.LastPrice] = []
+        if gap.seconds >= self._candle_gap:
+            results = await asyncio.gather(*(self._extremes(uid, gap) for uid in ids),
+                                           return_exceptions=True)
+            for uid, res in zip(ids, results):
+                if isinstance(res, Exception):
+                    self.log.warning("Gap candles failed",
+                                     extra={"instrument_id": uid, "exception": res})
+                else:
+                    ticks.extend(res)
+        try:
+            ticks.extend(lp for lp in await self._tclient.get_last_prices(ids)
+                         if lp.time is not None)
+        except Exception as e:
+            self.log.error("Gap last prices failed", extra={"exception": e})
+        self.log.info("Gap catch-up", extra={"gap_sec": round(gap.seconds, 1),
+                                             "instruments": len(ids), "ticks": len(ticks)})
+        if ticks:
+            await self._evaluate(ticks)
+
+    async def _extremes(self, uid: str, gap: StreamGap) -> List[ti.LastPrice]:
+        start = max(gap.started, gap.resumed - MAX_CANDLE_WINDOW)
+        response = await self._tclient.get_minute_candles(uid, start, gap.resumed)
+        high: Optional[ti.HistoricCandle] = None
+        low: Optional[ti.HistoricCandle] = None
+        for c in response.candles:
+            if high is None or _gt(c.high, high.high):
+                high = c
+            if low is None or _gt(low.low, c.low):
+                low = c
+        if high is None:
+            return []
+        points = sorted([(high.time, high.high), (low.time, low.low)], key=lambda p: p[0])
+        return [ti.LastPrice(instrument_uid=uid, figi=None, price=price, time=time)
+                for time, price in points]
+
+
+def _gt(a: ti.Quotation, b: ti.Quotation) -> bool:
+    return (a.units, a.nano) > (b.units, b.nano)
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from aiogram.types import LinkPreviewOptions
+
+from bots.tg_bot.delivery import DeliveryScheduler
+from bots.tg_bot.messages.messages_const import text_favorites_breakout, text_stop_long_position, \
+    text_stop_short_position
+from clients.tinkoff.name_service import NameService
+from clients.tinkoff.portfolio_svc import PortfolioService
+from clients.tinkoff.price_point import PricePointService
+from core.domains.breakout import SignalKind
+from database.pgsql.models import Instrument
+from database.pgsql.repository import Repository
+
+
+@dataclass(slots=True)
+class SignalRecord:
+    instrument_id: str
+    kind: SignalKind
+    price: float
+    created_at: float = field(default_factory=time.time)
+    attempts: int = 0
+
+
+class SignalOutbox:
+    """
+    Внутрипроцессный outbox торговых сигналов.
+
+    Обработка тиков только кладёт SignalRecord через put() и сразу
+    возвращается. Отдельная задача-отправитель достаёт записи, обогащает сигнал
+    (индикаторы из БД, стоимость пункта, портфели), рендерит текст и ставит его
+    в DeliveryScheduler. При ошибке запись возвращается в очередь
+    с экспоненциальной задержкой, до max_attempts попыток; на stop() отложенные
+    повторы возвращаются в очередь сразу и успевают попасть в join().
+    """
+
+    def __init__(self, delivery: DeliveryScheduler, chat_id: int, db: Repository,
+                 name_service: NameService,
+                 price_points: PricePointService, portfolio_svc: PortfolioService,
+                 maxsize: int = 1000, max_attempts: int = 5, retry_delay: float = 2.0):
+        self._delivery = delivery
+        self._chat_id = chat_id
+        self._db = db
+        self._name_service = name_service
+        self._price_points = price_points
+        self._portfolio_svc = portfolio_svc
+        self._q: asyncio.Queue[SignalRecord] = asyncio.Queue(maxsize=maxsize)
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self._task: Optional[asyncio.Task] = None
+        # отложенные повторы: id(record) -> (таймер call_later, запись)
+        self._retries: Dict[int, Tuple[asyncio.TimerHandle, SignalRecord]] = {}
+        self._stopping = False
+        self.log = logging.getLogger(self.__class__.__name__)
+
+    def __len__(self) -> int:
+        return self._q.qsize() + len(self._retries)
+
+    def put(self, record: SignalRecord) -> None:
+        try:
+            self._q.put_nowait(record)
+        except asyncio.QueueFull:
+            self.log.error("Signal outbox is full, drop signal",
+                           extra={"instrument_id": record.instrument_id, "kind": record.kind})
+
+    async def join(self) -> None:
+        await self._q.join()
+
+    async def _loop(self) -> None:
+        while True:
+            record = await self._q.get()
+            try:
+                await self._process(record)
+            except Exception as e:
+                self._retry(record, e)
+            finally:
+                self._q.task_done()
+
+    def _retry(self, record: SignalRecord, error: Exception) -> None:
+        record.attempts += 1
+        if record.attempts >= self._max_attempts:
+            self.log.error("Signal delivery failed, give up",
+                           extra={"instrument_id": record.instrument_id, "kind": record.kind,
+                                  "attempts": record.attempts, "exception": error})
+            return
+        if self._stopping:
+            self.put(record)
+            return
+        delay = self._retry_delay * 2 ** (record.attempts - 1)
+        self.log.warning("Signal delivery failed, retry",
+                         extra={"instrument_id": record.instrument_id, "kind": record.kind,
+                                "attempts": record.attempts, "delay": delay,
+                                "exception": error})
+        handle = asyncio.get_running_loop().call_later(delay, self._requeue, record)
+        self._retries[id(record)] = (handle, record)
+
+    def _requeue(self, record: SignalRecord) -> None:
+        self._retries.pop(id(record), None)
+        self.put(record)
+
+    async def _process(self, record: SignalRecord) -> None:
+        async with self._db.session_factory() as s:
+            instrument = await self._db.get_instrument(record.instrument_id, s)
+            if instrument is None:
+                self.log.debug("No instrument in DataBase for %s", record.instrument_id)
+                return
+
+        text = await self._render(record, instrument)
+        await self._delivery.send(
+            self._chat_id,
+            text,
+            digest=True,
+            link_preview_options=LinkPreviewOptions(is_disabled=True)
+        )
+        self.log.info("Signal queued for delivery",
+                      extra={"instrument_id": record.instrument_id, "kind": record.kind,
+                             "age_sec": round(time.time() - record.created_at, 3)})
+
+    async def _render(self, record: SignalRecord, instrument: Instrument) -> str:
+        if record.kind == SignalKind.STOP_LONG:
+            return await text_stop_long_position(instrument, last_price=record.price,
+                                                 name_service=self._name_service)
+        if record.kind == SignalKind.STOP_SHORT:
+            return await text_stop_short_position(instrument, last_price=record.price,
+                                                  name_service=self._name_service)
+
+        price_point_value = await self._price_points.get(record.instrument_id)
+        portfolios = await self._portfolio_svc.list_portfolios(self._db)
+        side = 'long' if record.kind == SignalKind.BREAKOUT_LONG else 'short'
+        return await text_favorites_breakout(instrument, side,
+                                             last_price=record.price,
+                                             name_service=self._name_service,
+                                             price_point_value=price_point_value,
+                                             portfolios=portfolios)
+
+    async def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Дать очереди сигналов обработаться за timeout секунд и остановить отправителя."""
+        if self._task:
+            # повторы ждут в call_later вне очереди — вернуть их в неё до join(),
+            # новые ошибки до конца остановки тоже повторяются без задержки
+            self._stopping = True
+            for handle, record in self._retries.values():
+                handle.cancel()
+                self.put(record)
+            self._retries.clear()
+            try:
+                await asyncio.wait_for(self._q.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                self.log.warning("Signal outbox not drained on stop",
+                                 extra={"pending": self._q.qsize()})
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._stopping = False
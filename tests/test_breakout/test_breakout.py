@@ -0,0 +1,57 @@
+from core.domains.breakout import BreakoutEvaluator, SignalKind
+from core.domains.instrument_snapshot import InstrumentSnapshot
+from core.domains.trigger_index import TriggerIndex
+
+
+def _snapshot():
+    snapshot = InstrumentSnapshot()
+    snapshot.apply("FLAT", {"check": True, "to_notify": True,
+                            "donchian_long_55": 150.0, "donchian_short_55": 50.0})
+    snapshot.apply("LONG", {"check": True, "to_notify": True, "donchian_short_20": 90.0})
+    snapshot.set_position("ACC", "LONG", "long")
+    snapshot.apply("SHORT", {"check": True, "to_notify": True, "donchian_long_20": 110.0})
+    snapshot.set_position("ACC", "SHORT", "short")
+    snapshot.apply("OFF", {"check": True, "to_notify": False,
+                           "donchian_long_55": 150.0, "donchian_short_55": 50.0})
+    return snapshot
+
+
+def test_batch_returns_only_crossed_instruments():
+    evaluator = BreakoutEvaluator(TriggerIndex(_snapshot()))
+
+    hits = evaluator.evaluate(
+        ["FLAT", "LONG", "SHORT", "OFF", "UNKNOWN"],
+        [151.0, 100.0, 111.0, 200.0, 1.0],
+    )
+
+    assert [(h.instrument_id, h.kind) for h in hits] == [
+        ("FLAT", SignalKind.BREAKOUT_LONG),
+        ("SHORT", SignalKind.STOP_SHORT),
+    ]
+
+
+def test_one_signal_per_instrument_per_batch():
+    evaluator = BreakoutEvaluator(TriggerIndex(_snapshot()))
+
+    hits = evaluator.evaluate(["FLAT", "FLAT", "LONG"], [40.0, 160.0, 80.0])
+
+    assert [(h.instrument_id, h.kind, h.price) for h in hits] == [
+        ("FLAT", SignalKind.BREAKOUT_SHORT, 40.0),
+        ("LONG", SignalKind.STOP_LONG, 80.0),
+    ]
+
+
+def test_follows_snapshot_changes():
+    snapshot = _snapshot()
+    evaluator = BreakoutEvaluator(TriggerIndex(snapshot))
+
+    snapshot.set_notify("FLAT", False)
+    assert evaluator.evaluate(["FLAT"], [151.0]) == []
+
+    snapshot.set_notify("FLAT", True)
+    snapshot.set_position("ACC", "FLAT", "long")
+    snapshot.apply("FLAT", {"donchian_short_20": 120.0})
+    assert [h.kind for h in evaluator.evaluate(["FLAT"], [119.0])] == [SignalKind.STOP_LONG]
+
+    snapshot.remove("FLAT")
+    assert evaluator.evaluate(["FLAT"], [0.0]) == []
@@ -0,0 +1,47 @@
+import math
+
+from core.domains.instrument_snapshot import InstrumentSnapshot
+from core.domains.trigger_index import BAND_FLAT, BAND_LONG, BAND_NONE, TriggerIndex
+
+
+def test_band_follows_position_and_indicators():
+    snapshot = InstrumentSnapshot()
+    index = TriggerIndex(snapshot)
+
+    snapshot.apply("UID", {"check": True, "to_notify": True,
+                           "donchian_long_55": 150.0, "donchian_short_55": 50.0,
+                           "donchian_long_20": 120.0, "donchian_short_20": 80.0})
+    assert index.band("UID") == (BAND_FLAT, 50.0, 150.0)
+
+    snapshot.set_position("ACC", "UID", "long")
+    assert index.band("UID") == (BAND_LONG, 80.0, math.inf)
+
+    snapshot.apply("UID", {"donchian_short_20": 85.0})
+    assert index.band("UID") == (BAND_LONG, 85.0, math.inf)
+
+    snapshot.set_notify("UID", False)
+    assert index.band("UID") == (BAND_NONE, -math.inf, math.inf)
+
+
+def test_inside_rejects_ticks_within_band():
+    snapshot = InstrumentSnapshot()
+    snapshot.apply("UID", {"check": True, "to_notify": True,
+                           "donchian_long_55": 150.0, "donchian_short_55": 50.0})
+    index = TriggerIndex(snapshot)
+
+    assert index.inside("UID", 100.0)
+    assert not index.inside("UID", 150.0)
+    assert not index.inside("UID", 50.0)
+    assert index.inside("UNKNOWN", 1e9)
+
+
+def test_removed_slot_is_reused():
+    snapshot = InstrumentSnapshot()
+    index = TriggerIndex(snapshot)
+    snapshot.apply("A", {"check": True, "to_notify": True, "donchian_long_55": 10.0})
+    snapshot.remove("A")
+    snapshot.apply("B", {"check": True, "to_notify": True, "donchian_long_55": 20.0})
+
+    assert len(index) == 1
+    assert index.band("A") is None
+    assert index.band("B") == (BAND_FLAT, -math.inf, 20.0)
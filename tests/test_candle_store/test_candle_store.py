@@ -0,0 +1,96 @@
+import asyncio
+import datetime as dt
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from services.historic_service.candle_store import CandleStore
+from services.historic_service.indicators import IndicatorCalculator
+from tests.test_market_data_handler.factories import quotation
+from tests.test_market_data_handler.fakes import FakeRepository
+
+pytestmark = pytest.mark.asyncio
+
+
+def _historic(day: dt.datetime, price: int, complete: bool = True):
+    return SimpleNamespace(time=day, open=quotation(price, 0), high=quotation(price + 1, 0),
+                           low=quotation(price - 1, 0), close=quotation(price, 0),
+                           volume=10, is_complete=complete)
+
+
+class _Repository(FakeRepository):
+    def __init__(self):
+        super().__init__()
+        self.rows = {}
+        self.open_sessions = 0
+
+    @asynccontextmanager
+    async def session_factory(self):
+        self.open_sessions += 1
+        try:
+            async with super().session_factory() as s:
+                yield s
+        finally:
+            self.open_sessions -= 1
+
+    async def last_candle_time(self, instrument_id, session):
+        times = [t for uid, t in self.rows if uid == instrument_id]
+        return max(times) if times else None
+
+    async def upsert_candles(self, rows, session):
+        for r in rows:
+            self.rows[(r["instrument_id"], r["time"])] = SimpleNamespace(**r)
+
+    async def list_candles(self, instrument_id, since, session):
+        return [r for (uid, t), r in sorted(self.rows.items(), key=lambda kv: kv[0][1])
+                if uid == instrument_id and t >= since]
+
+
+class _TClient:
+    def __init__(self, candles, db=None):
+        self.candles = candles
+        self.starts = []
+        self.db = db
+        self.sessions_during_fetch = []
+
+    async def get_days_candles_since(self, instrument_id, start):
+        self.starts.append(start)
+        if self.db is not None:
+            self.sessions_during_fetch.append(self.db.open_sessions)
+        return SimpleNamespace(candles=[c for c in self.candles if c.time >= start])
+
+
+async def test_second_sync_requests_only_bars_after_last_complete():
+    today = dt.datetime.now(dt.timezone.utc).replace(hour=7, minute=0, second=0, microsecond=0)
+    days = [today - dt.timedelta(days=n) for n in range(30, 0, -1)]
+    tclient = _TClient([_historic(d, 100 + i) for i, d in enumerate(days)]
+                       + [_historic(today, 200, complete=False)])
+    store = CandleStore(_Repository(), tclient)
+
+    first = await store.get("UID")
+    second = await store.get("UID")
+
+    assert len(first) == len(second) == 30  # незавершённый бар не хранится
+    assert tclient.starts[1] == days[-1] + dt.timedelta(seconds=1)
+    assert IndicatorCalculator.from_rows(second).build_instrument_update()["atr14"] == 2.0
+
+
+async def test_concurrent_first_syncs_request_the_same_start():
+    tclient = _TClient([])
+    store = CandleStore(_Repository(), tclient)
+
+    await asyncio.gather(store.get("UID"), store.get("UID"))
+
+    assert tclient.starts[0] == tclient.starts[1]  # один ключ для single_flight TClient
+    assert tclient.starts[0].time() == dt.time()
+
+
+async def test_session_is_not_held_while_fetching_from_api():
+    db = _Repository()
+    today = dt.datetime.now(dt.timezone.utc).replace(hour=7, minute=0, second=0, microsecond=0)
+    tclient = _TClient([_historic(today - dt.timedelta(days=1), 100)], db=db)
+    store = CandleStore(db, tclient)
+
+    assert len(await store.get("UID")) == 1
+    assert tclient.sessions_during_fetch == [0] and db.open_sessions == 0
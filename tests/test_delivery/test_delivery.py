@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+
+from bots.tg_bot.delivery import DeliveryScheduler, pack_digest
+from utils.metrics import MetricsRegistry
+
+pytestmark = pytest.mark.asyncio
+
+
+class _Bot:
+    def __init__(self, fail_first: int = 0, delay: float = 0.0):
+        self.sent = []
+        self._fail = fail_first
+        self._delay = delay
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self._delay)
+        if self._fail:
+            self._fail -= 1
+            raise TelegramRetryAfter(method=None, message="Flood control", retry_after=0)
+        self.sent.append((chat_id, text))
+
+
+async def test_pack_digest_respects_limit():
+    texts = ["a" * 40, "b" * 40, "c" * 40, "d" * 130]
+
+    messages = pack_digest(texts, limit=100, separator="\n")
+
+    assert messages == ["a" * 40 + "\n" + "b" * 40, "c" * 40, "d" * 100, "d" * 30]
+    assert all(len(m) <= 100 for m in messages)
+
+
+async def test_signals_in_window_are_sent_as_one_digest():
+    bot = _Bot()
+    delivery = DeliveryScheduler(bot, digest_window_ms=20, metrics=MetricsRegistry())
+    await delivery.start()
+
+    await delivery.send(1, "first", digest=True)
+    await delivery.send(1, "second", digest=True)
+    await delivery.send(2, "other chat", digest=True)
+    await asyncio.sleep(0.05)
+    await delivery.stop()
+
+    assert sorted(bot.sent) == [(1, "first\n\nsecond"), (2, "other chat")]
+    assert delivery.stats()["digested"] == 1
+
+
+async def test_retry_after_requeues_message():
+    bot = _Bot(fail_first=1)
+    delivery = DeliveryScheduler(bot, digest_window_ms=0, metrics=MetricsRegistry())
+    await delivery.start()
+
+    await delivery.send(1, "hello")
+    await delivery.stop()
+
+    assert bot.sent == [(1, "hello")]
+    assert delivery.stats()["retried"] == 1 and delivery.stats()["dropped"] == 0
+
+
+async def test_stop_waits_for_message_being_sent():
+    bot = _Bot(delay=0.05)
+    metrics = MetricsRegistry()
+    delivery = DeliveryScheduler(bot, digest_window_ms=0, metrics=metrics)
+    await delivery.start()
+
+    await delivery.send(1, "last alert")
+    await asyncio.sleep(0)  # цикл уже забрал сообщение из очереди
+    await delivery.stop()
+
+    assert bot.sent == [(1, "last alert")]
+    assert metrics.counter("tg_delivery_sent_total").value == 1
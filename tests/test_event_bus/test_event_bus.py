@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from core.domains.event_bus import OverflowPolicy, StreamBus
+from utils.metrics import MetricsRegistry
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_order_is_kept_per_key_across_shards():
+    bus = StreamBus(shards=4)
+    bus.configure("ticks", key=lambda e: e[0])
+    seen = {}
+
+    async def _h(event):
+        key, n = event
+        await asyncio.sleep(0.001 * (n % 3))
+        seen.setdefault(key, []).append(n)
+
+    bus.subscribe("ticks", _h)
+    await bus.start()
+    for n in range(20):
+        for key in ("A", "B", "C"):
+            await bus.publish("ticks", (key, n))
+    await bus.stop()
+
+    assert seen == {key: list(range(20)) for key in ("A", "B", "C")}
+
+
+async def test_slow_topic_does_not_block_other_topics():
+    bus = StreamBus()
+    release = asyncio.Event()
+    fast = []
+
+    async def _slow(_):
+        await release.wait()
+
+    async def _fast(event):
+        fast.append(event)
+
+    bus.subscribe("portfolio", _slow)
+    bus.subscribe("ticks", _fast)
+    await bus.start()
+
+    await bus.publish("portfolio", 1)
+    await bus.publish("ticks", 1)
+    await bus.publish("ticks", 2)
+    await asyncio.sleep(0.01)
+
+    assert fast == [1, 2]
+    release.set()
+    await bus.stop()
+
+
+async def _stalled_bus(policy, key=None):
+    bus = StreamBus(maxsize=2, metrics=MetricsRegistry())
+    bus.configure("ticks", key=key, policy=policy)
+    release = asyncio.Event()
+    seen = []
+
+    async def _h(event):
+        await release.wait()
+        seen.append(event)
+
+    bus.subscribe("ticks", _h)
+    await bus.start()
+    await bus.publish("ticks", ("X", 0))
+    await asyncio.sleep(0)  # воркер забрал первое событие и завис в обработчике
+    return bus, release, seen
+
+
+@pytest.mark.parametrize("policy, expected, dropped", [
+    (OverflowPolicy.DROP_NEWEST, [("X", 0), ("A", 1), ("B", 1)], 2),
+    (OverflowPolicy.DROP_OLDEST, [("X", 0), ("A", 2), ("B", 2)], 2),
+])
+async def test_drop_policies_never_block_publish(policy, expected, dropped):
+    bus, release, seen = await _stalled_bus(policy)
+
+    for n in (1, 2):
+        for key in ("A", "B"):
+            await asyncio.wait_for(bus.publish("ticks", (key, n)), timeout=0.1)
+    stats = bus.stats()[0]
+    release.set()
+    await bus.stop()
+
+    assert seen == expected
+    assert stats["dropped"] == dropped
+
+
+async def test_conflate_keeps_latest_per_key():
+    bus, release, seen = await _stalled_bus(OverflowPolicy.CONFLATE, key=lambda e: e[0])
+
+    for n in (1, 2, 3):
+        for key in ("A", "B"):
+            await asyncio.wait_for(bus.publish("ticks", (key, n)), timeout=0.1)
+    stats = bus.stats()[0]
+    release.set()
+    await bus.stop()
+
+    assert seen == [("X", 0), ("A", 3), ("B", 3)]
+    assert stats["conflated"] == 4 and stats["dropped"] == 0
+
+
+async def test_batch_subscriber_gets_lists_alongside_single_subscriber():
+    bus = StreamBus()
+    batches, singles = [], []
+
+    async def _batch(events):
+        batches.append(list(events))
+
+    async def _single(event):
+        singles.append(event)
+
+    bus.subscribe("ticks", _batch, batch_size=3, batch_wait_ms=20)
+    bus.subscribe("ticks", _single)
+    await bus.start()
+    for n in range(5):
+        await bus.publish("ticks", n)
+    await asyncio.sleep(0.05)
+    await bus.stop()
+
+    assert batches == [[0, 1, 2], [3, 4]]
+    assert singles == [0, 1, 2, 3, 4]
+
+
+async def test_publish_before_start_is_counted_as_dropped():
+    metrics = MetricsRegistry()
+    bus = StreamBus(metrics=metrics)
+    bus.subscribe("ticks", lambda e: None)
+
+    await bus.publish("ticks", 1)
+    await bus.publish("no_subscribers", 1)
+
+    assert metrics.counter("stream_bus_dropped_total", topic="ticks").value == 1
+    assert metrics.counter("stream_bus_dropped_total", topic="no_subscribers").value == 0
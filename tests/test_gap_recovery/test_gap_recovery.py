@@ -0,0 +1,58 @@
+import datetime as dt
+from types import SimpleNamespace
+
+import pytest
+
+from clients.tinkoff.client import StreamGap
+from services.signals.gap_recovery import GapRecovery
+from tests.test_market_data_handler.factories import last_price, quotation
+
+pytestmark = pytest.mark.asyncio
+
+T0 = dt.datetime(2026, 3, 2, 10, 0, tzinfo=dt.timezone.utc)
+
+
+def _candle(minute: int, high: int, low: int):
+    return SimpleNamespace(time=T0 + dt.timedelta(minutes=minute),
+                           high=quotation(high, 0), low=quotation(low, 0))
+
+
+class _TClient:
+    def __init__(self):
+        self.candle_calls = []
+        self.last_price_calls = []
+
+    async def get_minute_candles(self, uid, start, end):
+        self.candle_calls.append(uid)
+        return SimpleNamespace(candles=[_candle(1, 105, 99), _candle(2, 103, 95)])
+
+    async def get_last_prices(self, ids):
+        self.last_price_calls.append(list(ids))
+        return [last_price(uid, 100.0) for uid in ids]
+
+
+async def _run(gap_sec: float):
+    tclient = _TClient()
+    evaluated = []
+
+    async def _evaluate(ticks):
+        evaluated.extend(ticks)
+
+    gap = StreamGap(T0, T0 + dt.timedelta(seconds=gap_sec), ("A", "B"))
+    await GapRecovery(tclient, _evaluate, candle_gap_sec=60).on_gap(gap)
+    return tclient, evaluated
+
+
+async def test_short_gap_costs_one_bulk_request():
+    tclient, evaluated = await _run(5)
+
+    assert tclient.last_price_calls == [["A", "B"]] and tclient.candle_calls == []
+    assert [t.instrument_uid for t in evaluated] == ["A", "B"]
+
+
+async def test_long_gap_feeds_extremes_before_last_price():
+    tclient, evaluated = await _run(600)
+
+    a = [(t.price.units, t.time) for t in evaluated if t.instrument_uid == "A"]
+    assert [p for p, _ in a] == [105, 95, 100]
+    assert a[0][1] < a[1][1]
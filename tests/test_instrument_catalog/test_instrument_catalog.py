@@ -0,0 +1,65 @@
+import datetime as dt
+from types import SimpleNamespace
+
+import pytest
+
+from clients.tinkoff.catalog import InstrumentCatalog
+from tests.test_market_data_handler.fakes import FakeRepository
+
+pytestmark = pytest.mark.asyncio
+
+EXPIRES = dt.datetime(2026, 12, 18, tzinfo=dt.timezone.utc)
+
+
+def _item(uid: str, ticker: str, **extra):
+    return SimpleNamespace(uid=uid, figi=f"FIGI{uid}", ticker=ticker, class_code="TQBR",
+                           name=f"name:{uid}", lot=1, currency="rub", **extra)
+
+
+class _Repository(FakeRepository):
+    def __init__(self):
+        super().__init__()
+        self.rows = {}
+
+    async def upsert_catalog(self, rows, session):
+        for r in rows:
+            self.rows[r["uid"]] = SimpleNamespace(**r)
+
+    async def get_catalog(self, uids, session):
+        return [self.rows[uid] for uid in uids if uid in self.rows]
+
+    async def delete_catalog_before(self, cutoff, session):
+        self.rows = {uid: r for uid, r in self.rows.items() if r.updated_at >= cutoff}
+
+
+class _TClient:
+    def __init__(self):
+        self.calls = []
+
+    async def get_instrument_listings(self):
+        self.calls.append("listings")
+        return {"share": [_item("SBER", "SBER")],
+                "futures": [_item("SiZ6", "SiZ6", expiration_date=EXPIRES)]}
+
+    async def get_info(self, uid):
+        self.calls.append(("get_info", uid))
+        return SimpleNamespace(instrument=_item(uid, uid, instrument_type="futures"))
+
+    async def get_futures_response(self, uid):
+        self.calls.append(("future_by", uid))
+        return SimpleNamespace(instrument=SimpleNamespace(expiration_date=EXPIRES))
+
+
+async def test_lookups_are_local_after_sync_and_api_is_fallback_once():
+    tclient = _TClient()
+    catalog = InstrumentCatalog(_Repository(), tclient)
+
+    assert await catalog.sync() == 2
+    found = await catalog.get_many(["SBER", "SiZ6"])
+    assert found["SBER"].type == "share" and found["SBER"].expiration_date is None
+    assert found["SiZ6"].type == "futures" and found["SiZ6"].expiration_date == EXPIRES
+    assert tclient.calls == ["listings"]
+
+    assert (await catalog.get("BRX6")).expiration_date == EXPIRES
+    assert (await catalog.get("BRX6")).name == "name:BRX6"  # уже из справочника
+    assert tclient.calls == ["listings", ("get_info", "BRX6"), ("future_by", "BRX6")]
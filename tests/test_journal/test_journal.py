@@ -0,0 +1,49 @@
+import pytest
+
+from core.domains.event_bus import StreamBus
+from core.domains.journal import JournalReader, JournalWriter
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_records_survive_rotation_and_truncated_tail(tmp_path):
+    writer = JournalWriter(str(tmp_path), segment_bytes=200)
+    for n in range(10):
+        writer.write("md.last_price", {"uid": "A", "n": n})
+    await writer.stop()
+
+    segments = JournalReader.segments(str(tmp_path))
+    assert len(segments) > 1
+    records = [r for seg in segments for r in JournalReader(str(seg))]
+    assert [data["n"] for _, _, data in records] == list(range(10))
+    assert {topic for _, topic, _ in records} == {"md.last_price"}
+
+    # обрыв последней записи (падение процесса посреди write)
+    last = segments[-1]
+    last.write_bytes(last.read_bytes()[:-3])
+    assert sum(len(list(JournalReader(str(s)))) for s in segments) == 9
+
+
+async def test_replay_feeds_same_handlers_through_bus(tmp_path):
+    live = StreamBus()
+    writer = JournalWriter(str(tmp_path))
+    live.add_sink(writer.write, topics=["md.last_price"])
+    await live.publish("md.last_price", ("A", 1))
+    await live.publish("md.ping", "ping")
+    await live.publish("md.last_price", ("B", 2))
+    await writer.stop()
+
+    replayed = []
+
+    async def _h(events):
+        replayed.extend(events)
+
+    bus = StreamBus()
+    bus.subscribe("md.last_price", _h, batch_size=10)
+    await bus.start()
+    [segment] = JournalReader.segments(str(tmp_path))
+    count = await JournalReader(str(segment)).replay(bus.publish, speed=None)
+    await bus.stop()
+
+    assert count == 2
+    assert replayed == [("A", 1), ("B", 2)]
@@ -0,0 +1,38 @@
+import pytest
+
+from database.redis.last_price_writer import LastPriceWriter
+
+pytestmark = pytest.mark.asyncio
+
+
+class _Redis:
+    def __init__(self):
+        self.batches = []
+
+    async def set_last_prices_if_newer(self, items):
+        self.batches.append(list(items))
+
+
+async def test_flush_writes_newest_price_per_instrument_in_one_call():
+    redis = _Redis()
+    writer = LastPriceWriter(redis, batch_size=100)
+
+    writer.add("A", "1.0", 1000)
+    writer.add("A", "3.0", 3000)
+    writer.add("A", "2.0", 2000)  # опоздавший тик не перетирает свежий
+    writer.add("B", "5.0", 1000)
+    await writer.flush()
+
+    assert redis.batches == [[("A", "3.0", 3000), ("B", "5.0", 1000)]]
+    assert len(writer) == 0
+
+
+async def test_stop_flushes_pending_prices():
+    redis = _Redis()
+    writer = LastPriceWriter(redis, batch_size=100, flush_ms=10_000)
+    await writer.start()
+
+    writer.add("A", "1.0", 1000)
+    await writer.stop()
+
+    assert redis.batches == [[("A", "1.0", 1000)]]
@@ -0,0 +1,31 @@
+import pytest
+
+from clients.tinkoff.last_prices import LastPriceService
+from tests.test_market_data_handler.factories import last_price
+from tests.test_market_data_handler.fakes import FakeRedis
+
+pytestmark = pytest.mark.asyncio
+
+
+class _TClient:
+    def __init__(self, prices):
+        self.prices = prices
+        self.requests = []
+
+    async def get_last_prices(self, instruments_id):
+        ids = list(instruments_id)
+        self.requests.append(ids)
+        return [last_price(uid, self.prices[uid]) for uid in ids if uid in self.prices]
+
+
+async def test_get_many_reads_cache_and_fetches_misses_in_one_request():
+    redis = FakeRedis()
+    redis.last_prices["A"] = ("10.5", 1)
+    tclient = _TClient({"B": 20.0, "C": 30.25})
+    service = LastPriceService(redis, tclient)
+
+    prices = await service.get_many(["A", "B", "C", "B"])
+
+    assert prices == {"A": 10.5, "B": 20.0, "C": 30.25}
+    assert tclient.requests == [["B", "C"]]
+    assert redis.last_prices["C"][0] == "30.25"
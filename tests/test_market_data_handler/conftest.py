@@ -27,7 +27,7 @@ def monkey_direction(monkeypatch):
     # Замените путь на реальный модуль, где лежит MarketDataHandler
     # Например: from mypkg.market.handler import MarketDataHandler
     # Везде ниже этот модуль будет называться handler_mod
-    handler_mod = importlib.import_module("core.schemas.market_proc")  # <-- ПОПРАВЬ
+    handler_mod = importlib.import_module("core.domains.trigger_index")  # <-- ПОПРАВЬ
     monkeypatch.setattr(handler_mod, "Direction", Direction)
     return Direction
 
@@ -44,14 +44,15 @@ def patch_text_generators(monkeypatch):
     async def _stub_short(indicators, last_price, name_service):
         return f"[STOP SHORT] {indicators.instrument_id} @ {last_price}"
 
-    async def _stub_breakout(indicators, side, last_price, name_service, price_point_value):
+    async def _stub_breakout(indicators, side, last_price, name_service, price_point_value,
+                             portfolios=None):
         return (
             f"[BREAKOUT {side.upper()}] "
             f"{indicators.instrument_id} @ {last_price} (ppv={price_point_value})"
         )
 
     import importlib
-    handler_mod = importlib.import_module("core.schemas.market_proc")  # <-- ПОПРАВЬ
+    handler_mod = importlib.import_module("services.signals.outbox")  # <-- ПОПРАВЬ
 
     monkeypatch.setattr(handler_mod, "text_stop_long_position", _stub_long, raising=True)
     monkeypatch.setattr(handler_mod, "text_stop_short_position", _stub_short, raising=True)
@@ -1,4 +1,4 @@
-from types import SimpleNamespace
+from datetime import datetime, timezone
 import tinkoff.invest as ti
 
 
@@ -10,7 +10,8 @@ def last_price(uid: str, price: float) -> ti.LastPrice:
     # price -> Quotation
     units = int(price)
     nano = int(round((price - units) * 1_000_000_000))
-    return ti.LastPrice(instrument_uid=uid, figi=None, price=quotation(units, nano))
+    return ti.LastPrice(instrument_uid=uid, figi=None, price=quotation(units, nano),
+                        time=datetime.now(timezone.utc))
 
 
 def trade(uid: str, price: float, qty: int) -> ti.Trade:
@@ -31,22 +32,3 @@ def candle(uid: str, o, h, l, c):
         open=q(o), high=q(h), low=q(l), close=q(c),
         volume=1, time=None, last_trade_ts=None, interval=ti.CandleInterval.CANDLE_INTERVAL_1_MIN
     )
-
-
-def md_response_with_last_price(lp: ti.LastPrice):
-    # У хэндлера в _extract — просто проверка на наличие атрибутов.
-    # Поэтому SimpleNamespace с нужными полями полностью достаточен.
-    return SimpleNamespace(
-        subscribe_last_price_response=None,
-        subscribe_trades_response=None,
-        subscribe_info_response=None,
-        subscribe_order_book_response=None,
-        subscribe_candles_response=None,
-        last_price=lp,
-        trade=None,
-        candle=None,
-        orderbook=None,
-        trading_status=None,
-        ping=None,
-        open_interest=None,
-    )
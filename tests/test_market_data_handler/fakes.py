@@ -1,14 +1,25 @@
 from contextlib import asynccontextmanager
+from types import SimpleNamespace
 
 
 class FakeBot:
     def __init__(self):
         self.sent = []
 
-    async def send_message(self, chat_id, text):
+    async def send_message(self, chat_id, text, **kwargs):
         self.sent.append({"chat_id": chat_id, "text": text})
 
 
+class FakeDelivery:
+    """DeliveryScheduler без лимитов: сообщение «отправлено» сразу при постановке."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, chat_id, text, digest=False, **kwargs):
+        self.sent.append({"chat_id": chat_id, "text": text, "digest": digest})
+
+
 class FakeSession:
     def __init__(self):
         self.commits = 0
@@ -20,22 +31,28 @@ class FakeSession:
 class FakeRepository:
     """
     - session_factory: асинхронный контекст-менеджер, возвращает FakeSession
-    - get_instrument_with_positions: подменяем в тесте через лямбду/функцию
-    - set_notify: записываем вызовы для assert
+    - get_instrument: подменяем в тесте через лямбду/функцию
+    - set_notify / set_notify_bulk: записываем вызовы для assert
+    - get_calls: тиковый путь не должен ходить в БД без сигнала
     """
 
     def __init__(self):
         self._get_row = None
         self.set_notify_calls = []
+        self.get_calls = []
 
     def set_get_row_callable(self, fn):
         self._get_row = fn
 
-    async def get_instrument_with_positions(self, uid, session):
+    async def get_instrument(self, uid, session):
+        self.get_calls.append(uid)
         if self._get_row is None:
             return None
         return await self._get_row(uid, session)
 
+    async def list_accounts(self, session):
+        return []
+
     @asynccontextmanager
     async def session_factory(self):
         sess = FakeSession()
@@ -47,11 +64,44 @@ class FakeRepository:
     async def set_notify(self, instrument_id, notify, session):
         self.set_notify_calls.append((instrument_id, notify))
 
+    async def set_notify_bulk(self, ids, notify, session):
+        self.set_notify_calls.extend((uid, notify) for uid in ids)
+
 
 class FakeNameService:
     pass
 
 
+class FakeRedis:
+    def __init__(self):
+        self.last_prices = {}
+        self.price_points = {}
+
+    async def get_price_point(self, instrument_uid):
+        return self.price_points.get(instrument_uid)
+
+    async def set_price_point(self, instrument_uid, value, ttl_sec):
+        self.price_points[instrument_uid] = {"value": value}
+
+    async def set_last_price_if_newer(self, instrument_uid, price_str, ts_ms):
+        self.last_prices[instrument_uid] = (price_str, ts_ms)
+        return True
+
+    async def set_last_prices_if_newer(self, items):
+        for uid, price_str, ts_ms in items:
+            self.last_prices[uid] = (price_str, ts_ms)
+        return [True for _ in self.last_prices]
+
+    async def get_last_prices(self, instrument_uids):
+        return {uid: {"price": self.last_prices[uid][0], "ts_ms": self.last_prices[uid][1]}
+                for uid in instrument_uids if uid in self.last_prices}
+
+
+class FakePortfolioService:
+    async def list_portfolios(self, db):
+        return []
+
+
 class FakeTClient:
     def __init__(self, quotation_factory):
         self._quotation_factory = quotation_factory
@@ -59,5 +109,8 @@ class FakeTClient:
 
     async def get_min_price_increment_amount(self, uid: str):
         self.calls.append(("get_min_price_increment_amount", uid))
-        # Возвращаем Quotation(1, 0) — 1.0
-        return self._quotation_factory(1, 0)
+        # Шаг цены 1.0 стоимостью 1.0
+        return SimpleNamespace(
+            min_price_increment=self._quotation_factory(1, 0),
+            min_price_increment_amount=self._quotation_factory(1, 0),
+        )
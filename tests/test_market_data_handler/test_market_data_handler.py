@@ -2,10 +2,14 @@ import pytest
 import importlib
 from types import SimpleNamespace
 
-from tests.test_market_data_handler.fakes import FakeBot, FakeRepository, FakeNameService, \
-    FakeTClient
-from tests.test_market_data_handler.factories import quotation, last_price, \
-    md_response_with_last_price
+from clients.tinkoff.price_point import PricePointService
+from core.domains.instrument_snapshot import InstrumentSnapshot
+from database.pgsql.notify_writer import NotifyWriter
+from database.redis.last_price_writer import LastPriceWriter
+from services.signals.outbox import SignalOutbox
+from tests.test_market_data_handler.fakes import FakeDelivery, FakeRepository, FakeNameService, \
+    FakeTClient, FakeRedis, FakePortfolioService
+from tests.test_market_data_handler.factories import quotation, last_price
 
 pytestmark = pytest.mark.asyncio
 
@@ -34,8 +38,16 @@ def _mk_indicators(
     )
 
 
-def _mk_position(direction):
-    return SimpleNamespace(direction=direction)
+def _put(snapshot: InstrumentSnapshot, db: FakeRepository, indicators, direction=None):
+    """Кладём инструмент в снимок (тиковый путь) и в фейковую БД (путь сигнала)."""
+    snapshot.apply(indicators.instrument_id, vars(indicators))
+    if direction is not None:
+        snapshot.set_position("ACC", indicators.instrument_id, direction)
+
+    async def _get(uid, s):
+        return indicators
+
+    db.set_get_row_callable(_get)
 
 
 def _mk_handler(monkeypatch, monkey_direction):
@@ -43,32 +55,46 @@ def _mk_handler(monkeypatch, monkey_direction):
     Создаём MarketDataHandler, подложив фейковые зависимости.
     """
     handler_mod = importlib.import_module("core.schemas.market_proc")
-    bot = FakeBot()
+    bot = FakeDelivery()
     db = FakeRepository()
     ns = FakeNameService()
     tclient = FakeTClient(quotation)
-    handler = handler_mod.MarketDataHandler(
-        bot=bot,
+    snapshot = InstrumentSnapshot()
+    outbox = SignalOutbox(
+        delivery=bot,
         chat_id=123456,
         db=db,
         name_service=ns,
-        tclient=tclient,
+        price_points=PricePointService(FakeRedis(), tclient),
+        portfolio_svc=FakePortfolioService(),
+    )
+    handler = handler_mod.MarketDataHandler(
+        db=db,
+        redis=FakeRedis(),
+        acc_id="ACC",
+        snapshot=snapshot,
+        last_price_writer=LastPriceWriter(FakeRedis()),
+        outbox=outbox,
+        notify_writer=NotifyWriter(db),
     )
-    return handler, bot, db, ns, tclient, handler_mod
+    return handler, bot, db, snapshot, tclient, outbox
 
 
-async def test_no_instrument_in_db(monkeypatch, monkey_direction, patch_text_generators):
-    handler, bot, db, ns, tclient, handler_mod = _mk_handler(monkeypatch, monkey_direction)
+async def _deliver(handler):
+    """Дождаться, пока outbox разберёт все сигналы, и сбросить to_notify в БД."""
+    await handler._outbox.start()
+    await handler._outbox.join()
+    await handler._outbox.stop()
+    await handler._notify.flush()
 
-    async def _get(uid, s):
-        return None
 
-    db.set_get_row_callable(_get)
+async def test_no_instrument_in_db(monkeypatch, monkey_direction, patch_text_generators):
+    handler, bot, db, snapshot, tclient, outbox = _mk_handler(monkeypatch, monkey_direction)
 
     lp = last_price("UID1", 100.0)
-    mdr = md_response_with_last_price(lp)
 
-    await handler.execute(mdr)
+    await handler.on_last_prices([lp])
+    await _deliver(handler)
 
     assert bot.sent == []
     assert db.set_notify_calls == []
@@ -76,19 +102,14 @@ async def test_no_instrument_in_db(monkeypatch, monkey_direction, patch_text_gen
 
 async def test_skip_when_check_false(monkeypatch, monkey_direction, patch_text_generators):
     Direction = monkey_direction
-    handler, bot, db, ns, tclient, handler_mod = _mk_handler(monkeypatch, Direction)
+    handler, bot, db, snapshot, tclient, outbox = _mk_handler(monkeypatch, Direction)
 
-    async def _get(uid, s):
-        indicators = _mk_indicators(uid, check=False, to_notify=True)
-        position = _mk_position(Direction.LONG)
-        return indicators, position
-
-    db.set_get_row_callable(_get)
+    _put(snapshot, db, _mk_indicators("UID2", check=False, to_notify=True), Direction.LONG)
 
     lp = last_price("UID2", 100.0)
-    mdr = md_response_with_last_price(lp)
 
-    await handler.execute(mdr)
+    await handler.on_last_prices([lp])
+    await _deliver(handler)
 
     assert bot.sent == []
     assert db.set_notify_calls == []
@@ -97,20 +118,16 @@ async def test_skip_when_check_false(monkeypatch, monkey_direction, patch_text_g
 async def test_stop_long_when_price_breaks_short20(monkeypatch, monkey_direction,
                                                    patch_text_generators):
     Direction = monkey_direction
-    handler, bot, db, ns, tclient, handler_mod = _mk_handler(monkeypatch, Direction)
+    handler, bot, db, snapshot, tclient, outbox = _mk_handler(monkeypatch, Direction)
 
-    async def _get(uid, s):
-        indicators = _mk_indicators(uid, check=True, to_notify=True, dsh20=101.0)
-        position = _mk_position(Direction.LONG.value)
-        return indicators, position
-
-    db.set_get_row_callable(_get)
+    _put(snapshot, db, _mk_indicators("UID3", check=True, to_notify=True, dsh20=101.0),
+         Direction.LONG.value)
 
     # Цена <= donchian_short_20 (101.0) => стоп длинной позиции
     lp = last_price("UID3", 100.0)
-    mdr = md_response_with_last_price(lp)
 
-    await handler.execute(mdr)
+    await handler.on_last_prices([lp])
+    await _deliver(handler)
 
     assert len(bot.sent) == 1
     assert "[STOP LONG]" in bot.sent[0]["text"]
@@ -121,20 +138,16 @@ async def test_stop_long_when_price_breaks_short20(monkeypatch, monkey_direction
 async def test_stop_short_when_price_breaks_long20(monkeypatch, monkey_direction,
                                                    patch_text_generators):
     Direction = monkey_direction
-    handler, bot, db, ns, tclient, handler_mod = _mk_handler(monkeypatch, Direction)
-
-    async def _get(uid, s):
-        indicators = _mk_indicators(uid, check=True, to_notify=True, dlg20=99.0)
-        position = _mk_position(Direction.SHORT.value)
-        return indicators, position
+    handler, bot, db, snapshot, tclient, outbox = _mk_handler(monkeypatch, Direction)
 
-    db.set_get_row_callable(_get)
+    _put(snapshot, db, _mk_indicators("UID4", check=True, to_notify=True, dlg20=99.0),
+         Direction.SHORT.value)
 
     # Цена >= donchian_long_20 (99.0) => стоп короткой позиции
     lp = last_price("UID4", 100.0)
-    mdr = md_response_with_last_price(lp)
 
-    await handler.execute(mdr)
+    await handler.on_last_prices([lp])
+    await _deliver(handler)
 
     assert len(bot.sent) == 1
     assert "[STOP SHORT]" in bot.sent[0]["text"]
@@ -144,20 +157,15 @@ async def test_stop_short_when_price_breaks_long20(monkeypatch, monkey_direction
 async def test_breakout_long_when_no_position_and_notify(monkeypatch, monkey_direction,
                                                          patch_text_generators):
     Direction = monkey_direction
-    handler, bot, db, ns, tclient, handler_mod = _mk_handler(monkeypatch, Direction)
-
-    async def _get(uid, s):
-        indicators = _mk_indicators(uid, check=True, to_notify=True, dlg55=150.0)
-        position = None  # нет позиции
-        return indicators, position
+    handler, bot, db, snapshot, tclient, outbox = _mk_handler(monkeypatch, Direction)
 
-    db.set_get_row_callable(_get)
+    _put(snapshot, db, _mk_indicators("UID5", check=True, to_notify=True, dlg55=150.0))
 
     # Цена >= donchian_long_55 (150) => сигнал LONG breakout
     lp = last_price("UID5", 150.0)
-    mdr = md_response_with_last_price(lp)
 
-    await handler.execute(mdr)
+    await handler.on_last_prices([lp])
+    await _deliver(handler)
 
     assert len(bot.sent) == 1
     assert "[BREAKOUT LONG]" in bot.sent[0]["text"]
@@ -169,22 +177,102 @@ async def test_breakout_long_when_no_position_and_notify(monkeypatch, monkey_dir
 async def test_breakout_short_when_no_position_and_notify(monkeypatch, monkey_direction,
                                                           patch_text_generators):
     Direction = monkey_direction
-    handler, bot, db, ns, tclient, handler_mod = _mk_handler(monkeypatch, Direction)
+    handler, bot, db, snapshot, tclient, outbox = _mk_handler(monkeypatch, Direction)
 
-    async def _get(uid, s):
-        indicators = _mk_indicators(uid, check=True, to_notify=True, dsh55=50.0, dlg55=150.0)
-        position = None
-        return indicators, position
-
-    db.set_get_row_callable(_get)
+    _put(snapshot, db, _mk_indicators("UID6", check=True, to_notify=True, dsh55=50.0, dlg55=150.0))
 
     # Цена <= donchian_short_55 (50) => сигнал SHORT breakout
     lp = last_price("UID6", 49.5)
-    mdr = md_response_with_last_price(lp)
 
-    await handler.execute(mdr)
+    await handler.on_last_prices([lp])
+    await _deliver(handler)
 
     assert len(bot.sent) == 1
     assert "[BREAKOUT SHORT]" in bot.sent[0]["text"]
     assert db.set_notify_calls == [("UID6", False)]
     assert tclient.calls == [("get_min_price_increment_amount", "UID6")]
+
+
+async def test_tick_without_signal_does_not_touch_db(monkeypatch, monkey_direction,
+                                                     patch_text_generators):
+    Direction = monkey_direction
+    handler, bot, db, snapshot, tclient, outbox = _mk_handler(monkeypatch, Direction)
+
+    _put(snapshot, db, _mk_indicators("UID7", check=True, to_notify=True, dsh55=50.0, dlg55=150.0))
+
+    # Цена внутри канала => ни сигнала, ни запроса в БД
+    await handler.on_last_prices([last_price("UID7", 100.0)])
+    await _deliver(handler)
+
+    assert bot.sent == []
+    assert db.get_calls == []
+
+
+async def test_signal_fires_once_per_notify_flag(monkeypatch, monkey_direction,
+                                                 patch_text_generators):
+    Direction = monkey_direction
+    handler, bot, db, snapshot, tclient, outbox = _mk_handler(monkeypatch, Direction)
+
+    _put(snapshot, db, _mk_indicators("UID8", check=True, to_notify=True, dsh55=50.0, dlg55=150.0))
+
+    await handler.on_last_prices([last_price("UID8", 151.0)])
+    await handler.on_last_prices([last_price("UID8", 152.0)])
+    await _deliver(handler)
+
+    assert len(bot.sent) == 1
+    assert snapshot.get("UID8").to_notify is False
+    assert db.get_calls == ["UID8"]
+    assert db.set_notify_calls == [("UID8", False)]
+
+
+async def test_tick_returns_before_delivery(monkeypatch, monkey_direction, patch_text_generators):
+    Direction = monkey_direction
+    handler, bot, db, snapshot, tclient, outbox = _mk_handler(monkeypatch, Direction)
+
+    _put(snapshot, db, _mk_indicators("UID9", check=True, to_notify=True, dlg55=150.0))
+
+    # Тиковый путь только кладёт сигнал в outbox: ни БД, ни Telegram, ни REST
+    await handler.on_last_prices([last_price("UID9", 151.0)])
+
+    assert len(outbox) == 1
+    assert bot.sent == [] and db.get_calls == [] and tclient.calls == []
+
+    await _deliver(handler)
+    assert len(bot.sent) == 1
+
+
+async def test_recovered_ticks_are_evaluated_but_not_counted_in_lag(monkeypatch, monkey_direction,
+                                                                    patch_text_generators):
+    Direction = monkey_direction
+    handler, bot, db, snapshot, tclient, outbox = _mk_handler(monkeypatch, Direction)
+    lag = importlib.import_module("core.schemas.market_proc").LAST_PRICE_LAG
+    observed = lag.count
+
+    _put(snapshot, db, _mk_indicators("UID10", check=True, to_notify=True, dlg55=150.0))
+    await handler.on_recovered_prices([last_price("UID10", 149.0), last_price("UID10", 151.0)])
+
+    assert len(outbox) == 1
+    assert lag.count == observed
+
+
+async def test_stop_delivers_signal_waiting_for_retry(monkeypatch, monkey_direction,
+                                                      patch_text_generators):
+    Direction = monkey_direction
+    handler, bot, db, snapshot, tclient, outbox = _mk_handler(monkeypatch, Direction)
+    outbox._retry_delay = 60.0
+    send = bot.send
+
+    async def _fail_once(chat_id, text, **kwargs):
+        bot.send = send
+        raise RuntimeError("telegram is down")
+
+    bot.send = _fail_once
+    _put(snapshot, db, _mk_indicators("UID11", check=True, to_notify=True, dlg55=150.0))
+    await handler.on_last_prices([last_price("UID11", 151.0)])
+
+    await outbox.start()
+    await outbox.join()
+    assert bot.sent == [] and len(outbox) == 1  # ждёт повтора через 60 с
+
+    await outbox.stop()
+    assert len(bot.sent) == 1 and len(outbox) == 0
@@ -0,0 +1,46 @@
+import pytest
+
+from core.domains.event_bus import StreamBus
+from utils.metrics import MetricsRegistry
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("events_total", "Events", topic="md").inc(3)
+    hist = registry.histogram("lag_seconds", "Lag", buckets=(0.1, 1.0), topic="md")
+    hist.observe(0.05)
+    hist.observe(0.5)
+    hist.observe(5)
+    registry.gauge("depth", lambda: 7, topic='a"b')
+
+    text = registry.render()
+
+    assert "# TYPE events_total counter" in text
+    assert 'events_total{topic="md"} 3.0' in text
+    assert 'lag_seconds_bucket{topic="md",le="0.1"} 1' in text
+    assert 'lag_seconds_bucket{topic="md",le="1.0"} 2' in text
+    assert 'lag_seconds_bucket{topic="md",le="+Inf"} 3' in text
+    assert 'lag_seconds_count{topic="md"} 3' in text
+    assert 'depth{topic="a\\"b"} 7' in text
+
+
+@pytest.mark.asyncio
+async def test_stream_bus_reports_wait_and_handler_time():
+    registry = MetricsRegistry()
+    bus = StreamBus(metrics=registry)
+
+    async def _h(_):
+        pass
+
+    bus.subscribe("ticks", _h)
+    await bus.start()
+    for n in range(5):
+        await bus.publish("ticks", n)
+    await bus.stop()
+
+    snap = registry.snapshot()
+    assert snap["stream_bus_published_total"][0]["value"] == 5
+    assert snap["stream_bus_wait_seconds"][0]["value"]["count"] == 5
+    handler = snap["stream_bus_handler_seconds"][0]
+    assert handler["labels"]["topic"] == "ticks" and handler["value"]["count"] == 5
+    assert snap["stream_bus_queue_depth"] == []
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+import pytest
+
+from clients.tinkoff.name_service import NameService
+
+pytestmark = pytest.mark.asyncio
+
+CFG = SimpleNamespace(namespace="names", ttl=60)
+
+
+class _Redis:
+    def __init__(self):
+        self.names = {}
+
+    async def get_name(self, uid, namespace):
+        return self.names.get(uid)
+
+    async def set_name(self, uid, name, ttl, namespace):
+        self.names[uid] = name
+
+
+class _Catalog:
+    def __init__(self, names):
+        self.names = names
+
+    async def get(self, uid):
+        if uid in self.names:
+            return SimpleNamespace(name=self.names[uid])
+        return None
+
+
+async def test_name_falls_back_to_uid_and_is_not_cached():
+    redis = _Redis()
+    service = NameService(redis, _Catalog({"SBER": "Сбербанк"}), CFG)
+
+    assert await service.get_name("SBER") == "Сбербанк"
+    assert await service.get_name("GONE") == "GONE"
+    assert redis.names == {"SBER": "Сбербанк"}
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from database.pgsql.notify_writer import NotifyWriter
+from tests.test_market_data_handler.fakes import FakeRepository
+
+pytestmark = pytest.mark.asyncio
+
+
+class _Repository(FakeRepository):
+    def __init__(self):
+        super().__init__()
+        self.bulk_calls = []
+
+    async def set_notify_bulk(self, ids, notify, session):
+        await asyncio.sleep(0)
+        self.bulk_calls.append((sorted(ids), notify))
+
+
+async def test_flush_coalesces_flags_into_one_update_per_value():
+    db = _Repository()
+    writer = NotifyWriter(db)
+
+    writer.set("A", False)
+    writer.set("B", False)
+    writer.set("C", True)
+    writer.set("C", False)  # побеждает последнее значение
+    writer.set("D", True)
+    await writer.flush()
+
+    assert sorted(db.bulk_calls) == [(["A", "B", "C"], False), (["D"], True)]
+    assert len(writer) == 0
+
+
+async def test_stop_flushes_pending_and_discard_drops_change():
+    db = _Repository()
+    writer = NotifyWriter(db, flush_ms=10_000)
+    await writer.start()
+
+    writer.set("A", False)
+    writer.set("B", False)
+    writer.discard("B")
+    await writer.stop()
+
+    assert db.bulk_calls == [(["A"], False)]
+
+
+async def test_true_written_elsewhere_wins_over_false_in_flight():
+    db = _Repository()
+    writer = NotifyWriter(db)
+
+    writer.set("A", False)  # сигнал выключил уведомления
+    flushing = asyncio.create_task(writer.flush())
+    await asyncio.sleep(0)  # пачка с False уже забрана и пишется
+    # обработчик записал to_notify=True напрямую в БД и сообщил об этом writer'у
+    writer.set("A", True)
+    await flushing
+    await writer.flush()
+
+    assert db.bulk_calls == [(["A"], False), (["A"], True)]
@@ -0,0 +1,88 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from clients.tinkoff.portfolio_svc import PortfolioService
+from tests.test_market_data_handler.factories import quotation
+from tests.test_market_data_handler.fakes import FakeRepository
+
+pytestmark = pytest.mark.asyncio
+
+
+class _Redis:
+    def __init__(self):
+        self.metrics = {}
+
+    async def get_portfolio_metrics(self, account_id):
+        return self.metrics.get(account_id)
+
+    async def set_portfolio_metrics(self, account_id, total_amount, expected_yield_percent,
+                                    name, ts_ms, ttl_sec=None):
+        self.metrics[account_id] = {"total_amount": total_amount,
+                                    "expected_yield_percent": expected_yield_percent}
+
+
+class _TClient:
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_portfolio(self, account_id):
+        self.calls.append(account_id)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return _portfolio(account_id, 1000)
+
+
+class _Repository(FakeRepository):
+    async def list_accounts(self, session):
+        return [SimpleNamespace(account_id="A1", name="main"),
+                SimpleNamespace(account_id="A2", name="iis")]
+
+
+def _portfolio(account_id, units):
+    return SimpleNamespace(account_id=account_id,
+                           total_amount_portfolio=SimpleNamespace(units=units, nano=0),
+                           expected_yield=quotation(5, 0))
+
+
+async def test_accounts_fetched_concurrently_then_served_from_memory():
+    tclient = _TClient()
+    svc = PortfolioService(tclient, _Redis())
+
+    first = await svc.list_portfolios(_Repository())
+    second = await svc.list_portfolios(_Repository())
+
+    assert [p.account_id for p in first] == ["A1", "A2"]
+    assert second == first
+    assert tclient.max_in_flight == 2
+    assert sorted(tclient.calls) == ["A1", "A2"]
+
+
+async def test_stream_update_replaces_cached_portfolio():
+    tclient = _TClient()
+    redis = _Redis()
+    svc = PortfolioService(tclient, redis)
+    await svc.get_portfolio("A1", "main")
+
+    await svc.update_from_stream(_portfolio("A1", 2500))
+    result = await svc.get_portfolio("A1", "main")
+
+    assert result.total_amount == 2500
+    assert redis.metrics["A1"]["total_amount"] == "2500"
+    assert tclient.calls == ["A1"]
+
+
+async def test_stream_update_before_first_request_is_served_without_rest():
+    tclient = _TClient()
+    svc = PortfolioService(tclient, _Redis())
+
+    await svc.update_from_stream(_portfolio("A2", 700))
+    result = await svc.get_portfolio("A2", "iis")
+
+    assert (result.name, result.total_amount) == ("iis", 700)
+    assert tclient.calls == []
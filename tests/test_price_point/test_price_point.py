@@ -0,0 +1,55 @@
+import pytest
+
+from clients.tinkoff.price_point import PricePointService
+from tests.test_market_data_handler.factories import quotation
+from tests.test_market_data_handler.fakes import FakeRedis, FakeTClient
+
+pytestmark = pytest.mark.asyncio
+
+
+class _StockTClient:
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self._fail = fail
+
+    async def get_min_price_increment_amount(self, uid: str):
+        self.calls += 1
+        if self._fail:
+            raise RuntimeError("unavailable")
+        return None
+
+
+async def test_futures_price_point_served_from_memory_and_redis():
+    redis = FakeRedis()
+    tclient = FakeTClient(quotation)
+
+    assert await PricePointService(redis, tclient).get("FUT") == 1.0
+    assert await PricePointService(redis, tclient).get("FUT") == 1.0  # из Redis
+
+    svc = PricePointService(FakeRedis(), tclient)
+    await svc.get("FUT2")
+    await svc.get("FUT2")  # из памяти процесса
+    assert tclient.calls == [("get_min_price_increment_amount", "FUT"),
+                             ("get_min_price_increment_amount", "FUT2")]
+
+
+async def test_non_futures_is_negatively_cached():
+    redis = FakeRedis()
+    tclient = _StockTClient()
+    svc = PricePointService(redis, tclient)
+
+    assert await svc.get("SHARE") is None
+    assert await svc.get("SHARE") is None
+    assert tclient.calls == 1
+    assert redis.price_points["SHARE"] == {"value": None}
+
+
+async def test_transient_error_is_not_cached():
+    redis = FakeRedis()
+    tclient = _StockTClient(fail=True)
+    svc = PricePointService(redis, tclient)
+
+    assert await svc.get("FUT") is None
+    assert await svc.get("FUT") is None
+    assert tclient.calls == 2
+    assert redis.price_points == {}
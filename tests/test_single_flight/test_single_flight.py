@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from utils.single_flight import SingleFlight, single_flight
+
+pytestmark = pytest.mark.asyncio
+
+
+class _Client:
+    def __init__(self):
+        self.calls = []
+        self.release = asyncio.Event()
+
+    @single_flight
+    async def get_name(self, uid: str) -> str:
+        self.calls.append(uid)
+        await self.release.wait()
+        return f"name:{uid}"
+
+
+async def test_concurrent_same_args_share_one_call():
+    client = _Client()
+    waiters = [asyncio.create_task(client.get_name(uid)) for uid in ("A", "A", "B", "A")]
+    await asyncio.sleep(0)
+    client.release.set()
+
+    assert await asyncio.gather(*waiters) == ["name:A", "name:A", "name:B", "name:A"]
+    assert client.calls == ["A", "B"]
+    assert await client.get_name("A") == "name:A" and client.calls == ["A", "B", "A"]
+
+
+async def test_error_is_shared_and_cancelled_waiter_does_not_cancel_call():
+    group = SingleFlight()
+    started = asyncio.Event()
+
+    async def _fail():
+        started.set()
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    first = asyncio.create_task(group.do("k", _fail))
+    second = asyncio.create_task(group.do("k", _fail))
+    await started.wait()
+    first.cancel()
+
+    with pytest.raises(RuntimeError):
+        await second
+    assert group.calls == 1 and group.shared == 1 and len(group) == 0
@@ -0,0 +1,97 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from grpc import StatusCode
+from tinkoff.invest import AioRequestError
+
+import clients.tinkoff.client as client_mod
+from clients.tinkoff.client import TClient
+
+pytestmark = pytest.mark.asyncio
+
+
+class _FakeAsyncClient:
+    opened = 0
+    closed = 0
+    fail_with = None
+
+    def __init__(self, token):
+        self.token = token
+        self.is_closed = False
+
+    async def __aenter__(self):
+        type(self).opened += 1
+        return SimpleNamespace(users=SimpleNamespace(get_accounts=self._get_accounts),
+                               operations=SimpleNamespace(get_portfolio=self._get_portfolio))
+
+    async def __aexit__(self, *exc):
+        type(self).closed += 1
+        self.is_closed = True
+
+    async def _get_accounts(self):
+        if type(self).fail_with is not None:
+            raise AioRequestError(type(self).fail_with, "down", None)
+        return SimpleNamespace(accounts=["acc"])
+
+    async def _get_portfolio(self, account_id):
+        """SLOW_* — ответ через 50 мс, *DOWN — UNAVAILABLE."""
+        await asyncio.sleep(0.05 if account_id.startswith("SLOW") else 0)
+        if self.is_closed:
+            raise AioRequestError(StatusCode.CANCELLED, "channel closed", None)
+        if account_id.endswith("DOWN"):
+            raise AioRequestError(StatusCode.UNAVAILABLE, "down", None)
+        return SimpleNamespace(account_id=account_id)
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    monkeypatch.setattr(_FakeAsyncClient, "opened", 0)
+    monkeypatch.setattr(_FakeAsyncClient, "closed", 0)
+    monkeypatch.setattr(_FakeAsyncClient, "fail_with", None)
+    monkeypatch.setattr(client_mod.ti, "AsyncClient", _FakeAsyncClient)
+    return _FakeAsyncClient
+
+
+async def test_unary_calls_share_one_channel(fake_client):
+    tclient = TClient(token="t")
+
+    for _ in range(3):
+        assert await tclient.get_accounts() == ["acc"]
+    await tclient.close()
+
+    assert fake_client.opened == 1 and fake_client.closed == 1
+
+
+async def test_unavailable_reopens_channel_on_next_call(fake_client):
+    tclient = TClient(token="t")
+    fake_client.fail_with = StatusCode.UNAVAILABLE
+
+    with pytest.raises(AioRequestError):
+        await tclient.get_accounts()
+    fake_client.fail_with = None
+    assert await tclient.get_accounts() == ["acc"]
+    await tclient.close()
+
+    assert fake_client.opened == 2 and fake_client.closed == 2
+
+
+async def test_unavailable_retires_channel_without_breaking_calls_in_flight(fake_client):
+    tclient = TClient(token="t")
+    slow = asyncio.create_task(tclient.get_portfolio("SLOW_DOWN"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AioRequestError):
+        await tclient.get_portfolio("DOWN")
+    assert await tclient.get_accounts() == ["acc"]  # уже на новом канале
+    assert fake_client.opened == 2 and fake_client.closed == 0
+
+    # поздняя ошибка старого канала не трогает новый; старый закрывается последним вызовом
+    with pytest.raises(AioRequestError) as late:
+        await slow
+    assert late.value.code == StatusCode.UNAVAILABLE
+    assert fake_client.closed == 1
+    assert await tclient.get_accounts() == ["acc"]
+    assert fake_client.opened == 2
+    await tclient.close()
+    assert fake_client.closed == 2
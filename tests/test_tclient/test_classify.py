@@ -0,0 +1,15 @@
+from types import SimpleNamespace
+
+from clients.tinkoff.client import classify_market_data
+from tests.test_market_data_handler.factories import last_price
+
+
+def test_response_routed_by_populated_field():
+    lp = last_price("UID1", 100.0)
+
+    assert classify_market_data(SimpleNamespace(last_price=lp)) == ("md.last_price", lp)
+    assert classify_market_data(SimpleNamespace(ping="p"))[0] == "md.ping"
+    assert classify_market_data(
+        SimpleNamespace(subscribe_last_price_response="r")
+    ) == ("md.subscription", "r")
+    assert classify_market_data(SimpleNamespace()) is None
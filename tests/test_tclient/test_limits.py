@@ -0,0 +1,62 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from grpc import StatusCode
+from tinkoff.invest import AioRequestError
+
+from clients.tinkoff.limits import RequestLimiter, short_method
+
+pytestmark = pytest.mark.asyncio
+
+CANDLES = "tinkoff.public.invest.api.contract.v1.MarketDataService/GetCandles"
+
+
+def _tariff(per_minute: int, *methods: str):
+    return SimpleNamespace(unary_limits=[
+        SimpleNamespace(limit_per_minute=per_minute, methods=list(methods))
+    ])
+
+
+def test_short_method_strips_package():
+    assert short_method(CANDLES) == "MarketDataService/GetCandles"
+
+
+async def test_group_shares_one_bucket():
+    limiter = RequestLimiter()
+    limiter.configure(_tariff(120, CANDLES, "x.v1.MarketDataService/GetLastPrices"))
+
+    candles = limiter.bucket("MarketDataService/GetCandles")
+    assert candles is limiter.bucket("MarketDataService/GetLastPrices")
+    assert candles.rate == pytest.approx(120 * 0.95 / 60)
+
+
+async def test_concurrency_cap_applies_without_tariff():
+    limiter = RequestLimiter(concurrency=2)
+    running, peak = 0, 0
+
+    async def _call():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    await asyncio.gather(*(limiter.run("UsersService/GetAccounts", _call) for _ in range(6)))
+
+    assert peak == 2
+
+
+async def test_resource_exhausted_is_retried():
+    limiter = RequestLimiter()
+    calls = []
+
+    async def _call():
+        calls.append(1)
+        if len(calls) == 1:
+            raise AioRequestError(StatusCode.RESOURCE_EXHAUSTED, "limit",
+                                  SimpleNamespace(ratelimit_reset=0.01))
+        return "ok"
+
+    assert await limiter.run("MarketDataService/GetCandles", _call) == "ok"
+    assert len(calls) == 2
@@ -0,0 +1,68 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from clients.tinkoff.md_pool import SUBSCRIPTION_OK, MarketDataPool, MarketDataStream, place
+
+
+async def _noop(*_):
+    return None
+
+
+def test_place_is_stable_and_respects_capacity():
+    uids = [f"u{n}" for n in range(500)]
+    before = place(uids, 2, 300)
+    after = place(uids + ["new"], 2, 300)
+    grown = place(uids + [f"v{n}" for n in range(200)], 3, 300)
+
+    assert all(before[u] == after[u] for u in uids)
+    assert max(list(grown.values()).count(s) for s in range(3)) <= 300
+    # при добавлении третьего стрима переезжает примерно треть инструментов
+    assert sum(before[u] != grown[u] for u in uids) < len(uids) // 2
+
+
+def test_pool_grows_when_watchlist_exceeds_stream_capacity():
+    pool = MarketDataPool(_noop, _noop, _noop, _noop, min_streams=1, max_streams=4, capacity=10)
+
+    pool.subscribe(f"u{n}" for n in range(25))
+    assert len(pool.stats()) == 3
+    assert sum(s["instruments"] for s in pool.stats()) == 25
+
+    pool.unsubscribe(f"u{n}" for n in range(20))
+    assert pool.desired == {f"u{n}" for n in range(20, 25)}
+    assert len(pool.stats()) == 1
+    assert sum(s["instruments"] for s in pool.stats()) == 5
+
+
+@pytest.mark.asyncio
+async def test_pool_shrinks_and_moves_only_uids_of_closed_streams():
+    pool = MarketDataPool(_noop, _noop, _noop, _noop, min_streams=1, max_streams=4, capacity=10)
+    await pool.start()
+    pool.subscribe(f"u{n}" for n in range(25))
+    surplus = pool._streams[2]
+    kept = {uid: s.index for s in pool._streams[:2] for uid in s.uids}
+
+    pool.unsubscribe(f"u{n}" for n in range(10))
+    await asyncio.gather(*pool._closing)
+
+    assert len(pool.stats()) == 2 and surplus._task is None
+    assert sum(s["instruments"] for s in pool.stats()) == 15
+    assert all(kept[uid] == s.index for s in pool._streams for uid in s.uids if uid in kept)
+    await pool.stop()
+
+
+def test_stream_unsubscribes_uid_confirmed_after_removal():
+    sent = []
+    stream = MarketDataStream(pool=None, index=0)
+    stream._manager = SimpleNamespace(last_price=SimpleNamespace(
+        subscribe=lambda instruments: sent.append(("subscribe", len(instruments))),
+        unsubscribe=lambda instruments: sent.append(("unsubscribe", len(instruments))),
+    ))
+    stream.assign({"A"})
+    stream.assign(set())
+    stream._on_subscription(SimpleNamespace(last_price_subscriptions=[
+        SimpleNamespace(instrument_uid="A", subscription_status=SUBSCRIPTION_OK),
+    ]))
+
+    assert sent == [("subscribe", 1), ("unsubscribe", 1)]
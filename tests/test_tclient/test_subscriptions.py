@@ -0,0 +1,57 @@
+from clients.tinkoff.subscriptions import SubscriptionSet, chunked
+
+
+def test_only_delta_is_sent_and_acks_are_tracked():
+    subs = SubscriptionSet()
+    subs.set_desired({"A", "B", "C"})
+
+    assert subs.delta() == ({"A", "B", "C"}, set())
+    assert subs.delta() == (set(), set())  # ждём ответа, повторно не шлём
+    for uid in ("A", "B", "C"):
+        subs.confirm(uid)
+
+    subs.set_desired({"B", "C", "D"})
+    assert subs.delta() == ({"D"}, {"A"})
+    subs.confirm("A")  # ответ на отписку
+    assert subs.confirmed == {"B", "C"}
+
+
+def test_rejected_uid_is_retried_after_pause(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("clients.tinkoff.subscriptions.time.monotonic", lambda: now[0])
+    subs = SubscriptionSet(retry_base=5.0)
+    subs.set_desired({"A"})
+    subs.delta()
+
+    subs.reject("A", "SUBSCRIPTION_STATUS_INSTRUMENT_NOT_FOUND")
+    assert subs.delta() == (set(), set())
+    now[0] += 5.0
+    assert subs.delta() == ({"A"}, set())
+
+
+def test_reconnect_resends_whole_set_in_chunks():
+    subs = SubscriptionSet()
+    subs.set_desired({f"u{n:03}" for n in range(250)})
+    for uid in subs.delta()[0]:
+        subs.confirm(uid)
+
+    subs.reset()
+    add, _ = subs.delta()
+
+    assert [len(c) for c in chunked(add, 100)] == [100, 100, 50]
+
+
+def test_late_confirmation_of_dropped_uid_is_unsubscribed():
+    subs = SubscriptionSet()
+    subs.set_desired({"A", "B"})
+    subs.delta()
+
+    subs.set_desired(set())  # оба сняли, пока подписки «в полёте»
+    assert subs.delta() == (set(), set())
+    subs.confirm("A")
+    subs.reject("B", "SUBSCRIPTION_STATUS_LIMIT_IS_EXCEEDED")  # в повтор не ставится
+
+    assert subs.stale() == {"A"} and subs.stats()["rejected"] == 0
+    assert subs.delta() == (set(), {"A"})
+    subs.confirm("A")  # ответ на отписку
+    assert subs.confirmed == set()
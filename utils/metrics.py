@@ -0,0 +1,132 @@
+import bisect
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# секунды: от долей миллисекунды до минуты
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+    60.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # последний — +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        return {"count": self.count, "sum": round(self.sum, 6),
+                "avg": round(self.sum / self.count, 6) if self.count else 0.0}
+
+
+class _Family:
+    def __init__(self, kind: str, help_: str, factory: Callable[[], object]):
+        self.kind = kind
+        self.help = help_
+        self.factory = factory
+        self.children: Dict[Labels, object] = {}
+
+
+class MetricsRegistry:
+    """
+    Процесс-локальные метрики: счётчики, гистограммы и gauge-колбэки с метками.
+    Читаются программно (snapshot) и отдаются в текстовом формате Prometheus (render).
+    """
+
+    def __init__(self):
+        self._families: Dict[str, _Family] = {}
+
+    def _child(self, kind: str, name: str, help_: str, factory: Callable[[], object],
+               labels: Dict[str, str]):
+        family = self._families.setdefault(name, _Family(kind, help_, factory))
+        if family.kind != kind:
+            raise ValueError(f"Metric {name} is already registered as {family.kind}")
+        key: Labels = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        child = family.children.get(key)
+        if child is None:
+            child = family.children.setdefault(key, family.factory())
+        return child
+
+    def counter(self, name: str, help_: str = "", **labels: str) -> Counter:
+        return self._child("counter", name, help_, Counter, labels)
+
+    def histogram(self, name: str, help_: str = "",
+                  buckets: Sequence[float] = DEFAULT_BUCKETS, **labels: str) -> Histogram:
+        return self._child("histogram", name, help_, lambda: Histogram(buckets), labels)
+
+    def gauge(self, name: str, fn: Callable[[], float], help_: str = "", **labels: str) -> None:
+        """Gauge считается при чтении: fn() вызывается в snapshot/render."""
+        family = self._families.setdefault(name, _Family("gauge", help_, lambda: None))
+        key: Labels = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        family.children[key] = fn
+
+    def remove(self, name: str, **labels: str) -> None:
+        family = self._families.get(name)
+        if family is not None:
+            family.children.pop(tuple(sorted((k, str(v)) for k, v in labels.items())), None)
+
+    @staticmethod
+    def _value(family: _Family, child) -> object:
+        if family.kind == "counter":
+            return child.value
+        if family.kind == "gauge":
+            return child()
+        return child.snapshot()
+
+    def snapshot(self) -> Dict[str, List[dict]]:
+        result: Dict[str, List[dict]] = {}
+        for name, family in list(self._families.items()):
+            result[name] = [
+                {"labels": dict(key), "value": self._value(family, child)}
+                for key, child in list(family.children.items())
+            ]
+        return result
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name, family in sorted(self._families.items()):
+            if family.help:
+                lines.append(f"# HELP {name} {family.help}")
+            lines.append(f"# TYPE {name} {family.kind}")
+            for key, child in list(family.children.items()):
+                if family.kind == "histogram":
+                    acc = 0
+                    for bound, n in zip((*child.buckets, "+Inf"), child.counts):
+                        acc += n
+                        lines.append(f"{name}_bucket{_fmt(key + (('le', str(bound)),))} {acc}")
+                    lines.append(f"{name}_sum{_fmt(key)} {child.sum}")
+                    lines.append(f"{name}_count{_fmt(key)} {child.count}")
+                else:
+                    lines.append(f"{name}{_fmt(key)} {self._value(family, child)}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+# общий реестр процесса
+METRICS = MetricsRegistry()
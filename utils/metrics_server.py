@@ -0,0 +1,37 @@
+from typing import Optional
+
+from aiohttp import web
+
+from utils.logger import get_logger
+from utils.metrics import METRICS, MetricsRegistry
+
+
+class MetricsServer:
+    """HTTP-эндпоинт /metrics в формате Prometheus поверх aiohttp."""
+
+    def __init__(self, registry: MetricsRegistry = METRICS, host: str = "0.0.0.0",
+                 port: int = 9108):
+        self._registry = registry
+        self._host = host
+        self._port = port
+        self._runner: Optional[web.AppRunner] = None
+        self.log = get_logger(self.__class__.__name__)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self._registry.render(),
+                            content_type="text/plain", charset="utf-8")
+
+    async def start(self) -> None:
+        if self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self._host, self._port).start()
+        self.log.info("Metrics endpoint started", extra={"host": self._host, "port": self._port})
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Асинхронный token bucket: rate токенов в секунду, не больше capacity в запасе.
+    acquire() ждёт, пока токен появится; pause() блокирует выдачу на заданное время
+    (например, по retry_after от API).
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """Сколько секунд ждать до следующего токена (0 — можно сразу)."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, self._blocked_until - now)
+        if self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) / self.rate)
+        return wait
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while (wait := self.delay()) > 0:
+                await asyncio.sleep(wait)
+            self._tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
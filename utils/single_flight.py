@@ -0,0 +1,60 @@
+import asyncio
+import functools
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Склейка одинаковых одновременных вызовов: пока запрос с ключом key в
+    полёте, остальные вызовы с тем же ключом ждут его результат (или
+    исключение). Запрос выполняется отдельной задачей, поэтому отмена
+    одного из ждущих не отменяет его для остальных. Результат не кэшируется.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(functools.partial(self._forget, key))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # ждущих могло не остаться — не ругаться «never retrieved»
+
+
+def single_flight(method):
+    """
+    Декоратор async-метода: одновременные вызовы с одинаковыми аргументами
+    одного экземпляра делят один запрос. Аргументы должны быть хешируемыми,
+    иначе вызов идёт напрямую.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return await method(self, *args, **kwargs)
+        group = self.__dict__.get("_single_flight")
+        if group is None:
+            group = self.__dict__.setdefault("_single_flight", SingleFlight())
+        return await group.do(key, lambda: method(self, *args, **kwargs))
+
+    return wrapper